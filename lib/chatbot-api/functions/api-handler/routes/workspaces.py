@@ -6,6 +6,7 @@ from common.constant import (
 from common.validation import WorkspaceIdValidation
 import genai_core.types
 import genai_core.kendra
+import genai_core.embeddings
 import genai_core.bedrock_kb
 import genai_core.parameters
 import genai_core.workspaces
@@ -44,6 +45,15 @@ class CreateWorkspaceAuroraRequest(BaseModel):
     chunkingStrategy: str = SAFE_SHORT_STR_VALIDATION
     chunkSize: int = Field(gt=100)
     chunkOverlap: int = Field(gt=0)
+    rankFusion: Optional[str] = SAFE_SHORT_STR_VALIDATION_OPTIONAL
+    vectorSearchLimit: Optional[int] = Field(ge=1, le=100, default=None)
+    keywordSearchLimit: Optional[int] = Field(ge=1, le=100, default=None)
+    indexType: Optional[str] = SAFE_SHORT_STR_VALIDATION_OPTIONAL
+    ivfflatLists: Optional[int] = Field(ge=1, le=32768, default=None)
+    ivfflatProbes: Optional[int] = Field(ge=1, le=32768, default=None)
+    hnswM: Optional[int] = Field(ge=2, le=100, default=None)
+    hnswEfConstruction: Optional[int] = Field(ge=4, le=1000, default=None)
+    efSearch: Optional[int] = Field(ge=1, le=1000, default=None)
 
 
 class CreateWorkspaceOpenSearchRequest(BaseModel):
@@ -62,6 +72,11 @@ class CreateWorkspaceOpenSearchRequest(BaseModel):
     chunkingStrategy: str = SAFE_SHORT_STR_VALIDATION
     chunkSize: int = Field(gt=0)
     chunkOverlap: int = Field(gt=0)
+    rankFusion: Optional[str] = SAFE_SHORT_STR_VALIDATION_OPTIONAL
+    vectorSearchLimit: Optional[int] = Field(ge=1, le=100, default=None)
+    keywordSearchLimit: Optional[int] = Field(ge=1, le=100, default=None)
+    vectorSearchK: Optional[int] = Field(ge=1, le=1000, default=None)
+    efSearch: Optional[int] = Field(ge=1, le=1000, default=None)
 
 
 class CreateWorkspaceKendraRequest(BaseModel):
@@ -204,15 +219,29 @@ def _create_workspace_aurora(request: CreateWorkspaceAuroraRequest, config: dict
     if request.metric not in ["inner", "cosine", "l2"]:
         raise genai_core.types.CommonError("Invalid metric")
 
-    if request.chunkingStrategy not in ["recursive"]:
+    if request.chunkingStrategy not in ["recursive", "token"]:
         raise genai_core.types.CommonError("Invalid chunking strategy")
 
     if request.chunkSize < 100 or request.chunkSize > 10000:
         raise genai_core.types.CommonError("Invalid chunk size")
 
+    # Token chunks have to fit the input of the embeddings model
+    if (
+        request.chunkingStrategy == "token"
+        and request.chunkSize
+        > genai_core.embeddings.get_model_token_limit(request.embeddingsModelName)
+    ):
+        raise genai_core.types.CommonError("Invalid chunk size")
+
     if request.chunkOverlap < 0 or request.chunkOverlap >= request.chunkSize:
         raise genai_core.types.CommonError("Invalid chunk overlap")
 
+    if request.rankFusion not in [None, "none", "rrf", "weighted"]:
+        raise genai_core.types.CommonError("Invalid rank fusion")
+
+    if request.indexType not in [None, "ivfflat", "hnsw"]:
+        raise genai_core.types.CommonError("Invalid index type")
+
     return _convert_workspace(
         genai_core.workspaces.create_workspace_aurora(
             workspace_name=workspace_name,
@@ -228,6 +257,8 @@ def _create_workspace_aurora(request: CreateWorkspaceAuroraRequest, config: dict
             chunking_strategy=request.chunkingStrategy,
             chunk_size=request.chunkSize,
             chunk_overlap=request.chunkOverlap,
+            rank_fusion=request.rankFusion or "none",
+            search_settings=_get_search_settings(request),
         )
     )
 
@@ -268,15 +299,26 @@ def _create_workspace_open_search(
     if len(request.languages) == 0 or len(request.languages) > 3:
         raise genai_core.types.CommonError("Invalid languages")
 
-    if request.chunkingStrategy not in ["recursive"]:
+    if request.chunkingStrategy not in ["recursive", "token"]:
         raise genai_core.types.CommonError("Invalid chunking strategy")
 
     if request.chunkSize < 100 or request.chunkSize > 10000:
         raise genai_core.types.CommonError("Invalid chunk size")
 
+    # Token chunks have to fit the input of the embeddings model
+    if (
+        request.chunkingStrategy == "token"
+        and request.chunkSize
+        > genai_core.embeddings.get_model_token_limit(request.embeddingsModelName)
+    ):
+        raise genai_core.types.CommonError("Invalid chunk size")
+
     if request.chunkOverlap < 0 or request.chunkOverlap >= request.chunkSize:
         raise genai_core.types.CommonError("Invalid chunk overlap")
 
+    if request.rankFusion not in [None, "none", "rrf", "weighted"]:
+        raise genai_core.types.CommonError("Invalid rank fusion")
+
     return _convert_workspace(
         genai_core.workspaces.create_workspace_open_search(
             workspace_name=workspace_name,
@@ -290,6 +332,8 @@ def _create_workspace_open_search(
             chunking_strategy=request.chunkingStrategy,
             chunk_size=request.chunkSize,
             chunk_overlap=request.chunkOverlap,
+            rank_fusion=request.rankFusion or "none",
+            search_settings=_get_search_settings(request),
         )
     )
 
@@ -340,6 +384,27 @@ def _create_workspace_bedrock_kb(
     )
 
 
+def _get_search_settings(request: BaseModel):
+    fields = {
+        "vectorSearchLimit": "vector_search_limit",
+        "keywordSearchLimit": "keyword_search_limit",
+        "vectorSearchK": "vector_search_k",
+        "efSearch": "ef_search",
+        "indexType": "index_type",
+        "ivfflatLists": "ivfflat_lists",
+        "ivfflatProbes": "ivfflat_probes",
+        "hnswM": "hnsw_m",
+        "hnswEfConstruction": "hnsw_ef_construction",
+    }
+    values = {
+        key: getattr(request, field)
+        for field, key in fields.items()
+        if getattr(request, field, None) is not None
+    }
+
+    return genai_core.types.SearchSettings(**values)
+
+
 def _convert_workspace(workspace: dict):
     kendra_index_external = workspace.get("kendra_index_external")
 
@@ -357,6 +422,17 @@ def _convert_workspace(workspace: dict):
         "metric": workspace.get("metric"),
         "index": workspace.get("has_index"),
         "hybridSearch": workspace.get("hybrid_search"),
+        "rankFusion": workspace.get("rank_fusion"),
+        "vectorSearchLimit": workspace.get("vector_search_limit"),
+        "keywordSearchLimit": workspace.get("keyword_search_limit"),
+        "vectorSearchK": workspace.get("vector_search_k"),
+        "efSearch": workspace.get("ef_search"),
+        "ivfflatLists": workspace.get("ivfflat_lists"),
+        "ivfflatProbes": workspace.get("ivfflat_probes"),
+        "indexType": workspace.get("index_type"),
+        "hnswM": workspace.get("hnsw_m"),
+        "hnswEfConstruction": workspace.get("hnsw_ef_construction"),
+        "vectorIndexVectors": workspace.get("vector_index_vectors"),
         "chunkingStrategy": workspace.get("chunking_strategy"),
         "chunkSize": workspace.get("chunk_size"),
         "chunkOverlap": workspace.get("chunk_overlap"),
@@ -99,6 +99,8 @@ export class ApiResolvers extends Construct {
             props.ragEngines?.documentsByCompountKeyIndexName ?? "",
           DOCUMENTS_BY_STATUS_INDEX:
             props.ragEngines?.documentsByStatusIndexName ?? "",
+          EMBEDDINGS_CACHE_TABLE_NAME:
+            props.ragEngines?.embeddingsCacheTable.tableName ?? "",
           SAGEMAKER_RAG_MODELS_ENDPOINT:
             props.ragEngines?.sageMakerRagModels?.model?.endpoint
               ?.attrEndpointName ?? "",
@@ -151,6 +153,10 @@ export class ApiResolvers extends Construct {
         props.ragEngines.workspacesTable.grantReadWriteData(apiHandler);
       }
 
+      if (props.ragEngines?.embeddingsCacheTable) {
+        props.ragEngines.embeddingsCacheTable.grantReadWriteData(apiHandler);
+      }
+
       if (props.ragEngines?.documentsTable) {
         props.ragEngines.documentsTable.grantReadWriteData(apiHandler);
         props.ragEngines?.dataImport.rssIngestorFunction?.grantInvoke(
@@ -8,6 +8,9 @@ interface LayerProps {
   architecture: lambda.Architecture;
   path: string;
   autoUpgrade?: boolean;
+  // tiktoken encodings stored in the layer, Lambda functions cannot
+  // download them at runtime without internet access
+  tiktokenEncodings?: string[];
 }
 
 export class Layer extends Construct {
@@ -16,13 +19,22 @@ export class Layer extends Construct {
   constructor(scope: Construct, id: string, props: LayerProps) {
     super(scope, id);
 
-    const { runtime, architecture, path, autoUpgrade } = props;
+    const { runtime, architecture, path, autoUpgrade, tiktokenEncodings } =
+      props;
 
     const args = ["-t /asset-output/python", "--no-cache-dir"];
     if (autoUpgrade) {
       args.push("--upgrade");
     }
 
+    // Read from /opt/python/tiktoken_cache by genai_core.embeddings
+    const tiktokenCommands = tiktokenEncodings?.length
+      ? [
+          `export TIKTOKEN_CACHE_DIR=/asset-output/python/tiktoken_cache`,
+          `PYTHONPATH=/asset-output/python python -c "import sys, tiktoken; [tiktoken.get_encoding(x) for x in sys.argv[1:]]" ${tiktokenEncodings.join(" ")}`,
+        ]
+      : [];
+
     const layerAsset = new s3assets.Asset(this, "LayerAsset", {
       path,
       bundling: {
@@ -38,6 +50,7 @@ export class Layer extends Construct {
             `curl --proto '=https' --tlsv1.2 -sSf https://sh.rustup.rs | sh -s -- -y --no-modify-path`,
             `export PATH="/tmp/.cargo/bin:$PATH"`,
             `pip install -r requirements.txt ${args.join(" ")}`,
+            ...tiktokenCommands,
             `cd /asset-output/python`,
             // Remove sqlalchemy, used by Langchain when storing the memory using sql
             `rm -rf sqlalchemy*`,
@@ -92,6 +92,8 @@ export class FileImportBatchJob extends Construct {
             props.ragDynamoDBTables.documentsTable.tableName ?? "",
           DOCUMENTS_BY_COMPOUND_KEY_INDEX_NAME:
             props.ragDynamoDBTables.documentsByCompoundKeyIndexName ?? "",
+          EMBEDDINGS_CACHE_TABLE_NAME:
+            props.ragDynamoDBTables.embeddingsCacheTable.tableName,
           SAGEMAKER_RAG_MODELS_ENDPOINT:
             props.sageMakerRagModelsEndpoint?.attrEndpointName ?? "",
           OPEN_SEARCH_COLLECTION_ENDPOINT:
@@ -128,6 +130,9 @@ export class FileImportBatchJob extends Construct {
     props.ragDynamoDBTables.documentsTable.grantReadWriteData(
       fileImportJobRole
     );
+    props.ragDynamoDBTables.embeddingsCacheTable.grantReadWriteData(
+      fileImportJobRole
+    );
 
     if (props.auroraDatabase) {
       props.auroraDatabase.grantConnect(
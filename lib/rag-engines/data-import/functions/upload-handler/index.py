@@ -1,20 +1,33 @@
 import os
 import json
+import uuid
 import boto3
 import urllib.parse
 import genai_core.documents
 import genai_core.workspaces
 from aws_lambda_powertools import Logger, Tracer
-from aws_lambda_powertools.utilities.data_classes import SQSEvent, event_source
+from aws_lambda_powertools.utilities.batch import BatchProcessor, EventType
+from aws_lambda_powertools.utilities.data_classes.sqs_event import SQSRecord
 from aws_lambda_powertools.utilities.typing import LambdaContext
 
+processor = BatchProcessor(event_type=EventType.SQS)
 logger = Logger()
 tracer = Tracer()
 
 sfn_client = boto3.client("stepfunctions")
+batch_client = boto3.client("batch")
 s3 = boto3.client("s3")
 
 FILE_IMPORT_WORKFLOW_ARN = os.environ.get("FILE_IMPORT_WORKFLOW_ARN")
+FILE_IMPORT_JOB_QUEUE_ARN = os.environ.get("FILE_IMPORT_JOB_QUEUE_ARN")
+FILE_IMPORT_JOB_DEFINITION_ARN = os.environ.get("FILE_IMPORT_JOB_DEFINITION_ARN")
+# Uploads received together with at least this many small files are imported
+# by a single batch job instead of a workflow execution per file.
+FILE_IMPORT_BATCH_MIN_FILES = int(os.environ.get("FILE_IMPORT_BATCH_MIN_FILES", "10"))
+FILE_IMPORT_BATCH_MAX_FILE_SIZE = int(
+    os.environ.get("FILE_IMPORT_BATCH_MAX_FILE_SIZE", str(10 * 1024 * 1024))
+)
+FILE_IMPORT_BATCH_TIMEOUT = 12 * 60 * 60
 PROCESSING_BUCKET_NAME = os.environ.get("PROCESSING_BUCKET_NAME")
 DEFAULT_KENDRA_S3_DATA_SOURCE_BUCKET_NAME = os.environ.get(
     "DEFAULT_KENDRA_S3_DATA_SOURCE_BUCKET_NAME"
@@ -23,13 +36,55 @@ DEFAULT_KENDRA_S3_DATA_SOURCE_BUCKET_NAME = os.environ.get(
 
 @tracer.capture_lambda_handler
 @logger.inject_lambda_context(log_event=True)
-@event_source(data_class=SQSEvent)
-def lambda_handler(event: SQSEvent, context: LambdaContext):
-    for sqs_record in event.records:
-        records = get_records_from_sqs_record(sqs_record)
-
-        for record in records:
-            process_record(record)
+def lambda_handler(event, context: LambdaContext):
+    imports = []
+
+    def record_handler(record: SQSRecord):
+        records = get_records_from_sqs_record(record)
+
+        for s3_record in records:
+            file_import = process_record(s3_record)
+            if file_import is not None:
+                imports.append(file_import)
+
+    # Only the failed messages are received again, a message is reported
+    # failed before its document is created. The whole batch is received
+    # again when every message failed.
+    with processor(records=event["Records"], handler=record_handler):
+        processor.process()
+
+    small_imports = [
+        file_import
+        for file_import in imports
+        if file_import["size_in_bytes"] <= FILE_IMPORT_BATCH_MAX_FILE_SIZE
+    ]
+    if (
+        FILE_IMPORT_JOB_QUEUE_ARN
+        and FILE_IMPORT_JOB_DEFINITION_ARN
+        and len(small_imports) >= FILE_IMPORT_BATCH_MIN_FILES
+    ):
+        try:
+            submit_import_job(small_imports)
+            imports = [x for x in imports if x not in small_imports]
+        except Exception as error:
+            logger.error(
+                f"Batch job not submitted, importing files one by one: {error}"
+            )
+
+    # The documents exist, a failed import is shown on the document instead
+    # of receiving the message again and creating it twice.
+    for file_import in imports:
+        try:
+            start_import_workflow(file_import)
+        except Exception as error:
+            logger.error(f"Import of {file_import['input_object_key']} failed: {error}")
+            genai_core.documents.set_status(
+                workspace_id=file_import["workspace_id"],
+                document_id=file_import["document_id"],
+                status="error",
+            )
+
+    return processor.response()
 
 
 def process_record(record):
@@ -95,21 +150,58 @@ def process_record(record):
         )
     else:
         processing_object_key = f"{workspace_id}/{document_id}/content.txt"
-        response = sfn_client.start_execution(
-            stateMachineArn=FILE_IMPORT_WORKFLOW_ARN,
-            input=json.dumps(
-                {
-                    "workspace_id": workspace_id,
-                    "document_id": document_id,
-                    "input_bucket_name": bucket_name,
-                    "input_object_key": object_key,
-                    "processing_bucket_name": PROCESSING_BUCKET_NAME,
-                    "processing_object_key": processing_object_key,
-                }
-            ),
-        )
+        return {
+            "workspace_id": workspace_id,
+            "document_id": document_id,
+            "input_bucket_name": bucket_name,
+            "input_object_key": object_key,
+            "processing_bucket_name": PROCESSING_BUCKET_NAME,
+            "processing_object_key": processing_object_key,
+            "size_in_bytes": object_size,
+        }
+
+
+def start_import_workflow(file_import: dict):
+    response = sfn_client.start_execution(
+        stateMachineArn=FILE_IMPORT_WORKFLOW_ARN,
+        input=json.dumps(
+            {key: value for key, value in file_import.items() if key != "size_in_bytes"}
+        ),
+    )
+
+    logger.info(response)
 
-        logger.info(response)
+
+def submit_import_job(file_imports: list):
+    manifest_id = str(uuid.uuid4())
+    manifest_object_key = f"manifests/{manifest_id}.json"
+
+    s3.put_object(
+        Body=json.dumps({"files": file_imports}),
+        Bucket=PROCESSING_BUCKET_NAME,
+        Key=manifest_object_key,
+        ContentType="application/json",
+    )
+
+    response = batch_client.submit_job(
+        jobName=f"FileImportBatch-{manifest_id}",
+        jobQueue=FILE_IMPORT_JOB_QUEUE_ARN,
+        jobDefinition=FILE_IMPORT_JOB_DEFINITION_ARN,
+        containerOverrides={
+            "environment": [
+                {"name": "MANIFEST_BUCKET_NAME", "value": PROCESSING_BUCKET_NAME},
+                {"name": "MANIFEST_OBJECT_KEY", "value": manifest_object_key},
+            ]
+        },
+        # The job definition timeout is sized for a single file
+        timeout={"attemptDurationSeconds": FILE_IMPORT_BATCH_TIMEOUT},
+    )
+
+    logger.info(
+        "Submitted file import batch job",
+        files=len(file_imports),
+        job_id=response["jobId"],
+    )
 
 
 def get_records_from_sqs_record(record):
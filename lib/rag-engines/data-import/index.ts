@@ -251,6 +251,9 @@ export class DataImport extends Construct {
           props.sageMakerRagModels?.model?.endpoint.attrEndpointName ?? "",
         FILE_IMPORT_WORKFLOW_ARN:
           fileImportWorkflow?.stateMachine.stateMachineArn ?? "",
+        FILE_IMPORT_JOB_QUEUE_ARN: fileImportBatchJob.jobQueue.jobQueueArn,
+        FILE_IMPORT_JOB_DEFINITION_ARN:
+          fileImportBatchJob.fileImportJob.jobDefinitionArn,
         DEFAULT_KENDRA_S3_DATA_SOURCE_BUCKET_NAME:
           props.kendraRetrieval?.kendraS3DataSourceBucket?.bucketName ?? "",
       },
@@ -268,6 +271,15 @@ export class DataImport extends Construct {
 
     ingestionQueue.grantConsumeMessages(uploadHandler);
     fileImportWorkflow.stateMachine.grantStartExecution(uploadHandler);
+    uploadHandler.addToRolePolicy(
+      new iam.PolicyStatement({
+        actions: ["batch:SubmitJob"],
+        resources: [
+          fileImportBatchJob.jobQueue.jobQueueArn,
+          fileImportBatchJob.fileImportJob.jobDefinitionArn,
+        ],
+      })
+    );
 
     if (props.config.bedrock?.roleArn) {
       uploadHandler.addToRolePolicy(
@@ -278,8 +290,14 @@ export class DataImport extends Construct {
       );
     }
 
+    // Bulk uploads reach the handler together and are imported by one
+    // batch job, see FILE_IMPORT_BATCH_MIN_FILES
     uploadHandler.addEventSource(
-      new lambdaEventSources.SqsEventSource(ingestionQueue)
+      new lambdaEventSources.SqsEventSource(ingestionQueue, {
+        batchSize: 100,
+        maxBatchingWindow: cdk.Duration.seconds(10),
+        reportBatchItemFailures: true,
+      })
     );
 
     this.uploadBucket = uploadBucket;
@@ -91,6 +91,8 @@ export class WebCrawlerBatchJob extends Construct {
             props.ragDynamoDBTables.documentsTable.tableName ?? "",
           DOCUMENTS_BY_COMPOUND_KEY_INDEX_NAME:
             props.ragDynamoDBTables.documentsByCompoundKeyIndexName ?? "",
+          EMBEDDINGS_CACHE_TABLE_NAME:
+            props.ragDynamoDBTables.embeddingsCacheTable.tableName,
           SAGEMAKER_RAG_MODELS_ENDPOINT:
             props.sageMakerRagModelsEndpoint?.attrEndpointName ?? "",
           OPEN_SEARCH_COLLECTION_ENDPOINT:
@@ -126,6 +128,9 @@ export class WebCrawlerBatchJob extends Construct {
     props.ragDynamoDBTables.documentsTable.grantReadWriteData(
       webCrawlerJobRole
     );
+    props.ragDynamoDBTables.embeddingsCacheTable.grantReadWriteData(
+      webCrawlerJobRole
+    );
 
     if (props.auroraDatabase) {
       props.auroraDatabase.grantConnect(
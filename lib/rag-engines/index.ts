@@ -26,6 +26,7 @@ export class RagEngines extends Construct {
   public readonly processingBucket: s3.Bucket;
   public readonly documentsTable: dynamodb.Table;
   public readonly workspacesTable: dynamodb.Table;
+  public readonly embeddingsCacheTable: dynamodb.Table;
   public readonly workspacesByObjectTypeIndexName: string;
   public readonly documentsByCompountKeyIndexName: string;
   public readonly documentsByStatusIndexName: string;
@@ -108,6 +109,7 @@ export class RagEngines extends Construct {
     this.processingBucket = dataImport.processingBucket;
     this.workspacesTable = tables.workspacesTable;
     this.documentsTable = tables.documentsTable;
+    this.embeddingsCacheTable = tables.embeddingsCacheTable;
     this.workspacesByObjectTypeIndexName =
       tables.workspacesByObjectTypeIndexName;
     this.documentsByCompountKeyIndexName =
@@ -12,6 +12,7 @@ export interface RagDynamoDBTablesProps {
 export class RagDynamoDBTables extends Construct {
   public readonly workspacesTable: dynamodb.Table;
   public readonly documentsTable: dynamodb.Table;
+  public readonly embeddingsCacheTable: dynamodb.Table;
   public readonly workspacesByObjectTypeIndexName: string =
     "by_object_type_idx";
   public readonly documentsByCompoundKeyIndexName: string =
@@ -105,7 +106,24 @@ export class RagDynamoDBTables extends Construct {
       },
     });
 
+    // Embeddings shared by the API and the import jobs, items expire
+    // through the expires_at TTL attribute and can always be recomputed.
+    const embeddingsCacheTable = new dynamodb.Table(this, "EmbeddingsCache", {
+      partitionKey: {
+        name: "cache_key",
+        type: dynamodb.AttributeType.STRING,
+      },
+      billingMode: dynamodb.BillingMode.PAY_PER_REQUEST,
+      encryption: props.kmsKey
+        ? dynamodb.TableEncryption.CUSTOMER_MANAGED
+        : dynamodb.TableEncryption.AWS_MANAGED,
+      encryptionKey: props.kmsKey,
+      timeToLiveAttribute: "expires_at",
+      removalPolicy: cdk.RemovalPolicy.DESTROY,
+    });
+
     this.workspacesTable = workspacesTable;
     this.documentsTable = documentsTable;
+    this.embeddingsCacheTable = embeddingsCacheTable;
   }
 }
@@ -24,6 +24,15 @@ export class SageMakerRagModels extends Construct {
       .filter((c) => c.provider === "sagemaker")
       .map((c) => c.name);
 
+    // Models are loaded on their first request, the default models are
+    // loaded when the endpoint starts instead.
+    const warmupModelIds = [
+      ...props.config.rag.embeddingsModels,
+      ...props.config.rag.crossEncoderModels,
+    ]
+      .filter((c) => c.provider === "sagemaker" && c.default)
+      .map((c) => c.name);
+
     if (
       sageMakerEmbeddingsModelIds?.length > 0 ||
       sageMakerCrossEncoderModelIds?.length > 0
@@ -46,6 +55,9 @@ export class SageMakerRagModels extends Construct {
           ],
           codeFolder: path.join(__dirname, "./model"),
           instanceType: "ml.g4dn.xlarge",
+          env: {
+            WARMUP_MODELS: warmupModelIds.join(","),
+          },
         },
       });
 
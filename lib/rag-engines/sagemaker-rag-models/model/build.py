@@ -0,0 +1,41 @@
+"""
+Exports the models of the archive to ONNX when the endpoint runs an ONNX
+backend (INFERENCE_BACKEND), so the endpoint loads the exports instead of
+exporting the models every time a container starts.
+
+Usage:
+    python build.py <model_dir>
+"""
+
+import os
+import sys
+
+import torch
+
+
+def main(model_dir):
+    os.environ.setdefault("ONNX_MODELS_DIR", os.path.join(model_dir, "onnx-models"))
+    # Read when the module is imported
+    import inference
+
+    if inference.INFERENCE_BACKEND not in inference.INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend {inference.INFERENCE_BACKEND}")
+
+    if inference.INFERENCE_BACKEND == "pytorch":
+        print("Nothing to export for the pytorch backend", flush=True)
+        return
+
+    device = torch.device("cpu")
+    registry = inference.create_model_registry(model_dir, device)
+
+    for model_id, loader in registry.loaders.items():
+        # Only the models deployed with the endpoint are in the archive
+        if not os.path.isdir(os.path.join(model_dir, model_id)):
+            continue
+
+        print(f"Exporting {model_id} to {inference.ONNX_MODELS_DIR}", flush=True)
+        loader(model_id)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1])
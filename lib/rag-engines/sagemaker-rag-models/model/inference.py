@@ -1,8 +1,14 @@
+import gc
 import os
+import json
 import torch
 import logging
+import tempfile
+import functools
 import torch.nn.functional as F
 from transformers import AutoModel, AutoModelForSequenceClassification, AutoTokenizer
+from transformers.modeling_outputs import BaseModelOutput, SequenceClassifierOutput
+from scheduling import MicroBatcher, ModelRegistry, run_bucketed
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -29,6 +35,31 @@ embeddings_models = [
 ]
 cross_encoder_models = ["cross-encoder/ms-marco-MiniLM-L-12-v2"]
 
+# Upper bound of padded tokens (batch size * longest sequence) per forward pass
+MAX_TOKENS_PER_BATCH = int(os.environ.get("MAX_TOKENS_PER_BATCH", "16384"))
+# Concurrent embeddings requests arriving within this window share a forward
+# pass. Disabled by default, the model server runs one request at a time per
+# worker unless it is configured with more threads.
+MICRO_BATCH_MAX_DELAY_MS = float(os.environ.get("MICRO_BATCH_MAX_DELAY_MS", "0"))
+MICRO_BATCH_MAX_INPUTS = int(os.environ.get("MICRO_BATCH_MAX_INPUTS", "64"))
+# pytorch, onnx or onnx-int8. The ONNX backends run the models with ONNX
+# Runtime on CPU, onnx-int8 adds dynamic int8 quantization of the weights.
+# The models are exported by build.py into the onnx-models folder of the
+# model archive, models missing there are exported into a temporary folder
+# when they are first loaded.
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "pytorch")
+INFERENCE_BACKENDS = ["pytorch", "onnx", "onnx-int8"]
+ONNX_MODELS_FOLDER = "onnx-models"
+ONNX_MODELS_DIR = os.environ.get("ONNX_MODELS_DIR")
+# Models are loaded on their first request, least recently used models are
+# unloaded above these limits (0 is no limit). Warmup is opt-in, models
+# listed in WARMUP_MODELS (comma separated, "*" for every model) are loaded
+# when the endpoint starts so their first request does not pay for the load.
+# Models loaded again after an eviction reuse the export in ONNX_MODELS_DIR.
+MAX_RESIDENT_MODELS = int(os.environ.get("MAX_RESIDENT_MODELS", "0"))
+MAX_RESIDENT_BYTES = int(os.environ.get("MAX_RESIDENT_BYTES", "0"))
+WARMUP_MODELS = os.environ.get("WARMUP_MODELS", "")
+
 
 def process_model_list(model_list):
     return list(map(lambda x: x.split("/")[-1], model_list))
@@ -46,48 +77,235 @@ def mean_pooling(model_output, attention_mask):
     )
 
 
-def model_fn(model_dir):
-    logger.info("model_fn")
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+def get_device():
+    if INFERENCE_BACKEND != "pytorch":
+        return torch.device("cpu")
 
-    config = {}
-    for model_id in process_model_list(embeddings_models):
-        embeddings_model_dir = f"{model_dir}/{model_id}"
-        embeddings_tokenizer = AutoTokenizer.from_pretrained(embeddings_model_dir)
-        embeddings_model = AutoModel.from_pretrained(embeddings_model_dir)
-        embeddings_model.eval()
-        embeddings_model.to(device)
+    return torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+
+class OnnxModel(object):
+    """ONNX Runtime session behind the call interface of the PyTorch models
+    used by embed and rank."""
+
+    def __init__(self, path, cross_encoder, size):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = (
+            onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        )
+        self.session = onnxruntime.InferenceSession(
+            path, options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [x.name for x in self.session.get_inputs()]
+        self.cross_encoder = cross_encoder
+        self.size = size
+
+    def __call__(self, **features):
+        inputs = {name: features[name].cpu().numpy() for name in self.input_names}
+        output = torch.from_numpy(self.session.run(None, inputs)[0])
+
+        if self.cross_encoder:
+            return SequenceClassifierOutput(logits=output)
+
+        return BaseModelOutput(last_hidden_state=output)
+
+
+def set_onnx_models_dir(model_dir):
+    global ONNX_MODELS_DIR
+
+    if ONNX_MODELS_DIR is None:
+        ONNX_MODELS_DIR = os.path.join(model_dir, ONNX_MODELS_FOLDER)
+        if not os.path.isdir(ONNX_MODELS_DIR):
+            ONNX_MODELS_DIR = os.path.join(tempfile.gettempdir(), ONNX_MODELS_FOLDER)
+
+
+def get_onnx_model_path(model_id, quantize):
+    name = "model.int8.onnx" if quantize else "model.onnx"
+
+    return os.path.join(ONNX_MODELS_DIR, model_id, name)
+
+
+def load_exported_onnx_model(model_id, cross_encoder, quantize):
+    # Written once the export is complete, an interrupted export is redone
+    info_path = get_onnx_model_path(model_id, quantize) + ".json"
+    if not os.path.exists(info_path):
+        return None
+
+    with open(info_path) as info_file:
+        info = json.load(info_file)
+
+    logger.info(f"Reusing the ONNX export of {model_id}")
+    # Relative to the info file, exports are built in another folder
+    path = os.path.join(os.path.dirname(info_path), info["path"])
+
+    return OnnxModel(path, cross_encoder, info["size"])
+
+
+def export_onnx_model(model, tokenizer, model_id, cross_encoder, quantize):
+    path = get_onnx_model_path(model_id, quantize=False)
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+
+    sample = tokenizer(["I love Berlin"], return_tensors="pt")
+    input_names = list(sample.keys())
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["output"] = (
+        {0: "batch"} if cross_encoder else {0: "batch", 1: "sequence"}
+    )
+
+    # Tuple outputs, tracing does not support the output dataclasses
+    model.config.return_dict = False
+    with torch.inference_mode():
+        torch.onnx.export(
+            model,
+            (dict(sample),),
+            path,
+            input_names=input_names,
+            output_names=["output"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantized_path = get_onnx_model_path(model_id, quantize=True)
+        # e5-large is above the 2GB protobuf limit
+        quantize_dynamic(
+            path,
+            quantized_path,
+            weight_type=QuantType.QInt8,
+            use_external_data_format=True,
+        )
+        path = quantized_path
+
+    logger.info(f"Exported {model_id} to {path}")
+
+    # Approximate, int8 weights take a quarter of the space
+    size = get_model_size(model) // (4 if quantize else 1)
+
+    with open(path + ".json", "w") as info_file:
+        json.dump({"path": os.path.basename(path), "size": size}, info_file)
 
-        model_config = {
-            "model": embeddings_model,
-            "tokenizer": embeddings_tokenizer,
-        }
+    return OnnxModel(path, cross_encoder, size)
 
-        config[model_id] = model_config
 
+def get_model_size(model):
+    if isinstance(model, OnnxModel):
+        return model.size
+
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+
+def load_model(model_class, model_dir, model_id, tokenizer, device):
+    cross_encoder = model_class is AutoModelForSequenceClassification
+    quantize = INFERENCE_BACKEND == "onnx-int8"
+
+    if INFERENCE_BACKEND != "pytorch":
+        model = load_exported_onnx_model(model_id, cross_encoder, quantize)
+        if model is not None:
+            return model
+
+    model = model_class.from_pretrained(model_dir)
+    model.eval()
+
+    if INFERENCE_BACKEND == "pytorch":
+        model.to(device)
+        return model
+
+    return export_onnx_model(model, tokenizer, model_id, cross_encoder, quantize)
+
+
+def load_embeddings_model(model_dir, model_id, device):
+    embeddings_model_dir = f"{model_dir}/{model_id}"
+    embeddings_tokenizer = AutoTokenizer.from_pretrained(embeddings_model_dir)
+    embeddings_model = load_model(
+        AutoModel, embeddings_model_dir, model_id, embeddings_tokenizer, device
+    )
+
+    model_config = {
+        "model": embeddings_model,
+        "tokenizer": embeddings_tokenizer,
+    }
+
+    if MICRO_BATCH_MAX_DELAY_MS > 0:
+        model_config["batcher"] = MicroBatcher(
+            lambda inputs: embed(
+                embeddings_model, embeddings_tokenizer, inputs, device
+            ),
+            MICRO_BATCH_MAX_DELAY_MS,
+            MICRO_BATCH_MAX_INPUTS,
+        )
+
+    return model_config
+
+
+def load_cross_encoder_model(model_dir, model_id, device):
+    cross_encoder_model_dir = os.path.join(model_dir, model_id)
+    cross_encoder_tokenizer = AutoTokenizer.from_pretrained(cross_encoder_model_dir)
+    cross_encoder_model = load_model(
+        AutoModelForSequenceClassification,
+        cross_encoder_model_dir,
+        model_id,
+        cross_encoder_tokenizer,
+        device,
+    )
+
+    return {
+        "model": cross_encoder_model,
+        "tokenizer": cross_encoder_tokenizer,
+    }
+
+
+def create_model_registry(model_dir, device, max_models=0, max_bytes=0):
+    loaders = {}
+    for model_id in process_model_list(embeddings_models):
+        loaders[model_id] = functools.partial(
+            load_embeddings_model, model_dir, device=device
+        )
     for model_id in process_model_list(cross_encoder_models):
-        cross_encoder_model_dir = os.path.join(model_dir, model_id)
-        cross_encoder_model = AutoModelForSequenceClassification.from_pretrained(
-            cross_encoder_model_dir
+        loaders[model_id] = functools.partial(
+            load_cross_encoder_model, model_dir, device=device
         )
-        cross_encoder_tokenizer = AutoTokenizer.from_pretrained(cross_encoder_model_dir)
 
-        cross_encoder_model.eval()
-        cross_encoder_model.to(device)
+    return ModelRegistry(
+        loaders, get_model_size, max_models, max_bytes, on_evict=free_memory
+    )
+
+
+def free_memory(evicted):
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+def model_fn(model_dir):
+    logger.info("model_fn")
+    if INFERENCE_BACKEND not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend {INFERENCE_BACKEND}")
 
-        model_config = {
-            "model": cross_encoder_model,
-            "tokenizer": cross_encoder_tokenizer,
-        }
+    set_onnx_models_dir(model_dir)
+    config = create_model_registry(
+        model_dir, get_device(), MAX_RESIDENT_MODELS, MAX_RESIDENT_BYTES
+    )
 
-        config[model_id] = model_config
+    if WARMUP_MODELS.strip() == "*":
+        warmup_models = embeddings_models + cross_encoder_models
+    else:
+        warmup_models = [x.strip() for x in WARMUP_MODELS.split(",") if x.strip()]
+    for model_id in process_model_list(warmup_models):
+        if config.get(model_id) is None:
+            raise ValueError(f"Model {model_id} not found")
 
     return config
 
 
 def predict_fn(input_object, config):
     logger.info("predict_fn")
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    device = get_device()
 
     current_model_id = input_object["model"].split("/")[-1]
     current_model_config = config.get(current_model_id)
@@ -105,46 +323,42 @@ def predict_fn(input_object, config):
             else:
                 current_input = "query: " + current_input
 
-        with torch.inference_mode():
-            encoded_input = current_tokenizer(
-                current_input,
-                padding=True,
-                truncation=True,
-                return_tensors="pt",
-            )
-
-            encoded_input = encoded_input.to(device)
-            model_output = current_model(**encoded_input)
+        if isinstance(current_input, list):
+            inputs = current_input
+        else:
+            inputs = [current_input]
 
-            input_embeddings = mean_pooling(
-                model_output, encoded_input["attention_mask"]
-            )
+        batcher = current_model_config.get("batcher")
+        if batcher is not None:
+            ret_value = batcher.submit(inputs)
+        else:
+            ret_value = embed(current_model, current_tokenizer, inputs, device)
 
-            input_embeddings = F.normalize(input_embeddings, p=2, dim=1)
-            response = input_embeddings.cpu().numpy()
-            ret_value = response.tolist()
-
-            return ret_value
+        return ret_value
     elif input_object["type"] == "cross-encoder":
         current_input = input_object["input"]
         passages = input_object["passages"]
         data = [[current_input, passage] for passage in passages]
 
-        with torch.inference_mode():
-            features = current_tokenizer(
-                data, padding=True, truncation=True, return_tensors="pt"
-            )
+        return rank(current_model, current_tokenizer, data, device)
 
-            features = features.to(device)
+    return []
 
-            scores = current_model(**features).logits.cpu().numpy()
-            ret_value = list(
-                map(
-                    lambda val: val[-1] if isinstance(val, list) else val,
-                    scores.tolist(),
-                )
-            )
 
-            return ret_value
+def embed(model, tokenizer, inputs, device):
+    def forward(features):
+        model_output = model(**features)
+        embeddings = mean_pooling(model_output, features["attention_mask"])
+        return F.normalize(embeddings, p=2, dim=1).cpu().numpy().tolist()
 
-    return []
+    with torch.inference_mode():
+        return run_bucketed(tokenizer, inputs, forward, device, MAX_TOKENS_PER_BATCH)
+
+
+def rank(model, tokenizer, data, device):
+    def forward(features):
+        scores = model(**features).logits.cpu().numpy().tolist()
+        return [val[-1] if isinstance(val, list) else val for val in scores]
+
+    with torch.inference_mode():
+        return run_bucketed(tokenizer, data, forward, device, MAX_TOKENS_PER_BATCH)
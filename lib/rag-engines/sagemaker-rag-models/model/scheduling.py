@@ -0,0 +1,203 @@
+"""
+Batching and model residency of the inference script, kept apart from the
+torch and transformers code so they can be tested without them.
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def bucket_by_length(lengths, max_tokens):
+    """Group input indexes into batches of similar length.
+
+    Inputs are sorted by token count so a long input does not pad the whole
+    request, and a batch is closed once its padded size would exceed
+    max_tokens. An input longer than max_tokens gets a batch of its own.
+    """
+    order = sorted(range(len(lengths)), key=lambda idx: lengths[idx])
+
+    batches = []
+    current = []
+    for idx in order:
+        # Sorted ascending, the new input is the longest of the batch
+        if current and (len(current) + 1) * lengths[idx] > max_tokens:
+            batches.append(current)
+            current = []
+
+        current.append(idx)
+
+    if current:
+        batches.append(current)
+
+    return batches
+
+
+def run_bucketed(tokenizer, data, forward, device, max_tokens):
+    """Tokenize data once, run forward on length bucketed batches and return
+    the outputs in the input order."""
+    encoded = tokenizer(data, truncation=True)
+    lengths = [len(input_ids) for input_ids in encoded["input_ids"]]
+
+    outputs = [None] * len(lengths)
+    for batch in bucket_by_length(lengths, max_tokens):
+        features = tokenizer.pad(
+            {key: [encoded[key][idx] for idx in batch] for key in encoded.keys()},
+            padding=True,
+            return_tensors="pt",
+        )
+        features = features.to(device)
+
+        for idx, output in zip(batch, forward(features)):
+            outputs[idx] = output
+
+    return outputs
+
+
+class MicroBatcher(object):
+    """Coalesces concurrent calls into one call of `fn` on the concatenated
+    inputs.
+
+    The first caller waits up to max_delay_ms for others to join, then runs
+    fn for everybody and hands every caller its own slice of the results.
+    """
+
+    def __init__(self, fn, max_delay_ms, max_inputs):
+        self.fn = fn
+        self.max_delay = max_delay_ms / 1000
+        self.max_inputs = max_inputs
+        self._lock = threading.Condition()
+        self._pending = []
+
+    def submit(self, inputs):
+        request = {"inputs": inputs, "done": threading.Event()}
+
+        with self._lock:
+            self._pending.append(request)
+            leader = len(self._pending) == 1
+            if not leader:
+                self._lock.notify_all()
+
+        if leader:
+            self._run()
+
+        request["done"].wait()
+        if "error" in request:
+            raise request["error"]
+
+        return request["outputs"]
+
+    def _run(self):
+        deadline = time.monotonic() + self.max_delay
+        with self._lock:
+            while sum(len(x["inputs"]) for x in self._pending) < self.max_inputs:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+
+                self._lock.wait(remaining)
+
+            requests = self._pending
+            self._pending = []
+
+        try:
+            outputs = self.fn([item for x in requests for item in x["inputs"]])
+            start = 0
+            for request in requests:
+                end = start + len(request["inputs"])
+                request["outputs"] = outputs[start:end]
+                start = end
+        except Exception as e:
+            for request in requests:
+                request["error"] = e
+        finally:
+            for request in requests:
+                request["done"].set()
+
+
+class ModelRegistry(object):
+    """Loads models on their first use and keeps the most recently used ones
+    within max_models and max_bytes.
+
+    loaders maps a model id to a function loading its model config, a dict
+    holding the model under "model". get_size returns the bytes used by a
+    model and on_evict is called with the ids of the unloaded models.
+
+    get() returns the model config, or None for unknown models. Requests
+    already holding an unloaded model keep using it until they end.
+    """
+
+    def __init__(self, loaders, get_size, max_models=0, max_bytes=0, on_evict=None):
+        self.loaders = loaders
+        self.get_size = get_size
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {model_id: threading.Lock() for model_id in self.loaders}
+
+    def get(self, model_id):
+        if model_id not in self.loaders:
+            return None
+
+        model_config = self._get_loaded(model_id)
+        if model_config is not None:
+            return model_config
+
+        # Requests for other models are not blocked by the load
+        with self._load_locks[model_id]:
+            model_config = self._get_loaded(model_id)
+            if model_config is not None:
+                return model_config
+
+            start = time.perf_counter()
+            model_config = self.loaders[model_id](model_id)
+            model_config["size"] = self.get_size(model_config["model"])
+            logger.info(
+                f"Loaded {model_id} ({model_config['size']} bytes) "
+                + f"in {time.perf_counter() - start:.1f}s"
+            )
+
+            with self._lock:
+                self._models[model_id] = model_config
+                evicted = self._evict()
+
+        if evicted:
+            logger.info(f"Unloaded {', '.join(evicted)}")
+            if self.on_evict is not None:
+                self.on_evict(evicted)
+
+        return model_config
+
+    def loaded_models(self):
+        with self._lock:
+            return list(self._models.keys())
+
+    def _get_loaded(self, model_id):
+        with self._lock:
+            model_config = self._models.get(model_id)
+            if model_config is not None:
+                self._models.move_to_end(model_id)
+
+            return model_config
+
+    def _evict(self):
+        evicted = []
+        # The model loaded last is never evicted
+        while len(self._models) > 1:
+            size = sum(x["size"] for x in self._models.values())
+            too_many = self.max_models > 0 and len(self._models) > self.max_models
+            too_big = self.max_bytes > 0 and size > self.max_bytes
+            if not too_many and not too_big:
+                break
+
+            model_id, _ = self._models.popitem(last=False)
+            evicted.append(model_id)
+
+        return evicted
@@ -1,5 +1,6 @@
 import os
 import shutil
+import sys
 
 # Needed since it is a build script
 # that runs during deployment.
@@ -53,6 +54,24 @@ for model_id in models_list:
 
     print(f"Model snapshot downloaded to: {model_folder}", flush=True)
 
+# The model code can prepare the downloaded models further (e.g. export them
+# to another format) with a build.py and its own build-requirements.txt
+build_hook = model_code_folder.joinpath("build.py")
+if build_hook.exists():
+    build_requirements = model_code_folder.joinpath("build-requirements.txt")
+    if build_requirements.exists():
+        print(f"Installing build requirements: {build_requirements}", flush=True)
+        subprocess.run(
+            [sys.executable, "-m", "pip", "install", "-r", str(build_requirements)],
+            check=True,
+        )  # nosec B603 Command is not user provided
+
+    print(f"Running build hook: {build_hook}", flush=True)
+    subprocess.run(
+        [sys.executable, str(build_hook), str(out_folder.resolve())],
+        check=True,
+        cwd=str(model_code_folder),
+    )  # nosec B603 Command is not user provided
 
 print(f"Compressing the out folder: {out_folder}", flush=True)
 
@@ -184,6 +184,10 @@ export class HuggingFaceCustomScriptModel extends Construct {
         HF_HUB_DISABLE_TELEMETRY: {
           value: "1",
         },
+        // The build hook of the model code sees the endpoint environment
+        ...Object.fromEntries(
+          Object.entries(env ?? {}).map(([key, value]) => [key, { value }])
+        ),
       },
     });
 
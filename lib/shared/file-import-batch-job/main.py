@@ -1,10 +1,21 @@
 import os
+import csv
+import json
+import uuid
 import boto3
+import codecs
+import tempfile
+import itertools
+import multiprocessing
 import genai_core.types
 import genai_core.chunks
+import genai_core.embeddings
 import genai_core.documents
 import genai_core.workspaces
 import genai_core.aurora.create
+import genai_core.aurora.connection
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from genai_core.types import Task
 from langchain_community.document_loaders import S3FileLoader
 
 WORKSPACE_ID = os.environ.get("WORKSPACE_ID")
@@ -13,11 +24,25 @@ INPUT_BUCKET_NAME = os.environ.get("INPUT_BUCKET_NAME")
 INPUT_OBJECT_KEY = os.environ.get("INPUT_OBJECT_KEY")
 PROCESSING_BUCKET_NAME = os.environ.get("PROCESSING_BUCKET_NAME")
 PROCESSING_OBJECT_KEY = os.environ.get("PROCESSING_OBJECT_KEY")
+# Batch mode, the files listed in the manifest are imported by one job
+MANIFEST_BUCKET_NAME = os.environ.get("MANIFEST_BUCKET_NAME")
+MANIFEST_OBJECT_KEY = os.environ.get("MANIFEST_OBJECT_KEY")
+FILE_IMPORT_PROCESSES = int(
+    os.environ.get("FILE_IMPORT_PROCESSES", str(os.cpu_count() or 1))
+)
+# Chunks embedded and written together, bounds the memory used by the job
+FILE_IMPORT_BATCH_SIZE = int(os.environ.get("FILE_IMPORT_BATCH_SIZE", "500"))
+# Characters of text or CSV records read at a time
+FILE_IMPORT_BLOCK_SIZE = int(os.environ.get("FILE_IMPORT_BLOCK_SIZE", "1048576"))
+CHECKPOINT_OBJECT_KEY = f"{WORKSPACE_ID}/{DOCUMENT_ID}/import-checkpoint.json"
 
 s3_client = boto3.client("s3")
 
 
 def main():
+    if MANIFEST_OBJECT_KEY:
+        return import_manifest()
+
     print("Starting file converter batch job")
     print("Workspace ID: {}".format(WORKSPACE_ID))
     print("Document ID: {}".format(DOCUMENT_ID))
@@ -37,44 +62,385 @@ def main():
         )
 
     try:
-        extension = os.path.splitext(INPUT_OBJECT_KEY)[-1].lower()
-        if extension == ".txt":
-            object = s3_client.get_object(
-                Bucket=INPUT_BUCKET_NAME, Key=INPUT_OBJECT_KEY
-            )
-            content = object["Body"].read().decode("utf-8")
-        else:
-            loader = S3FileLoader(INPUT_BUCKET_NAME, INPUT_OBJECT_KEY)
-            print(f"loader: {loader}")
-            docs = loader.load()
-            content = docs[0].page_content
+        etag = s3_client.head_object(Bucket=INPUT_BUCKET_NAME, Key=INPUT_OBJECT_KEY)[
+            "ETag"
+        ]
+        segments = load_segments(INPUT_BUCKET_NAME, INPUT_OBJECT_KEY)
 
         if (
             INPUT_BUCKET_NAME != PROCESSING_BUCKET_NAME
             and INPUT_OBJECT_KEY != PROCESSING_OBJECT_KEY
         ):
-            s3_client.put_object(
-                Bucket=PROCESSING_BUCKET_NAME, Key=PROCESSING_OBJECT_KEY, Body=content
-            )
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8") as content_file:
+                add_chunks(
+                    workspace, document, write_segments(segments, content_file), etag
+                )
+                content_file.flush()
+                s3_client.upload_file(
+                    content_file.name, PROCESSING_BUCKET_NAME, PROCESSING_OBJECT_KEY
+                )
+        else:
+            add_chunks(workspace, document, segments, etag)
 
-        add_chunks(workspace, document, content)
+        genai_core.chunks.update_vector_index(WORKSPACE_ID)
     except Exception as error:
         genai_core.documents.set_status(WORKSPACE_ID, DOCUMENT_ID, "error")
         print(error)
         raise error
+    finally:
+        genai_core.aurora.connection.close_connection_pool()
+
+
+def load_segments(bucket_name: str, object_key: str):
+    """Read the input file a page, a block of records or a block of lines at
+    a time."""
+    extension = os.path.splitext(object_key)[-1].lower()
+    if extension == ".txt":
+        object = s3_client.get_object(Bucket=bucket_name, Key=object_key)
+        return read_text_blocks(object["Body"])
+
+    if extension == ".csv":
+        return read_csv_blocks(bucket_name, object_key)
+
+    loader = S3FileLoader(bucket_name, object_key, mode="elements")
+    print(f"loader: {loader}")
+    return read_pages(loader.lazy_load())
+
+
+def read_text_blocks(body):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    for data in body.iter_chunks(FILE_IMPORT_BLOCK_SIZE):
+        pending += decoder.decode(data)
+        # Blocks are cut on line breaks, which are dropped as segments are
+        # joined with one, unless a line is very long
+        end = pending.rfind("\n")
+        if end >= 0:
+            yield pending[:end]
+            pending = pending[end + 1 :]
+        elif len(pending) >= FILE_IMPORT_BLOCK_SIZE:
+            yield pending
+            pending = ""
+
+    yield pending + decoder.decode(b"", final=True)
+
+
+def read_csv_blocks(bucket_name: str, object_key: str):
+    with tempfile.NamedTemporaryFile() as csv_file:
+        s3_client.download_file(bucket_name, object_key, csv_file.name)
+
+        with open(csv_file.name, newline="", encoding="utf-8-sig") as records:
+            block = []
+            block_size = 0
+            for record in csv.reader(records):
+                line = ", ".join(record)
+                block.append(line)
+                block_size += len(line)
+
+                if block_size >= FILE_IMPORT_BLOCK_SIZE:
+                    yield "\n".join(block)
+                    block = []
+                    block_size = 0
+
+            if block:
+                yield "\n".join(block)
+
+
+def read_pages(elements):
+    """Join the elements of each page like the single mode of the loader."""
+    page = []
+    page_number = None
+    for element in elements:
+        element_page_number = element.metadata.get("page_number")
+        if page and element_page_number != page_number:
+            yield "\n\n".join(page)
+            page = []
+
+        page.append(element.page_content)
+        page_number = element_page_number
+
+    if page:
+        yield "\n\n".join(page)
+
 
+def write_segments(segments, content_file):
+    """Copy the extracted text to content_file while it is being imported."""
+    for idx, segment in enumerate(segments):
+        if idx > 0:
+            content_file.write("\n")
 
-def add_chunks(workspace: dict, document: dict, content: str):
-    chunks = genai_core.chunks.split_content(workspace, content)
+        content_file.write(segment)
+        yield segment
 
-    genai_core.chunks.add_chunks(
-        workspace=workspace,
-        document=document,
-        document_sub_id=None,
-        chunks=chunks,
-        chunk_complements=None,
-        replace=True,
+
+def add_chunks(workspace: dict, document: dict, segments, etag: str):
+    """Split, embed and store the document in batches of
+    FILE_IMPORT_BATCH_SIZE chunks.
+
+    Progress is checkpointed on S3 after each batch, a retried job skips the
+    chunks already stored if the input file did not change. Chunk ids only
+    depend on the document, the file and the chunk position, chunks a killed
+    job stored after its last checkpoint are removed before resuming.
+    """
+    document_id = document["document_id"]
+    checkpoint = get_checkpoint(etag)
+    imported = checkpoint["chunks"] if checkpoint else 0
+    if imported > 0:
+        print(f"Resuming after {imported} chunks")
+        resume_import(workspace, document, etag, imported)
+
+    chunks = genai_core.chunks.split_content_stream(workspace, segments)
+    chunks = itertools.islice(chunks, imported, None)
+    # The first batch of a new import replaces the chunks of the document
+    replace = checkpoint is None
+
+    while True:
+        batch = list(itertools.islice(chunks, FILE_IMPORT_BATCH_SIZE))
+        if len(batch) == 0 and not replace:
+            break
+
+        genai_core.chunks.add_chunks(
+            workspace=workspace,
+            document=document,
+            document_sub_id=None,
+            chunks=batch,
+            chunk_complements=None,
+            replace=replace,
+            chunk_ids=get_chunk_ids(document_id, etag, imported, len(batch)),
+        )
+
+        if len(batch) == 0:
+            break
+
+        replace = False
+        imported += len(batch)
+        put_checkpoint(etag, imported)
+        print(f"Imported {imported} chunks")
+
+    delete_checkpoint()
+
+
+def get_chunk_ids(document_id: str, etag: str, start: int, count: int):
+    return [
+        str(uuid.uuid5(uuid.NAMESPACE_URL, f"{document_id}/{etag}/{idx}"))
+        for idx in range(start, start + count)
+    ]
+
+
+def resume_import(workspace: dict, document: dict, etag: str, imported: int):
+    workspace_id = workspace["workspace_id"]
+    document_id = document["document_id"]
+
+    chunk_ids = get_chunk_ids(document_id, etag, 0, imported)
+    removed = genai_core.chunks.remove_chunks(
+        workspace, document_id, keep_chunk_ids=chunk_ids
     )
+    if removed > 0:
+        print(f"Removed {removed} chunks stored after the checkpoint")
+    removed = genai_core.chunks.remove_chunks_on_s3(
+        workspace_id, document_id, None, keep_chunk_ids=chunk_ids
+    )
+    if removed > 0:
+        print(f"Removed {removed} chunk objects stored after the checkpoint")
+
+    # The killed job may have counted chunks of the batch it did not finish
+    vectors = int(document.get("vectors", 0))
+    if vectors != imported:
+        genai_core.documents.set_document_vectors(
+            workspace_id, document_id, imported - vectors, replace=False
+        )
+
+
+def get_checkpoint(etag: str):
+    try:
+        object = s3_client.get_object(
+            Bucket=PROCESSING_BUCKET_NAME, Key=CHECKPOINT_OBJECT_KEY
+        )
+    except s3_client.exceptions.NoSuchKey:
+        return None
+
+    checkpoint = json.loads(object["Body"].read())
+    if checkpoint.get("etag") != etag:
+        return None
+
+    return checkpoint
+
+
+def put_checkpoint(etag: str, chunks: int):
+    s3_client.put_object(
+        Bucket=PROCESSING_BUCKET_NAME,
+        Key=CHECKPOINT_OBJECT_KEY,
+        Body=json.dumps({"etag": etag, "chunks": chunks}),
+    )
+
+
+def delete_checkpoint():
+    s3_client.delete_object(Bucket=PROCESSING_BUCKET_NAME, Key=CHECKPOINT_OBJECT_KEY)
+
+
+def import_manifest():
+    """Import many small files in one job.
+
+    The manifest lists files with the fields of the file import workflow
+    input. A pool of FILE_IMPORT_PROCESSES processes reads and splits them
+    while this process embeds the chunks of several files per request and
+    stores them. A failed file is set to error without stopping the others,
+    files already processed by a previous attempt are skipped.
+    """
+    print(f"Starting file import batch job for {MANIFEST_OBJECT_KEY}")
+    object = s3_client.get_object(Bucket=MANIFEST_BUCKET_NAME, Key=MANIFEST_OBJECT_KEY)
+    files = json.loads(object["Body"].read())["files"]
+
+    workspaces = {}
+    writers = {}
+    failed = 0
+    # Spawned workers do not inherit the clients and connections of this one
+    context = multiprocessing.get_context("spawn")
+
+    try:
+        with ProcessPoolExecutor(FILE_IMPORT_PROCESSES, mp_context=context) as executor:
+            futures = {}
+            for file in files:
+                workspace_id = file["workspace_id"]
+                if workspace_id not in workspaces:
+                    workspaces[workspace_id] = genai_core.workspaces.get_workspace(
+                        workspace_id
+                    )
+
+                workspace = workspaces[workspace_id]
+                document = genai_core.documents.get_document(
+                    workspace_id, file["document_id"]
+                )
+                if not workspace or not document:
+                    print(f"Skipping {file['input_object_key']}, not found")
+                    continue
+
+                if document["status"] == "processed":
+                    continue
+
+                genai_core.documents.set_status(
+                    workspace_id, file["document_id"], "processing"
+                )
+                future = executor.submit(read_and_split, workspace, file)
+                futures[future] = (file, document)
+
+            for future in as_completed(futures):
+                file, document = futures[future]
+                workspace_id = file["workspace_id"]
+
+                try:
+                    chunks = future.result()
+                except Exception as error:
+                    print(f"Failed to read {file['input_object_key']}: {error}")
+                    genai_core.documents.set_status(
+                        workspace_id, file["document_id"], "error"
+                    )
+                    failed += 1
+                    continue
+
+                if workspace_id not in writers:
+                    writers[workspace_id] = ChunksWriter(workspaces[workspace_id])
+
+                failed += writers[workspace_id].add(document, chunks)
+
+        for workspace_id, writer in writers.items():
+            failed += writer.flush()
+            genai_core.chunks.update_vector_index(workspace_id)
+    finally:
+        genai_core.aurora.connection.close_connection_pool()
+
+    # Failed files are set to error, a retried job only needs the manifest
+    # when this attempt raised
+    s3_client.delete_object(Bucket=MANIFEST_BUCKET_NAME, Key=MANIFEST_OBJECT_KEY)
+    print(f"Imported {len(files) - failed} files, {failed} failed")
+
+
+def read_and_split(workspace: dict, file: dict):
+    """Runs in a worker process, returns the chunks of a file and stores the
+    extracted text like the single file import."""
+    segments = list(load_segments(file["input_bucket_name"], file["input_object_key"]))
+
+    if (
+        file["input_bucket_name"] != file["processing_bucket_name"]
+        and file["input_object_key"] != file["processing_object_key"]
+    ):
+        s3_client.put_object(
+            Bucket=file["processing_bucket_name"],
+            Key=file["processing_object_key"],
+            Body="\n".join(segments),
+        )
+
+    return list(genai_core.chunks.split_content_stream(workspace, segments))
+
+
+class ChunksWriter(object):
+    """Embeds the chunks of the documents of a workspace FILE_IMPORT_BATCH_SIZE
+    at a time and stores them per document."""
+
+    def __init__(self, workspace: dict):
+        self.workspace = workspace
+        self.embeddings_model = genai_core.embeddings.get_embeddings_model(
+            workspace["embeddings_model_provider"], workspace["embeddings_model_name"]
+        )
+        self.pending = []
+        self.pending_chunks = 0
+
+    def add(self, document: dict, chunks: list) -> int:
+        self.pending.append((document, chunks))
+        self.pending_chunks += len(chunks)
+
+        if self.pending_chunks >= FILE_IMPORT_BATCH_SIZE:
+            return self.flush()
+
+        return 0
+
+    def flush(self) -> int:
+        """Stores the pending documents, returns the number of failures."""
+        pending = self.pending
+        self.pending = []
+        self.pending_chunks = 0
+        if len(pending) == 0:
+            return 0
+
+        chunks = [chunk for _, document_chunks in pending for chunk in document_chunks]
+        try:
+            embeddings = genai_core.embeddings.generate_embeddings(
+                self.embeddings_model, chunks, Task.STORE.value
+            )
+        except Exception as error:
+            print(f"Failed to embed {len(pending)} files: {error}")
+            for document, _ in pending:
+                self._set_status(document, "error")
+            return len(pending)
+
+        failed = 0
+        start = 0
+        for document, document_chunks in pending:
+            end = start + len(document_chunks)
+            try:
+                genai_core.chunks.add_chunks(
+                    workspace=self.workspace,
+                    document=document,
+                    document_sub_id=None,
+                    chunks=document_chunks,
+                    chunk_complements=None,
+                    replace=True,
+                    chunk_embeddings=embeddings[start:end],
+                )
+                self._set_status(document, "processed")
+            except Exception as error:
+                print(f"Failed to store {document['path']}: {error}")
+                self._set_status(document, "error")
+                failed += 1
+
+            start = end
+
+        return failed
+
+    def _set_status(self, document: dict, status: str):
+        genai_core.documents.set_status(
+            document["workspace_id"], document["document_id"], status
+        )
 
 
 if __name__ == "__main__":
@@ -275,6 +275,7 @@ export class Shared extends Construct {
       runtime: pythonRuntime,
       architecture: lambdaArchitecture,
       path: path.join(__dirname, "./layers/common"),
+      tiktokenEncodings: ["cl100k_base"],
     });
 
     this.sharedCode = new SharedAssetBundler(this, "genai-core", [
@@ -1,7 +1,12 @@
+import os
+import numpy as np
 from psycopg2 import sql
+from psycopg2.extras import execute_values
 from typing import List, Optional
 from genai_core.aurora.connection import AuroraConnection
 
+AURORA_INSERT_BATCH_SIZE = int(os.environ.get("AURORA_INSERT_BATCH_SIZE", "500"))
+
 
 def add_chunks_aurora(
     workspace_id: str,
@@ -16,6 +21,7 @@ def add_chunks_aurora(
     chunks: List[str],
     chunk_complements: List[str],
     replace: bool,
+    batch_size: int = AURORA_INSERT_BATCH_SIZE,
 ):
     table_name = sql.Identifier(workspace_id.replace("-", ""))
     complements_len = len(chunk_complements) if chunk_complements else 0
@@ -33,33 +39,15 @@ def add_chunks_aurora(
 
             removed_vectors = cursor.rowcount
 
+        rows = []
         for idx in range(len(chunk_ids)):
-            chunk_id = chunk_ids[idx]
-            content = chunks[idx]
             content_complement = (
                 chunk_complements[idx] if idx < complements_len else None
             )
 
-            cursor.execute(
-                sql.SQL(
-                    """INSERT INTO {table} (
-                        chunk_id,
-                        workspace_id,
-                        document_id,
-                        document_sub_id,
-                        document_type,
-                        document_sub_type,
-                        path,
-                        title,
-                        content,
-                        content_complement,
-                        content_embeddings
-                    ) VALUES (
-                        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,%s
-                    );"""
-                ).format(table=table_name),
-                [
-                    chunk_id,
+            rows.append(
+                (
+                    chunk_ids[idx],
                     workspace_id,
                     document_id,
                     document_sub_id,
@@ -67,24 +55,56 @@ def add_chunks_aurora(
                     document_sub_type,
                     path,
                     title,
-                    content,
+                    chunks[idx],
                     content_complement,
-                    chunk_embeddings[idx],
-                ],
+                    np.array(chunk_embeddings[idx]),
+                )
             )
 
+        # One multi-row INSERT per batch instead of a round-trip per chunk
+        insert_query = sql.SQL(
+            """INSERT INTO {table} (
+                chunk_id,
+                workspace_id,
+                document_id,
+                document_sub_id,
+                document_type,
+                document_sub_type,
+                path,
+                title,
+                content,
+                content_complement,
+                content_embeddings
+            ) VALUES %s;"""
+        ).format(table=table_name)
+
+        if rows:
+            execute_values(cursor, insert_query, rows, page_size=batch_size)
+
         cursor.connection.commit()
 
     return {"removed_vectors": removed_vectors, "added_vectors": len(chunk_ids)}
 
 
-def clean_chunks_aurora(workspace_id: str, document_id: str):
+def clean_chunks_aurora(
+    workspace_id: str,
+    document_id: str,
+    keep_chunk_ids: Optional[List[str]] = None,
+    chunk_ids: Optional[List[str]] = None,
+) -> int:
     table_name = sql.Identifier(workspace_id.replace("-", ""))
+    query = """DELETE FROM {table} WHERE
+        workspace_id = %s AND document_id = %s"""
+    params = [workspace_id, document_id]
+
+    if chunk_ids is not None:
+        query += " AND chunk_id = ANY(%s::uuid[])"
+        params.append([str(x) for x in chunk_ids])
+    if keep_chunk_ids is not None:
+        query += " AND NOT (chunk_id = ANY(%s::uuid[]))"
+        params.append([str(x) for x in keep_chunk_ids])
+
     with AuroraConnection() as cursor:
-        cursor.execute(
-            sql.SQL(
-                """DELETE FROM {table} WHERE
-                    workspace_id = %s AND document_id = %s;"""
-            ).format(table=table_name),
-            [workspace_id, document_id],
-        )
+        cursor.execute(sql.SQL(query + ";").format(table=table_name), params)
+
+        return cursor.rowcount
@@ -1,65 +1,342 @@
 import os
+import time
+import threading
 import boto3
 import psycopg2
 import psycopg2.extras
+import psycopg2.extensions
+from collections import deque
 from datetime import datetime, timedelta
+from aws_lambda_powertools import Logger
 from pgvector.psycopg2 import register_vector
+from genai_core.types import CommonError
 
 client = boto3.client("rds")
+logger = Logger()
 
 AURORA_DB_USER = os.environ.get("AURORA_DB_USER")
 AURORA_DB_HOST = os.environ.get("AURORA_DB_HOST")
 AURORA_DB_PORT = os.environ.get("AURORA_DB_PORT")
 AURORA_DB_REGION = os.environ.get("AWS_REGION")
 
+AURORA_POOL_MIN_SIZE = int(os.environ.get("AURORA_POOL_MIN_SIZE", "0"))
+AURORA_POOL_MAX_SIZE = int(os.environ.get("AURORA_POOL_MAX_SIZE", "4"))
+AURORA_POOL_TIMEOUT = float(os.environ.get("AURORA_POOL_TIMEOUT", "30"))
+# IAM auth tokens are only checked when a connection is opened, recycling
+# long lived connections makes sure new ones pick up a fresh token.
+AURORA_POOL_MAX_LIFETIME = float(os.environ.get("AURORA_POOL_MAX_LIFETIME", "3600"))
+# Connections idle for longer than this are pinged before being handed out
+# (e.g. after a Lambda container has been frozen between invocations).
+AURORA_POOL_HEALTH_CHECK_INTERVAL = float(
+    os.environ.get("AURORA_POOL_HEALTH_CHECK_INTERVAL", "30")
+)
+
 
 class AuroraConnection(object):
     token = None
     token_refresh = datetime.now() - timedelta(minutes=1)
+    token_lock = threading.Lock()
 
     def __init__(self, autocommit=True):
-        now = datetime.now()
-        if AuroraConnection.token_refresh < now:
-            AuroraConnection.token_refresh = now + timedelta(
-                minutes=10
-            )  # Expires after 15 min
-            # Base on
-            # https://docs.aws.amazon.com/AmazonRDS/latest/UserGuide/UsingWithRDS.IAMDBAuth.Connecting.Python.html
-            AuroraConnection.token = client.generate_db_auth_token(
-                DBHostname=AURORA_DB_HOST,
-                Port=AURORA_DB_PORT,
-                DBUsername=AURORA_DB_USER,
-                Region=AURORA_DB_REGION,
-            )
         self.autocommit = autocommit
 
         self.dbhost = AURORA_DB_HOST
         self.dbport = AURORA_DB_PORT
         self.dbuser = AURORA_DB_USER
-        self.dbpass = AuroraConnection.token
+        self.dbpass = AuroraConnection.get_token()
 
-        if AuroraConnection.token is None:
+        if self.dbpass is None:
             raise ValueError("Token is not set.")
 
+    @staticmethod
+    def get_token():
+        with AuroraConnection.token_lock:
+            now = datetime.now()
+            if AuroraConnection.token_refresh < now:
+                AuroraConnection.token_refresh = now + timedelta(
+                    minutes=10
+                )  # Expires after 15 min
+                # Base on
+                # https://docs.aws.amazon.com/AmazonRDS/latest/UserGuide/UsingWithRDS.IAMDBAuth.Connecting.Python.html
+                AuroraConnection.token = client.generate_db_auth_token(
+                    DBHostname=AURORA_DB_HOST,
+                    Port=AURORA_DB_PORT,
+                    DBUsername=AURORA_DB_USER,
+                    Region=AURORA_DB_REGION,
+                )
+
+            return AuroraConnection.token
+
     def __enter__(self):
+        pool = get_connection_pool()
+        connection = pool.get_connection()
+
+        try:
+            connection.set_session(autocommit=self.autocommit)
+            cursor = connection.cursor()
+        except Exception:
+            pool.put_connection(connection, discard=True)
+            raise
+
+        self.pool = pool
+        self.connection = connection
+        self.cursor = cursor
+
+        return cursor
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        discard = exc_type is not None and issubclass(
+            exc_type, (psycopg2.OperationalError, psycopg2.InterfaceError)
+        )
+
+        try:
+            self.cursor.close()
+        except psycopg2.Error:
+            discard = True
+
+        self.pool.put_connection(self.connection, discard=discard)
+
+
+class AuroraConnectionPool(object):
+    """Process wide pool of IAM authenticated Aurora connections.
+
+    Connections are reused across `AuroraConnection` blocks, so warm Lambda
+    containers and long running batch jobs only pay the TLS and IAM
+    authentication handshake once per connection.
+    """
+
+    def __init__(
+        self,
+        min_size: int = AURORA_POOL_MIN_SIZE,
+        max_size: int = AURORA_POOL_MAX_SIZE,
+        timeout: float = AURORA_POOL_TIMEOUT,
+        max_lifetime: float = AURORA_POOL_MAX_LIFETIME,
+        health_check_interval: float = AURORA_POOL_HEALTH_CHECK_INTERVAL,
+    ):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+
+        self._condition = threading.Condition()
+        self._idle = deque()
+        self._created_at = {}
+        self._size = 0
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "waits": 0,
+            "wait_time_ms": 0.0,
+            "discarded": 0,
+            "health_check_failures": 0,
+        }
+
+    def get_connection(self):
+        self._fill_min_size()
+        deadline = time.monotonic() + self.timeout
+        started = time.monotonic()
+        waited = False
+
+        while True:
+            with self._condition:
+                entry = None
+                while self._idle:
+                    connection, last_used = self._idle.pop()
+                    if self._is_expired(connection):
+                        self._discard_locked(connection)
+                        continue
+                    entry = (connection, last_used)
+                    break
+
+                if entry is None:
+                    if self._size < self.max_size:
+                        self._size += 1
+                    else:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise CommonError(
+                                "Timed out waiting for an Aurora connection"
+                            )
+
+                        waited = True
+                        self._condition.wait(remaining)
+                        continue
+
+            if entry is not None:
+                connection, last_used = entry
+                if not self._is_healthy(connection, last_used):
+                    continue
+
+                self._record_checkout("hits", started, waited)
+                return connection
+
+            try:
+                connection = self._connect()
+            except Exception:
+                with self._condition:
+                    self._size -= 1
+                    self._condition.notify()
+                raise
+
+            self._record_checkout("misses", started, waited)
+            return connection
+
+    def put_connection(self, connection, discard: bool = False):
+        if not discard and not connection.closed:
+            try:
+                status = connection.get_transaction_status()
+                if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    connection.rollback()
+            except psycopg2.Error:
+                discard = True
+
+        with self._condition:
+            if discard or connection.closed or self._is_expired(connection):
+                self._discard_locked(connection)
+            else:
+                self._idle.append((connection, time.monotonic()))
+
+            self._condition.notify()
+
+    def close_all(self):
+        with self._condition:
+            while self._idle:
+                connection, _ = self._idle.pop()
+                self._discard_locked(connection)
+
+            self._condition.notify_all()
+
+    def get_stats(self):
+        with self._condition:
+            stats = dict(self._stats)
+            stats["size"] = self._size
+            stats["idle"] = len(self._idle)
+
+        checkouts = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / checkouts if checkouts else 0.0
+
+        return stats
+
+    def _connect(self):
         connection = psycopg2.connect(
             database="postgres",
-            host=self.dbhost,
-            user=self.dbuser,
-            password=self.dbpass,
-            port=self.dbport,
+            host=AURORA_DB_HOST,
+            user=AURORA_DB_USER,
+            password=AuroraConnection.get_token(),
+            port=AURORA_DB_PORT,
             connect_timeout=10,
+            keepalives=1,
+            keepalives_idle=30,
         )
 
-        connection.set_session(autocommit=self.autocommit)
-        psycopg2.extras.register_uuid()
+        psycopg2.extras.register_uuid(conn_or_curs=connection)
         register_vector(connection)
-        cursor = connection.cursor()
-        self.connection = connection
-        self.cursor = cursor
 
-        return cursor
+        with self._condition:
+            self._created_at[id(connection)] = time.monotonic()
+
+        return connection
+
+    def _fill_min_size(self):
+        while True:
+            with self._condition:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+
+            try:
+                connection = self._connect()
+            except Exception:
+                with self._condition:
+                    self._size -= 1
+                raise
+
+            self.put_connection(connection)
+
+    def _is_expired(self, connection):
+        created_at = self._created_at.get(id(connection))
+        if created_at is None:
+            return True
+
+        return time.monotonic() - created_at > self.max_lifetime
+
+    def _is_healthy(self, connection, last_used):
+        if connection.closed:
+            healthy = False
+        elif time.monotonic() - last_used < self.health_check_interval:
+            healthy = True
+        else:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1;")
+                if not connection.autocommit:
+                    connection.rollback()
+                healthy = True
+            except psycopg2.Error:
+                healthy = False
+
+        if not healthy:
+            logger.info("Discarding unhealthy Aurora connection")
+            with self._condition:
+                self._stats["health_check_failures"] += 1
+                self._discard_locked(connection)
+                self._condition.notify()
 
-    def __exit__(self, *args):
-        self.cursor.close()
-        self.connection.close()
+        return healthy
+
+    def _discard_locked(self, connection):
+        self._created_at.pop(id(connection), None)
+        self._size -= 1
+        self._stats["discarded"] += 1
+
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+
+    def _record_checkout(self, kind, started, waited):
+        wait_time_ms = (time.monotonic() - started) * 1000
+
+        with self._condition:
+            self._stats[kind] += 1
+            self._stats["wait_time_ms"] += wait_time_ms
+            if waited:
+                self._stats["waits"] += 1
+
+        logger.debug(
+            "Aurora connection checkout",
+            pool_result=kind,
+            wait_time_ms=wait_time_ms,
+        )
+
+
+_connection_pool = None
+_connection_pool_lock = threading.Lock()
+
+
+def get_connection_pool() -> AuroraConnectionPool:
+    global _connection_pool
+
+    if _connection_pool is None:
+        with _connection_pool_lock:
+            if _connection_pool is None:
+                _connection_pool = AuroraConnectionPool()
+
+    return _connection_pool
+
+
+def close_connection_pool():
+    global _connection_pool
+
+    with _connection_pool_lock:
+        if _connection_pool is not None:
+            logger.info(
+                "Closing Aurora connection pool",
+                stats=_connection_pool.get_stats(),
+            )
+            _connection_pool.close_all()
+            _connection_pool = None
@@ -1,6 +1,7 @@
 from aws_lambda_powertools import Logger
 from psycopg2 import sql
 from genai_core.aurora.connection import AuroraConnection
+from genai_core.aurora.utils import get_tsvector_column
 
 logger = Logger()
 
@@ -12,8 +13,6 @@ def create_workspace_table(workspace: dict):
     embeddings_model_dimensions = workspace["embeddings_model_dimensions"]
     hybrid_search = workspace["hybrid_search"]
     languages = workspace["languages"]
-    has_index = workspace["has_index"]
-    metric = workspace["metric"]
 
     with AuroraConnection(autocommit=False) as cursor:
         cursor.execute(
@@ -50,35 +49,28 @@ def create_workspace_table(workspace: dict):
 
         if hybrid_search:
             for language in languages:
+                # Content is tokenized once when the chunk is inserted
+                # instead of on every keyword search.
+                column = sql.Identifier(get_tsvector_column(language))
                 cursor.execute(
                     sql.SQL(
-                        "CREATE INDEX ON {table} USING "
-                        + " GIN (to_tsvector('{language}', content));"
-                    ).format(table=table_name, language=sql.Identifier(language))
+                        "ALTER TABLE {table} ADD COLUMN {column} tsvector "
+                        + "GENERATED ALWAYS AS "
+                        + "(to_tsvector({language}::regconfig, content)) STORED;"
+                    ).format(
+                        table=table_name,
+                        column=column,
+                        language=sql.Literal(language),
+                    )
                 )
-
-        if has_index:
-            if metric == "cosine":
                 cursor.execute(
-                    sql.SQL(
-                        "CREATE INDEX ON {table} USING ivfflat "
-                        + "(content_embeddings vector_cosine_ops) WITH (lists = 100);"
-                    ).format(table=table_name)
-                )
-            elif metric == "l2":
-                cursor.execute(
-                    sql.SQL(
-                        "CREATE INDEX ON {table} USING ivfflat "
-                        + "(content_embeddings vector_l2_ops) WITH (lists = 100);"
-                    ).format(table=table_name)
-                )
-            elif metric == "inner":
-                cursor.execute(
-                    sql.SQL(
-                        "CREATE INDEX ON {table} USING ivfflat "
-                        + "(content_embeddings vector_ip_ops) WITH (lists = 100);"
-                    ).format(table=table_name)
+                    sql.SQL("CREATE INDEX ON {table} USING GIN ({column});").format(
+                        table=table_name, column=column
+                    )
                 )
 
         cursor.connection.commit()
         logger.info("Created workspace table")
+
+    # The ANN index is built by genai_core.aurora.index once the workspace
+    # holds enough vectors for a good index.
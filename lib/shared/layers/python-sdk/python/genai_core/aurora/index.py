@@ -0,0 +1,156 @@
+import os
+import math
+import genai_core.workspaces
+from psycopg2 import sql
+from aws_lambda_powertools import Logger
+from genai_core.aurora.connection import AuroraConnection
+from genai_core.types import SearchSettings
+
+logger = Logger()
+
+# The ANN index is built once a workspace holds this many vectors, below it
+# an exact scan is fast enough and an ivfflat index would have poor centroids.
+AURORA_INDEX_BUILD_THRESHOLD = int(
+    os.environ.get("AURORA_INDEX_BUILD_THRESHOLD", "10000")
+)
+# ivfflat centroids are not updated on insert, the index is rebuilt when the
+# workspace has grown by this factor since the last build.
+AURORA_INDEX_REBUILD_FACTOR = float(os.environ.get("AURORA_INDEX_REBUILD_FACTOR", "2"))
+AURORA_INDEX_MAINTENANCE_WORK_MEM = os.environ.get("AURORA_INDEX_MAINTENANCE_WORK_MEM")
+
+OPERATOR_CLASSES = {
+    "cosine": "vector_cosine_ops",
+    "l2": "vector_l2_ops",
+    "inner": "vector_ip_ops",
+}
+
+
+def get_index_name(workspace_id: str) -> str:
+    # Same name Postgres gives to an unnamed index on content_embeddings, so
+    # indexes created along with the table are replaced on the first rebuild.
+    return f"{workspace_id.replace('-', '')}_content_embeddings_idx"
+
+
+def get_ivfflat_lists(rows: int) -> int:
+    """pgvector recommendation: rows / 1000 up to 1M rows, sqrt(rows) above."""
+    if rows <= 1000000:
+        return max(1, rows // 1000)
+
+    return int(math.sqrt(rows))
+
+
+def needs_vector_index_build(workspace: dict) -> bool:
+    if workspace.get("engine") != "aurora" or not workspace.get("has_index"):
+        return False
+
+    vectors = int(workspace.get("vectors", 0))
+    if vectors < AURORA_INDEX_BUILD_THRESHOLD:
+        return False
+
+    built_vectors = workspace.get("vector_index_vectors")
+    if built_vectors is None:
+        return True
+
+    search_settings = SearchSettings.from_workspace(workspace)
+    if search_settings.index_type != "ivfflat":
+        return False
+
+    return vectors >= int(built_vectors) * AURORA_INDEX_REBUILD_FACTOR
+
+
+def update_vector_index(workspace: dict) -> bool:
+    """Build or rebuild the ANN index of the workspace when it is due.
+
+    The index is created with CREATE INDEX CONCURRENTLY next to the current
+    one and swapped in afterwards, so queries keep being served during the
+    build. A session advisory lock makes concurrent callers skip the build.
+    """
+    if not needs_vector_index_build(workspace):
+        return False
+
+    workspace_id = workspace["workspace_id"]
+    table_name = workspace_id.replace("-", "")
+
+    with AuroraConnection() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s));", [table_name])
+        if not cursor.fetchone()[0]:
+            logger.info("Vector index build already in progress")
+            return False
+
+        try:
+            cursor.execute(
+                sql.SQL("SELECT count(*) FROM {table};").format(
+                    table=sql.Identifier(table_name)
+                )
+            )
+            rows = cursor.fetchone()[0]
+
+            build_vector_index(cursor, workspace, rows)
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(hashtext(%s));", [table_name])
+
+    genai_core.workspaces.set_vector_index_vectors(workspace_id, rows)
+
+    return True
+
+
+def build_vector_index(cursor, workspace: dict, rows: int):
+    workspace_id = workspace["workspace_id"]
+    table_name = sql.Identifier(workspace_id.replace("-", ""))
+    index_name = get_index_name(workspace_id)
+    new_index_name = f"{index_name}_new"
+    operator_class = sql.SQL(OPERATOR_CLASSES[workspace["metric"]])
+    search_settings = SearchSettings.from_workspace(workspace)
+
+    if search_settings.index_type == "hnsw":
+        method = sql.SQL(
+            "hnsw (content_embeddings {ops}) "
+            + "WITH (m = {m}, ef_construction = {ef_construction})"
+        ).format(
+            ops=operator_class,
+            m=sql.Literal(search_settings.hnsw_m),
+            ef_construction=sql.Literal(search_settings.hnsw_ef_construction),
+        )
+    elif search_settings.index_type == "ivfflat":
+        lists = search_settings.ivfflat_lists or get_ivfflat_lists(rows)
+        method = sql.SQL("ivfflat (content_embeddings {ops}) WITH (lists = {lists})")
+        method = method.format(ops=operator_class, lists=sql.Literal(lists))
+    else:
+        raise Exception("Unknown index type")
+
+    if AURORA_INDEX_MAINTENANCE_WORK_MEM:
+        cursor.execute(
+            "SELECT set_config('maintenance_work_mem', %s, false);",
+            [AURORA_INDEX_MAINTENANCE_WORK_MEM],
+        )
+
+    # Leftover of an interrupted build, concurrent builds leave invalid indexes
+    cursor.execute(
+        sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {index};").format(
+            index=sql.Identifier(new_index_name)
+        )
+    )
+    cursor.execute(
+        sql.SQL("CREATE INDEX CONCURRENTLY {index} ON {table} USING {method};").format(
+            index=sql.Identifier(new_index_name), table=table_name, method=method
+        )
+    )
+    cursor.execute(
+        sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {index};").format(
+            index=sql.Identifier(index_name)
+        )
+    )
+    cursor.execute(
+        sql.SQL("ALTER INDEX {new_index} RENAME TO {index};").format(
+            new_index=sql.Identifier(new_index_name), index=sql.Identifier(index_name)
+        )
+    )
+
+    if AURORA_INDEX_MAINTENANCE_WORK_MEM:
+        cursor.execute("RESET maintenance_work_mem;")
+
+    logger.info(
+        "Built vector index",
+        index_type=search_settings.index_type,
+        rows=rows,
+    )
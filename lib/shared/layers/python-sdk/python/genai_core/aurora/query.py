@@ -1,16 +1,25 @@
 import numpy as np
+import genai_core.fusion
 import genai_core.embeddings
 import genai_core.cross_encoder
 import genai_core.utils.comprehend
 from typing import List
 from psycopg2 import sql
+from concurrent.futures import ThreadPoolExecutor
 from genai_core.aurora.connection import AuroraConnection
-from genai_core.aurora.utils import convert_types
+from genai_core.aurora.utils import (
+    convert_types,
+    get_tsvector_column,
+    has_tsvector_columns,
+)
 from aws_lambda_powertools import Logger
-from genai_core.types import CommonError, Task
+from genai_core.types import CommonError, SearchSettings
 
 logger = Logger()
 
+VECTOR_SEARCH_OPERATORS = {"cosine": "<=>", "l2": "<->", "inner": "<#>"}
+HNSW_DEFAULT_EF_SEARCH = 40
+
 
 def query_workspace_aurora(
     workspace_id: str,
@@ -27,9 +36,12 @@ def query_workspace_aurora(
     cross_encoder_model_name = workspace["cross_encoder_model_name"]
     metric = workspace["metric"]
     hybrid_search = workspace["hybrid_search"]
+    rank_fusion = workspace.get("rank_fusion") or genai_core.fusion.RANK_FUSION_NONE
     languages = workspace["languages"]
-    vector_search_limit = 25
-    keyword_search_limit = 25
+    use_tsvector_columns = has_tsvector_columns(workspace)
+    search_settings = SearchSettings.from_workspace(workspace)
+    vector_search_limit = search_settings.vector_search_limit
+    keyword_search_limit = search_settings.keyword_search_limit
 
     selected_model = genai_core.embeddings.get_embeddings_model(
         embeddings_model_provider, embeddings_model_name
@@ -38,147 +50,52 @@ def query_workspace_aurora(
     if selected_model is None:
         raise CommonError("Embeddings model not found")
 
-    query_embeddings = genai_core.embeddings.generate_embeddings(
-        selected_model, [query], Task.RETRIEVE
-    )[0]
-
-    language_name, detected_languages = genai_core.utils.comprehend.get_query_language(
-        query, languages
-    )
+    if metric not in VECTOR_SEARCH_OPERATORS:
+        raise Exception("Unknown metric")
 
-    items = []
-    vector_search_records = []
-    keyword_search_records = []
-    with AuroraConnection() as cursor:
-        if metric == "cosine":
-            cursor.execute(
-                sql.SQL(
-                    """SELECT chunk_id,
-                        workspace_id,
-                        document_id,
-                        document_sub_id,
-                        document_type,
-                        document_sub_type,
-                        path,
-                        language,
-                        title,
-                        content,
-                        content_complement,
-                        metadata,
-                        content_embeddings <=> %s AS vector_search_score
-                FROM {table} ORDER BY vector_search_score LIMIT %s;"""
-                ).format(table=table_name),
-                [np.array(query_embeddings), vector_search_limit],
-            )
-        elif metric == "l2":
-            cursor.execute(
-                sql.SQL(
-                    """SELECT chunk_id,
-                        workspace_id,
-                        document_id,
-                        document_sub_id,
-                        document_type,
-                        document_sub_type,
-                        path,
-                        language,
-                        title,
-                        content,
-                        content_complement,
-                        metadata,
-                        content_embeddings <-> %s AS vector_search_score
-                FROM {table} ORDER BY vector_search_score LIMIT %s;"""
-                ).format(table=table_name),
-                [np.array(query_embeddings), vector_search_limit],
-            )
-        elif metric == "inner":
-            cursor.execute(
-                sql.SQL(
-                    """SELECT chunk_id,
-                        workspace_id,
-                        document_id,
-                        document_sub_id,
-                        document_type,
-                        document_sub_type,
-                        path,
-                        language,
-                        title,
-                        content,
-                        content_complement,
-                        metadata,
-                        content_embeddings <#> %s AS vector_search_score
-                FROM {table} ORDER BY vector_search_score LIMIT %s;"""
-                ).format(table=table_name),
-                [np.array(query_embeddings), vector_search_limit],
-            )
-        else:
-            raise Exception("Unknown metric")
-
-        vector_search_records = cursor.fetchall()
-        vector_search_records = _convert_records("vector_search", vector_search_records)
-        items.extend(vector_search_records)
+    def detect_language_and_search():
+        language_name, detected_languages = (
+            genai_core.utils.comprehend.get_query_language(query, languages)
+        )
 
+        keyword_search_records = []
         if hybrid_search:
-            language = sql.Identifier(language_name)
-
-            cursor.execute(
-                sql.SQL(
-                    """SELECT chunk_id,
-                            workspace_id,
-                            document_id,
-                            document_sub_id,
-                            document_type,
-                            document_sub_type,
-                            path,
-                            language,
-                            title,
-                            content,
-                            content_complement,
-                            metadata,
-                            ts_rank_cd(to_tsvector('{language}', content), query) AS keyword_search_score
-                            FROM {table},
-                            plainto_tsquery('{language}', %s) query
-                            WHERE to_tsvector('{language}', content) @@ query
-                            ORDER BY keyword_search_score DESC
-                            LIMIT %s;"""  # noqa:E501
-                ).format(table=table_name, language=language),
-                [query, keyword_search_limit],
-            )
+            tsvector_column = None
+            if use_tsvector_columns and language_name in languages:
+                tsvector_column = get_tsvector_column(language_name)
 
-            keyword_search_records = cursor.fetchall()
-            keyword_search_records = _convert_records(
-                "keyword_search", keyword_search_records
+            keyword_search_records = _keyword_search(
+                table_name, language_name, query, keyword_search_limit, tsvector_column
             )
-            items.extend(keyword_search_records)
 
-    unique_items = dict({})
-    for item in items:
-        chunk_id = item["chunk_id"]
-
-        if chunk_id not in unique_items:
-            unique_items[chunk_id] = item
-        else:
-            current = unique_items[chunk_id]
-            for source in item["sources"]:
-                if source not in current["sources"]:
-                    current["sources"].append(source)
-            current["sources"] = sorted(current["sources"])
+        return language_name, detected_languages, keyword_search_records
 
-            for source in current["sources"]:
-                if source not in item["sources"]:
-                    item["sources"].append(source)
-            item["sources"] = sorted(item["sources"])
+    # Language detection and the keyword search run next to the query
+    # embedding and the vector search, each on its own pooled connection.
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        keyword_future = executor.submit(detect_language_and_search)
 
-            if current["vector_search_score"] is None:
-                current["vector_search_score"] = item["vector_search_score"]
-            if current["keyword_search_score"] is None:
-                current["keyword_search_score"] = item["keyword_search_score"]
+        query_embeddings = genai_core.embeddings.generate_query_embeddings(
+            selected_model, query
+        )
+        vector_search_records = _vector_search(
+            table_name,
+            metric,
+            query_embeddings,
+            vector_search_limit,
+            search_settings.ivfflat_probes,
+            # HNSW returns at most ef_search rows
+            search_settings.ef_search
+            or max(HNSW_DEFAULT_EF_SEARCH, vector_search_limit),
+        )
 
-            if item["vector_search_score"] is None:
-                item["vector_search_score"] = current["vector_search_score"]
-            if item["keyword_search_score"] is None:
-                item["keyword_search_score"] = current["keyword_search_score"]
+        language_name, detected_languages, keyword_search_records = (
+            keyword_future.result()
+        )
 
-    unique_items = list(unique_items.values())
+    unique_items = genai_core.fusion.merge_results(
+        vector_search_records, keyword_search_records
+    )
 
     if cross_encoder_model_name is not None:
         cross_encoder_model = genai_core.cross_encoder.get_cross_encoder_model(
@@ -188,24 +105,17 @@ def query_workspace_aurora(
         if cross_encoder_model is None:
             raise genai_core.types.CommonError("Cross encoder model not found")
 
-        score_dict = dict({})
-        if len(unique_items) > 0:
-            passages = [record["content"] for record in unique_items]
-            passage_scores = genai_core.cross_encoder.rank_passages(
-                cross_encoder_model, query, passages
-            )
-
-            for i in range(len(unique_items)):
-                score = passage_scores[i]
-                unique_items[i]["score"] = score
-                score_dict[unique_items[i]["chunk_id"]] = score
-
-        unique_items = sorted(unique_items, key=lambda x: x["score"], reverse=True)
-
-        for record in vector_search_records:
-            record["score"] = score_dict[record["chunk_id"]]
-        for record in keyword_search_records:
-            record["score"] = score_dict[record["chunk_id"]]
+        unique_items = genai_core.fusion.rerank(
+            cross_encoder_model,
+            query,
+            unique_items,
+            vector_search_records,
+            keyword_search_records,
+        )
+    elif rank_fusion != genai_core.fusion.RANK_FUSION_NONE:
+        unique_items = genai_core.fusion.fuse(
+            rank_fusion, unique_items, vector_search_records, keyword_search_records
+        )
 
     if full_response:
         unique_items = unique_items[:limit]
@@ -220,43 +130,13 @@ def query_workspace_aurora(
             "keyword_search_items": convert_types(keyword_search_records),
         }
     else:
-        if cross_encoder_model_name is not None:
-            ret_items = list(
-                filter(lambda val: val["score"] > threshold, unique_items)
-            )[:limit]
-        else:
-            ret_items = unique_items[:limit]
-
-        if len(ret_items) < limit:
-            # inner product metric is negative hence we sort ascending
-            if metric == "inner":
-                unique_items = sorted(
-                    unique_items,
-                    key=lambda x: x["vector_search_score"] or 1,
-                    reverse=False,
-                )
-                ret_items = ret_items + (
-                    list(
-                        filter(
-                            lambda val: (val["vector_search_score"] or 1) < -0.5,
-                            unique_items,
-                        )
-                    )[: (limit - len(ret_items))]
-                )
-            else:
-                unique_items = sorted(
-                    unique_items,
-                    key=lambda x: x["vector_search_score"] or -1,
-                    reverse=True,
-                )
-                ret_items = ret_items + (
-                    list(
-                        filter(
-                            lambda val: (val["vector_search_score"] or -1) > 0.5,
-                            unique_items,
-                        )
-                    )[: (limit - len(ret_items))]
-                )
+        # inner product metric is negative hence lower scores are better
+        ret_items = genai_core.fusion.select_top_k(
+            unique_items,
+            limit,
+            threshold=threshold if cross_encoder_model_name is not None else None,
+            vector_score_sign=-1 if metric == "inner" else 1,
+        )
 
         ret_value = {
             "engine": "aurora",
@@ -271,6 +151,134 @@ def query_workspace_aurora(
     return ret_value
 
 
+def _vector_search(
+    table_name: sql.Identifier,
+    metric: str,
+    query_embeddings: List[float],
+    limit: int,
+    probes: int = 1,
+    ef_search: int = HNSW_DEFAULT_EF_SEARCH,
+):
+    # Set on every query, in the same round trip, so a pooled connection
+    # never carries over the settings of another workspace.
+    set_probes = sql.SQL(
+        "SET ivfflat.probes = {probes}; SET hnsw.ef_search = {ef_search}; "
+    ).format(probes=sql.Literal(int(probes)), ef_search=sql.Literal(int(ef_search)))
+
+    with AuroraConnection() as cursor:
+        cursor.execute(
+            set_probes
+            + sql.SQL(
+                """SELECT chunk_id,
+                    workspace_id,
+                    document_id,
+                    document_sub_id,
+                    document_type,
+                    document_sub_type,
+                    path,
+                    language,
+                    title,
+                    content,
+                    content_complement,
+                    metadata,
+                    content_embeddings {operator} %s AS vector_search_score
+            FROM {table} ORDER BY vector_search_score LIMIT %s;"""
+            ).format(
+                table=table_name, operator=sql.SQL(VECTOR_SEARCH_OPERATORS[metric])
+            ),
+            [np.array(query_embeddings), limit],
+        )
+
+        records = cursor.fetchall()
+
+    return _convert_records("vector_search", records)
+
+
+def _keyword_search(
+    table_name: sql.Identifier,
+    language_name: str,
+    query: str,
+    limit: int,
+    tsvector_column: str = None,
+):
+    if tsvector_column is not None:
+        return _keyword_search_tsvector_column(
+            table_name, language_name, tsvector_column, query, limit
+        )
+
+    language = sql.Identifier(language_name)
+
+    with AuroraConnection() as cursor:
+        cursor.execute(
+            sql.SQL(
+                """SELECT chunk_id,
+                        workspace_id,
+                        document_id,
+                        document_sub_id,
+                        document_type,
+                        document_sub_type,
+                        path,
+                        language,
+                        title,
+                        content,
+                        content_complement,
+                        metadata,
+                        ts_rank_cd(to_tsvector('{language}', content), query) AS keyword_search_score
+                        FROM {table},
+                        plainto_tsquery('{language}', %s) query
+                        WHERE to_tsvector('{language}', content) @@ query
+                        ORDER BY keyword_search_score DESC
+                        LIMIT %s;"""  # noqa:E501
+            ).format(table=table_name, language=language),
+            [query, limit],
+        )
+
+        records = cursor.fetchall()
+
+    return _convert_records("keyword_search", records)
+
+
+def _keyword_search_tsvector_column(
+    table_name: sql.Identifier,
+    language_name: str,
+    tsvector_column: str,
+    query: str,
+    limit: int,
+):
+    with AuroraConnection() as cursor:
+        cursor.execute(
+            sql.SQL(
+                """SELECT chunk_id,
+                        workspace_id,
+                        document_id,
+                        document_sub_id,
+                        document_type,
+                        document_sub_type,
+                        path,
+                        language,
+                        title,
+                        content,
+                        content_complement,
+                        metadata,
+                        ts_rank_cd({column}, query) AS keyword_search_score
+                        FROM {table},
+                        plainto_tsquery({language}::regconfig, %s) query
+                        WHERE {column} @@ query
+                        ORDER BY keyword_search_score DESC
+                        LIMIT %s;"""
+            ).format(
+                table=table_name,
+                column=sql.Identifier(tsvector_column),
+                language=sql.Literal(language_name),
+            ),
+            [query, limit],
+        )
+
+        records = cursor.fetchall()
+
+    return _convert_records("keyword_search", records)
+
+
 def _convert_records(source: str, records: List[dict]):
     converted_records = []
     for record in records:
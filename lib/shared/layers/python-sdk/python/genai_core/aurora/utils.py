@@ -1,5 +1,17 @@
 import uuid
 
+# Workspace tables from this format version on have a stored tsvector column
+# per language for the keyword search.
+TSVECTOR_COLUMNS_FORMAT_VERSION = 2
+
+
+def get_tsvector_column(language: str) -> str:
+    return f"content_tsvector_{language}"
+
+
+def has_tsvector_columns(workspace: dict) -> bool:
+    return int(workspace.get("format_version", 1)) >= TSVECTOR_COLUMNS_FORMAT_VERSION
+
 
 def convert_types(data):
     if isinstance(data, dict):
@@ -1,16 +1,36 @@
 import os
+import math
+import json
 import uuid
 import boto3
 import genai_core.documents
 import genai_core.embeddings
+import genai_core.workspaces
+import genai_core.aurora.index
 import genai_core.aurora.chunks
 import genai_core.opensearch.chunks
+from aws_lambda_powertools import Logger
+from concurrent.futures import ThreadPoolExecutor
 from genai_core.types import CommonError, Task
-from typing import List, Optional
+from genai_core.utils.cache import LRUCache
+from genai_core.utils.pipeline import Pipeline, Stage
+from typing import Iterable, Iterator, List, Optional
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 PROCESSING_BUCKET_NAME = os.environ.get("PROCESSING_BUCKET_NAME", "")
+# "shard" stores the chunks of an add_chunks call in one JSON lines object
+# with an index of byte ranges, "files" stores one object per chunk.
+CHUNKS_S3_FORMAT = os.environ.get("CHUNKS_S3_FORMAT", "shard")
+CHUNKS_S3_MAX_CONCURRENCY = int(os.environ.get("CHUNKS_S3_MAX_CONCURRENCY", "16"))
+# add_chunks embeds and writes chunks in batches of this size, with the given
+# number of workers per stage and batches waiting between the stages.
+ADD_CHUNKS_BATCH_SIZE = int(os.environ.get("ADD_CHUNKS_BATCH_SIZE", "256"))
+ADD_CHUNKS_EMBEDDING_WORKERS = int(os.environ.get("ADD_CHUNKS_EMBEDDING_WORKERS", "2"))
+ADD_CHUNKS_WRITE_WORKERS = int(os.environ.get("ADD_CHUNKS_WRITE_WORKERS", "1"))
+ADD_CHUNKS_QUEUE_SIZE = int(os.environ.get("ADD_CHUNKS_QUEUE_SIZE", "2"))
 s3 = boto3.resource("s3")
+logger = Logger()
+shard_indexes_cache = LRUCache(256)
 
 
 def add_chunks(
@@ -21,6 +41,9 @@ def add_chunks(
     chunks: List[str],
     chunk_complements: List[str],
     path: Optional[str] = None,
+    chunk_embeddings: Optional[List[List[float]]] = None,
+    build_vector_index: bool = False,
+    chunk_ids: Optional[List[str]] = None,
 ):
     workspace_id = workspace["workspace_id"]
     engine = workspace["engine"]
@@ -32,37 +55,75 @@ def add_chunks(
     path = path if path else document["path"]
     title = document["title"]
 
-    embeddings_model = genai_core.embeddings.get_embeddings_model(
-        embeddings_model_provider, embeddings_model_name
-    )
+    embeddings_model = None
+    # Callers embedding the chunks of several documents together pass them
+    if chunk_embeddings is None:
+        embeddings_model = genai_core.embeddings.get_embeddings_model(
+            embeddings_model_provider, embeddings_model_name
+        )
 
-    if embeddings_model is None:
-        raise CommonError("Embeddings model not found")
+        if embeddings_model is None:
+            raise CommonError("Embeddings model not found")
 
-    chunk_embeddings = genai_core.embeddings.generate_embeddings(
-        embeddings_model, chunks, Task.STORE.value
-    )
-    chunk_ids = [uuid.uuid4() for _ in chunks]
+    if engine == "aurora":
+        add_chunks_engine = genai_core.aurora.chunks.add_chunks_aurora
+    elif engine == "opensearch":
+        add_chunks_engine = genai_core.opensearch.chunks.add_chunks_open_search
+    else:
+        raise CommonError("Engine not supported")
 
-    store_chunks_on_s3(workspace_id, document_id, document_sub_id, chunk_ids, chunks)
+    # Callers writing the same chunks again pass stable ids
+    if chunk_ids is None:
+        chunk_ids = [uuid.uuid4() for _ in chunks]
 
-    if engine == "aurora":
-        result = genai_core.aurora.chunks.add_chunks_aurora(
-            workspace_id=workspace_id,
-            document_id=document_id,
-            document_sub_id=document_sub_id,
-            document_type=document_type,
-            document_sub_type=document_sub_type,
-            path=path,
-            title=title,
-            chunk_ids=chunk_ids,
-            chunk_embeddings=chunk_embeddings,
-            chunks=chunks,
-            chunk_complements=chunk_complements,
-            replace=replace,
+    batches = [
+        {"start": start, "end": min(start + ADD_CHUNKS_BATCH_SIZE, len(chunks))}
+        for start in range(0, len(chunks), ADD_CHUNKS_BATCH_SIZE)
+    ] or [{"start": 0, "end": 0}]
+
+    # A single batch replaces the document in the same write. With several
+    # batches the previous chunks stay searchable until every batch is
+    # stored, and are then removed by id.
+    batch_replace = replace and len(batches) == 1
+
+    # Each embed worker fans out through generate_embeddings, the provider
+    # concurrency is shared between the workers.
+    embed_concurrency = None
+    if embeddings_model is not None:
+        embed_concurrency = max(
+            1,
+            genai_core.embeddings.get_max_concurrency(embeddings_model.provider)
+            // ADD_CHUNKS_EMBEDDING_WORKERS,
         )
-    elif engine == "opensearch":
-        result = genai_core.opensearch.chunks.add_chunks_open_search(
+
+    def embed(batch: dict):
+        batch_chunks = chunks[batch["start"] : batch["end"]]
+        if chunk_embeddings is not None:
+            batch["embeddings"] = chunk_embeddings[batch["start"] : batch["end"]]
+        else:
+            batch["embeddings"] = genai_core.embeddings.generate_embeddings(
+                embeddings_model,
+                batch_chunks,
+                Task.STORE.value,
+                max_concurrency=embed_concurrency,
+            )
+
+        return batch
+
+    def write(batch: dict):
+        batch_ids = chunk_ids[batch["start"] : batch["end"]]
+        batch_chunks = chunks[batch["start"] : batch["end"]]
+        batch_complements = (
+            chunk_complements[batch["start"] : batch["end"]]
+            if chunk_complements
+            else None
+        )
+
+        store_chunks_on_s3(
+            workspace_id, document_id, document_sub_id, batch_ids, batch_chunks
+        )
+
+        result = add_chunks_engine(
             workspace_id=workspace_id,
             document_id=document_id,
             document_sub_id=document_sub_id,
@@ -70,19 +131,107 @@ def add_chunks(
             document_sub_type=document_sub_type,
             path=path,
             title=title,
-            chunk_ids=chunk_ids,
-            chunk_embeddings=chunk_embeddings,
-            chunks=chunks,
-            chunk_complements=chunk_complements,
-            replace=replace,
+            chunk_ids=batch_ids,
+            chunk_embeddings=batch["embeddings"],
+            chunks=batch_chunks,
+            chunk_complements=batch_complements,
+            replace=batch_replace,
         )
-    else:
-        raise CommonError("Engine not supported")
 
-    added_vectors = result["added_vectors"]
+        return result["added_vectors"]
+
+    # Objects of the replaced chunks, removed once the new chunks are stored
+    previous_keys = []
+    if replace:
+        previous_keys = list_chunks_on_s3(workspace_id, document_id, document_sub_id)
+
+    # Embedding the next batch overlaps with writing the previous one
+    pipeline = Pipeline(
+        [
+            Stage("embed", embed, ADD_CHUNKS_EMBEDDING_WORKERS),
+            Stage("write", write, ADD_CHUNKS_WRITE_WORKERS),
+        ],
+        queue_size=ADD_CHUNKS_QUEUE_SIZE,
+    )
+    try:
+        added_vectors = sum(pipeline.run(batches))
+    except Exception:
+        if len(batches) > 1:
+            _remove_added_chunks(
+                workspace, document_id, document_sub_id, chunk_ids, previous_keys
+            )
+        raise
+
+    if replace and len(batches) > 1:
+        remove_chunks(workspace, document_id, keep_chunk_ids=chunk_ids)
+
     genai_core.documents.set_document_vectors(
         workspace_id, document_id, added_vectors, replace=replace
     )
+    delete_chunks_on_s3(previous_keys)
+
+    # The index build runs CREATE INDEX CONCURRENTLY and can take longer
+    # than an API request, the import batch jobs build it once at the end.
+    if engine == "aurora" and build_vector_index:
+        update_vector_index(workspace_id)
+
+
+def remove_chunks(
+    workspace: dict,
+    document_id: str,
+    keep_chunk_ids: Optional[List[str]] = None,
+    chunk_ids: Optional[List[str]] = None,
+) -> int:
+    """Remove the chunks of a document from the workspace engine, only the
+    ones in chunk_ids when given and never the ones in keep_chunk_ids.
+    Returns the number of removed chunks."""
+    workspace_id = workspace["workspace_id"]
+    engine = workspace["engine"]
+
+    if engine == "aurora":
+        return genai_core.aurora.chunks.clean_chunks_aurora(
+            workspace_id, document_id, keep_chunk_ids, chunk_ids
+        )
+    elif engine == "opensearch":
+        return genai_core.opensearch.chunks.clean_chunks_open_search(
+            workspace_id, document_id, keep_chunk_ids, chunk_ids
+        )
+
+    raise CommonError("Engine not supported")
+
+
+def _remove_added_chunks(
+    workspace: dict,
+    document_id: str,
+    document_sub_id: Optional[str],
+    chunk_ids: List[str],
+    previous_keys: List[str],
+):
+    # Rolls back the batches stored before a failed one, the previous chunks
+    # of a replaced document are left as they were.
+    workspace_id = workspace["workspace_id"]
+
+    try:
+        remove_chunks(workspace, document_id, chunk_ids=chunk_ids)
+        if previous_keys:
+            keys = list_chunks_on_s3(workspace_id, document_id, document_sub_id)
+            previous = set(previous_keys)
+            delete_chunks_on_s3([key for key in keys if key not in previous])
+    except Exception as error:
+        logger.error(
+            "Chunks rollback failed", document_id=document_id, error=str(error)
+        )
+
+
+def update_vector_index(workspace_id: str):
+    # Read again for the vector count including the chunks just added
+    workspace = genai_core.workspaces.get_workspace(workspace_id)
+
+    try:
+        genai_core.aurora.index.update_vector_index(workspace)
+    except Exception as error:
+        # The chunks are stored, the build is retried by the next call
+        logger.error("Vector index update failed", error=str(error))
 
 
 def split_content(workspace: dict, content: str):
@@ -98,11 +247,74 @@ def split_content(workspace: dict, content: str):
         text_data = text_splitter.split_text(content)
         text_data = [text.replace("\x00", "\uFFFD") for text in text_data]
 
+        return text_data
+    elif chunking_strategy == "token":
+        # Chunk size and overlap are counted in tokens of the embeddings model
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=get_token_length_function(
+                workspace["embeddings_model_name"], chunk_size
+            ),
+        )
+
+        text_data = text_splitter.split_text(content)
+        text_data = [text.replace("\x00", "\uFFFD") for text in text_data]
+
         return text_data
 
     raise CommonError("Chunking strategy not supported")
 
 
+def get_token_length_function(model_name: str, chunk_size: int):
+    """Length of a text in tokens for the token chunking strategy.
+
+    Characters are scaled so the model character limit also maps to
+    chunk_size, chunks then fit the model input as they are and are never
+    split again by generate_embeddings.
+    """
+    count_tokens = genai_core.embeddings.get_token_count_function(model_name)
+    char_limit = genai_core.embeddings.get_model_char_limit(model_name)
+
+    def length_function(text: str) -> int:
+        tokens = count_tokens(text)
+
+        return max(tokens, math.ceil(len(text) * chunk_size / char_limit))
+
+    return length_function
+
+
+def split_content_stream(workspace: dict, segments: Iterable[str]) -> Iterator[str]:
+    """Split a document read in segments (pages, records or blocks of lines)
+    without holding it in memory.
+
+    The last chunk of each segment is carried over and split again with the
+    next one, so chunks still span segment boundaries. Segments are joined
+    with a line break.
+    """
+    carry = None
+    for segment in segments:
+        content = segment if carry is None else carry + "\n" + segment
+        chunks = split_content(workspace, content)
+        if len(chunks) == 0:
+            continue
+
+        yield from chunks[:-1]
+        carry = chunks[-1]
+
+    if carry is not None:
+        yield carry
+
+
+def get_chunks_prefix(
+    workspace_id: str, document_id: str, document_sub_id: Optional[str]
+) -> str:
+    if document_sub_id:
+        return f"{workspace_id}/{document_id}/{document_sub_id}/chunks"
+
+    return f"{workspace_id}/{document_id}/chunks"
+
+
 def store_chunks_on_s3(
     workspace_id: str,
     document_id: str,
@@ -110,11 +322,155 @@ def store_chunks_on_s3(
     chunk_ids: List[str],
     chunks: List[str],
 ):
-    for chunk_id, chunk in zip(chunk_ids, chunks):
-        path = f"{workspace_id}/{document_id}/chunks/{chunk_id}.txt"
-        if document_sub_id:
-            path = (
-                f"{workspace_id}/{document_id}/{document_sub_id}/chunks/{chunk_id}.txt"
+    prefix = get_chunks_prefix(workspace_id, document_id, document_sub_id)
+
+    if CHUNKS_S3_FORMAT == "files":
+        _store_chunk_files(prefix, chunk_ids, chunks)
+    elif len(chunks) > 0:
+        _store_chunks_shard(prefix, chunk_ids, chunks)
+
+
+def list_chunks_on_s3(
+    workspace_id: str, document_id: str, document_sub_id: Optional[str]
+) -> List[str]:
+    prefix = get_chunks_prefix(workspace_id, document_id, document_sub_id)
+    bucket = s3.Bucket(PROCESSING_BUCKET_NAME)
+
+    return [summary.key for summary in bucket.objects.filter(Prefix=f"{prefix}/")]
+
+
+def delete_chunks_on_s3(keys: List[str]):
+    # Indexes go first, a shard is never read once its index is gone
+    indexes = [key for key in keys if key.endswith(".index.json")]
+    others = [key for key in keys if not key.endswith(".index.json")]
+
+    for group in (indexes, others):
+        # DeleteObjects takes up to 1000 keys
+        for start in range(0, len(group), 1000):
+            s3.meta.client.delete_objects(
+                Bucket=PROCESSING_BUCKET_NAME,
+                Delete={
+                    "Objects": [{"Key": key} for key in group[start : start + 1000]],
+                    "Quiet": True,
+                },
             )
 
-        s3.Object(PROCESSING_BUCKET_NAME, path).put(Body=chunk)
+
+def remove_chunks_on_s3(
+    workspace_id: str,
+    document_id: str,
+    document_sub_id: Optional[str],
+    keep_chunk_ids: List[str],
+) -> int:
+    """Delete the stored chunks not in keep_chunk_ids, a shard is deleted
+    as a whole when it holds any of them."""
+    prefix = get_chunks_prefix(workspace_id, document_id, document_sub_id)
+    keep = set(str(chunk_id) for chunk_id in keep_chunk_ids)
+
+    bucket = s3.Bucket(PROCESSING_BUCKET_NAME)
+    summaries = list(bucket.objects.filter(Prefix=f"{prefix}/"))
+    indexes = set(
+        summary.key for summary in summaries if summary.key.endswith(".index.json")
+    )
+
+    keys = []
+    for summary in summaries:
+        key = summary.key
+        if key.endswith(".index.json"):
+            index = _get_shard_index(key, summary.e_tag)
+            if any(chunk_id not in keep for chunk_id in index):
+                keys.extend([key, key[: -len(".index.json")] + ".jsonl"])
+        elif key.endswith(".jsonl"):
+            # A shard without an index was never completely written
+            if key[: -len(".jsonl")] + ".index.json" not in indexes:
+                keys.append(key)
+        elif key.endswith(".txt"):
+            if key[len(prefix) + 1 : -len(".txt")] not in keep:
+                keys.append(key)
+
+    delete_chunks_on_s3(keys)
+
+    return len(keys)
+
+
+def get_chunk_from_s3(
+    workspace_id: str,
+    document_id: str,
+    document_sub_id: Optional[str],
+    chunk_id: str,
+) -> Optional[str]:
+    """Read a chunk with a ranged GET on its shard, chunks stored one object
+    per chunk are read as well."""
+    prefix = get_chunks_prefix(workspace_id, document_id, document_sub_id)
+    chunk_id = str(chunk_id)
+
+    bucket = s3.Bucket(PROCESSING_BUCKET_NAME)
+    for summary in bucket.objects.filter(Prefix=f"{prefix}/"):
+        if not summary.key.endswith(".index.json"):
+            continue
+
+        index = _get_shard_index(summary.key, summary.e_tag)
+        if chunk_id not in index:
+            continue
+
+        offset, length = index[chunk_id]
+        shard_key = summary.key[: -len(".index.json")] + ".jsonl"
+        response = s3.Object(PROCESSING_BUCKET_NAME, shard_key).get(
+            Range=f"bytes={offset}-{offset + length - 1}"
+        )
+
+        return json.loads(response["Body"].read())["content"]
+
+    try:
+        response = s3.Object(PROCESSING_BUCKET_NAME, f"{prefix}/{chunk_id}.txt").get()
+    except s3.meta.client.exceptions.NoSuchKey:
+        return None
+
+    return response["Body"].read().decode("utf-8")
+
+
+def _store_chunks_shard(prefix: str, chunk_ids: List[str], chunks: List[str]):
+    shard_key = f"{prefix}/{uuid.uuid4()}"
+    lines = []
+    index = {}
+    offset = 0
+    for chunk_id, chunk in zip(chunk_ids, chunks):
+        line = json.dumps({"chunk_id": str(chunk_id), "content": chunk}) + "\n"
+        line = line.encode("utf-8")
+        index[str(chunk_id)] = [offset, len(line)]
+        lines.append(line)
+        offset += len(line)
+
+    s3.Object(PROCESSING_BUCKET_NAME, f"{shard_key}.jsonl").put(
+        Body=b"".join(lines), ContentType="application/x-ndjson"
+    )
+    # Written last, a shard is only read once its index exists
+    s3.Object(PROCESSING_BUCKET_NAME, f"{shard_key}.index.json").put(
+        Body=json.dumps(index), ContentType="application/json"
+    )
+
+
+def _store_chunk_files(prefix: str, chunk_ids: List[str], chunks: List[str]):
+    def put(item):
+        chunk_id, chunk = item
+        s3.Object(PROCESSING_BUCKET_NAME, f"{prefix}/{chunk_id}.txt").put(Body=chunk)
+
+    max_workers = min(len(chunks), CHUNKS_S3_MAX_CONCURRENCY)
+    if max_workers <= 1:
+        for item in zip(chunk_ids, chunks):
+            put(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # list() raises the first failed put
+        list(executor.map(put, zip(chunk_ids, chunks)))
+
+
+def _get_shard_index(key: str, e_tag: str) -> dict:
+    index = shard_indexes_cache.get((key, e_tag))
+    if index is None:
+        response = s3.Object(PROCESSING_BUCKET_NAME, key).get()
+        index = json.loads(response["Body"].read())
+        shard_indexes_cache.put((key, e_tag), index)
+
+    return index
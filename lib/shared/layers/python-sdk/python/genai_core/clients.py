@@ -299,6 +299,8 @@ def _get_standard_bedrock_client(service_name: str) -> Any:
         retries={"max_attempts": 10, "mode": "adaptive"},
         connect_timeout=5,
         read_timeout=60,
+        # Embedding calls are fanned out over threads sharing one client
+        max_pool_connections=50,
     )
 
     client = boto3.client(service_name, region_name=region, config=client_config)
@@ -1,25 +1,104 @@
 import os
 import json
+import hashlib
 import genai_core.types
 import genai_core.clients
+import genai_core.embeddings
 import genai_core.parameters
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
-
+from aws_lambda_powertools import Logger
+from genai_core.utils.cache import LRUCache
 
 SAGEMAKER_RAG_MODELS_ENDPOINT = os.environ.get("SAGEMAKER_RAG_MODELS_ENDPOINT")
+# Sequence length of the cross encoder, query and passage share it
+CROSS_ENCODER_MAX_TOKENS = int(os.environ.get("CROSS_ENCODER_MAX_TOKENS", "512"))
+CROSS_ENCODER_BATCH_SIZE = int(os.environ.get("CROSS_ENCODER_BATCH_SIZE", "32"))
+CROSS_ENCODER_MAX_CONCURRENCY = int(
+    os.environ.get("CROSS_ENCODER_MAX_CONCURRENCY", "2")
+)
+CROSS_ENCODER_CACHE_MAX_SIZE = int(
+    os.environ.get("CROSS_ENCODER_CACHE_MAX_SIZE", "10000")
+)
+CROSS_ENCODER_CACHE_TTL = float(os.environ.get("CROSS_ENCODER_CACHE_TTL", "3600"))
+logger = Logger()
+
+passage_scores_cache = LRUCache(
+    CROSS_ENCODER_CACHE_MAX_SIZE, ttl=CROSS_ENCODER_CACHE_TTL
+)
 
 
 def rank_passages(
-    model: genai_core.types.CrossEncoderModel, input: str, passages: list[str]
+    model: genai_core.types.CrossEncoderModel,
+    input: str,
+    passages: list[str],
+    keys: Optional[list[str]] = None,
 ):
+    """Score the passages against the input, returns one score per passage.
+
+    Passages are truncated to what the model can read and sent in micro
+    batches of passages of similar length. When `keys` (such as chunk ids)
+    are given, scores are cached per model, input and key.
+    """
     input = input[:10000]
     passages = passages[:1000]
-    passages = [x[:10000] for x in passages]
 
-    if model.provider == "sagemaker":
-        return _rank_passages_sagemaker(model, input, passages)
+    if model.provider != "sagemaker":
+        raise genai_core.types.CommonError("Unknown provider")
+
+    passages = truncate_passages(model.name, input, passages)
+    if keys is None:
+        return _rank_passages_batched(model, input, passages)
+
+    input_hash = hashlib.sha256(input.encode()).hexdigest()
+    cache_keys = [(model.provider, model.name, input_hash, key) for key in keys]
+    scores = [passage_scores_cache.get(key) for key in cache_keys]
+    missing = [idx for idx, score in enumerate(scores) if score is None]
+
+    if missing:
+        missing_scores = _rank_passages_batched(
+            model, input, [passages[idx] for idx in missing]
+        )
+        for idx, score in zip(missing, missing_scores):
+            scores[idx] = score
+            passage_scores_cache.put(cache_keys[idx], score)
+
+    logger.debug(
+        "Cross encoder cache",
+        hits=len(passages) - len(missing),
+        misses=len(missing),
+    )
+
+    return scores
+
+
+def truncate_passages(model_name: str, input: str, passages: list[str]) -> list[str]:
+    """Cut passages to the tokens the model reads after the input.
+
+    Tokens are counted with get_tokenizer, its large vocabulary needs fewer
+    tokens for a text than the WordPiece vocabularies of the cross encoders.
+    The model server still truncates the rest with the model tokenizer, no
+    text the model could read is dropped here.
+    """
+    tokenizer = genai_core.embeddings.get_tokenizer(model_name)
+    input_tokens = len(tokenizer.encode(input, disallowed_special=()))
+    # [CLS] and [SEP] tokens
+    max_tokens = max(CROSS_ENCODER_MAX_TOKENS - input_tokens - 3, 64)
 
-    raise genai_core.typesCommonError("Unknown provider")
+    ret_value = []
+    for passage in passages:
+        # Every token covers at least one character
+        if len(passage) <= max_tokens:
+            ret_value.append(passage)
+            continue
+
+        tokens = tokenizer.encode(passage, disallowed_special=())
+        if len(tokens) > max_tokens:
+            passage = tokenizer.decode(tokens[:max_tokens])
+
+        ret_value.append(passage)
+
+    return ret_value
 
 
 def get_cross_encoder_models():
@@ -45,6 +124,37 @@ def get_cross_encoder_model(
     return None
 
 
+def _rank_passages_batched(
+    model: genai_core.types.CrossEncoderModel, input: str, passages: list[str]
+):
+    if len(passages) == 0:
+        return []
+
+    # Batches of similar lengths keep the padding added by the tokenizer low
+    order = sorted(range(len(passages)), key=lambda idx: len(passages[idx]))
+    batches = [
+        order[i : i + CROSS_ENCODER_BATCH_SIZE]
+        for i in range(0, len(order), CROSS_ENCODER_BATCH_SIZE)
+    ]
+
+    def rank_batch(batch):
+        return _rank_passages_sagemaker(model, input, [passages[idx] for idx in batch])
+
+    max_workers = min(len(batches), CROSS_ENCODER_MAX_CONCURRENCY)
+    if max_workers <= 1:
+        batch_scores = [rank_batch(batch) for batch in batches]
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            batch_scores = list(executor.map(rank_batch, batches))
+
+    scores = [None] * len(passages)
+    for batch, batch_score in zip(batches, batch_scores):
+        for idx, score in zip(batch, batch_score):
+            scores[idx] = score
+
+    return scores
+
+
 def _rank_passages_sagemaker(
     model: genai_core.types.CrossEncoderModel, input: str, passages: list[str]
 ):
@@ -1,24 +1,74 @@
 import json
+import math
 import os
 import random
+import threading
 import time
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
 
 import botocore
 import numpy as np
+import tiktoken
+import tiktoken.model
 from aws_lambda_powertools import Logger
 
 import genai_core.clients
+import genai_core.embeddings_cache
 import genai_core.parameters
 from genai_core.model_providers import get_model_provider
+from genai_core.utils.cache import LRUCache
 from genai_core.types import CommonError, Task
 from genai_core.types import EmbeddingsModel, Provider
 
 SAGEMAKER_RAG_MODELS_ENDPOINT = os.environ.get("SAGEMAKER_RAG_MODELS_ENDPOINT")
+EMBEDDINGS_MAX_CONCURRENCY = os.environ.get("EMBEDDINGS_MAX_CONCURRENCY")
+TITAN_MAX_CONCURRENCY = int(os.environ.get("TITAN_EMBEDDINGS_MAX_CONCURRENCY", "16"))
+QUERY_EMBEDDINGS_CACHE_MAX_SIZE = int(
+    os.environ.get("QUERY_EMBEDDINGS_CACHE_MAX_SIZE", "1000")
+)
+QUERY_EMBEDDINGS_CACHE_TTL = float(os.environ.get("QUERY_EMBEDDINGS_CACHE_TTL", "3600"))
+# Models without a tiktoken encoding of their own are measured with this one,
+# their tokens are counted this many times over. Their own tokenizers have
+# smaller vocabularies and split a text into more tokens.
+EMBEDDINGS_TOKENIZER_ENCODING = os.environ.get(
+    "EMBEDDINGS_TOKENIZER_ENCODING", "cl100k_base"
+)
+EMBEDDINGS_TOKENIZER_MARGIN = float(
+    os.environ.get("EMBEDDINGS_TOKENIZER_MARGIN", "1.3")
+)
+# Encodings bundled with the common layer, tiktoken downloads them otherwise
+TIKTOKEN_LAYER_CACHE_DIR = "/opt/python/tiktoken_cache"
+if "TIKTOKEN_CACHE_DIR" not in os.environ and os.path.isdir(TIKTOKEN_LAYER_CACHE_DIR):
+    os.environ["TIKTOKEN_CACHE_DIR"] = TIKTOKEN_LAYER_CACHE_DIR
 logger = Logger()
 
+# Maximum number of batches sent to a provider at the same time
+PROVIDER_MAX_CONCURRENCY = {
+    Provider.OPENAI.value: 4,
+    Provider.BEDROCK.value: 4,
+    Provider.SAGEMAKER.value: 2,
+}
+
+
+# Input windows of models with a limit of their own
+# https://huggingface.co/intfloat/multilingual-e5-large
+# https://huggingface.co/sentence-transformers/all-MiniLM-L6-v2
+# https://platform.openai.com/docs/guides/embeddings
+MODEL_TOKEN_LIMITS = {
+    "intfloat/multilingual-e5-large": 512,
+    "sentence-transformers/all-MiniLM-L6-v2": 256,
+    "amazon.titan-embed-image-v1": 128,
+    "text-embedding-ada-002": 8191,
+    "text-embedding-3-small": 8191,
+    "text-embedding-3-large": 8191,
+}
+
 
 def get_model_token_limit(model_name):
+    if model_name in MODEL_TOKEN_LIMITS:
+        return MODEL_TOKEN_LIMITS[model_name]
+
     # Extract provider from model name
     model_provider = model_name.split(".")[0]
 
@@ -35,13 +85,133 @@ def get_model_token_limit(model_name):
     return PROVIDER_TOKEN_LIMITS.get(model_provider, PROVIDER_TOKEN_LIMITS["default"])
 
 
+def get_model_char_limit(model_name):
+    # Use existing 10000 char limit as max
+    return min(get_model_token_limit(model_name) * 4, 10000)
+
+
+tokenizers_cache = LRUCache(16)
+
+
+def get_tokenizer(model_name: str) -> tiktoken.Encoding:
+    """Returns the tiktoken encoding of the model, or the default encoding
+    for models tiktoken does not know. Encodings are loaded once per model.
+    """
+    tokenizer = tokenizers_cache.get(model_name)
+
+    if tokenizer is None:
+        try:
+            tokenizer = tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            tokenizer = tiktoken.get_encoding(EMBEDDINGS_TOKENIZER_ENCODING)
+
+        tokenizers_cache.put(model_name, tokenizer)
+
+    return tokenizer
+
+
+def get_token_count_function(model_name: str) -> Callable[[str], int]:
+    """Returns a function counting the tokens of a text for the model.
+
+    Models with a tiktoken encoding are counted exactly, the others with the
+    default encoding and EMBEDDINGS_TOKENIZER_MARGIN.
+    """
+    tokenizer = get_tokenizer(model_name)
+    try:
+        tiktoken.model.encoding_name_for_model(model_name)
+        margin = 1.0
+    except KeyError:
+        margin = EMBEDDINGS_TOKENIZER_MARGIN
+
+    def count_tokens(text: str) -> int:
+        return math.ceil(len(tokenizer.encode(text, disallowed_special=())) * margin)
+
+    return count_tokens
+
+
 def generate_embeddings(
-    model: EmbeddingsModel, input: list[str], task: str = "store", batch_size: int = 50
+    model: EmbeddingsModel,
+    input: list[str],
+    task: str = "store",
+    batch_size: int = 50,
+    use_cache: bool = True,
+    max_concurrency: Optional[int] = None,
+) -> list[list[float]]:
+    """Embeds the input in batches of batch_size sent concurrently, up to
+    max_concurrency batches (the provider limit by default) at a time."""
+    cache = genai_core.embeddings_cache.get_embeddings_cache() if use_cache else None
+    if cache is None:
+        return _generate_embeddings(model, input, task, batch_size, max_concurrency)
+
+    task_name = task.value if isinstance(task, Task) else task
+    keys = [
+        genai_core.embeddings_cache.get_cache_key(
+            model.provider, model.name, task_name, text
+        )
+        for text in input
+    ]
+    texts = dict(zip(keys, input))
+
+    embeddings = cache.get_many(keys)
+    # Identical texts are only sent to the model once
+    missing = [key for key in texts if key not in embeddings]
+
+    if missing:
+        missing_embeddings = _generate_embeddings(
+            model, [texts[key] for key in missing], task, batch_size, max_concurrency
+        )
+        generated = dict(zip(missing, missing_embeddings))
+        cache.put_many(generated)
+        embeddings.update(generated)
+
+    hits = len(input) - len(missing)
+    logger.info(
+        "Embeddings cache",
+        hits=hits,
+        misses=len(missing),
+        hit_ratio=hits / len(input) if input else 0.0,
+    )
+
+    return [embeddings[key] for key in keys]
+
+
+query_embeddings_cache = LRUCache(
+    QUERY_EMBEDDINGS_CACHE_MAX_SIZE, ttl=QUERY_EMBEDDINGS_CACHE_TTL
+)
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.split()).casefold()
+
+
+def generate_query_embeddings(model: EmbeddingsModel, query: str) -> list[float]:
+    """Embeds a search query, reusing recent embeddings of the same
+    normalized query for the same model.
+    """
+    key = (model.provider, model.name, normalize_query(query))
+    embedding = query_embeddings_cache.get(key)
+
+    if embedding is None:
+        # Queries are cached here with a TTL, skip the content cache
+        embeddings = generate_embeddings(model, [query], Task.RETRIEVE, use_cache=False)
+        embedding = embeddings[0]
+        query_embeddings_cache.put(key, embedding)
+
+    logger.debug("Query embeddings cache", **query_embeddings_cache.get_stats())
+
+    return list(embedding)
+
+
+def _generate_embeddings(
+    model: EmbeddingsModel,
+    input: list[str],
+    task: str,
+    batch_size: int,
+    max_concurrency: Optional[int] = None,
 ) -> list[list[float]]:
     try:
         # Get model-specific token limit
-        token_limit = get_model_token_limit(model.name)
-        char_limit = min(token_limit * 4, 10000)  # Use existing 10000 char limit as max
+        char_limit = get_model_char_limit(model.name)
 
         # Chunk inputs and track mapping
         chunked_input = []
@@ -64,21 +234,26 @@ def generate_embeddings(
 
             chunked_input.extend(chunks)
 
-        ret_value = []
         batch_split = [
             chunked_input[i : i + batch_size]
             for i in range(0, len(chunked_input), batch_size)
         ]
 
-        for batch in batch_split:
-            if model.provider == Provider.OPENAI.value:
-                ret_value.extend(_generate_embeddings_openai(model, batch))
-            elif model.provider == Provider.BEDROCK.value:
-                ret_value.extend(_generate_embeddings_bedrock(model, batch, task))
-            elif model.provider == Provider.SAGEMAKER.value:
-                ret_value.extend(_generate_embeddings_sagemaker(model, batch))
-            else:
-                raise CommonError(f"Unknown provider: {model.provider}")
+        generate_batch = _get_batch_generator(model, task)
+        max_workers = min(
+            len(batch_split), max_concurrency or get_max_concurrency(model.provider)
+        )
+
+        if max_workers <= 1:
+            batch_results = [generate_batch(batch) for batch in batch_split]
+        else:
+            # map() keeps the batch order so results line up with chunk_mapping
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                batch_results = list(executor.map(generate_batch, batch_split))
+
+        ret_value = [
+            embedding for embeddings in batch_results for embedding in embeddings
+        ]
 
         # Combine embeddings from the same original input
         final_embeddings = []
@@ -99,6 +274,13 @@ def generate_embeddings(
         raise CommonError(f"Failed to generate embeddings: {str(e)}")
 
 
+def get_max_concurrency(provider: str) -> int:
+    if EMBEDDINGS_MAX_CONCURRENCY:
+        return max(1, int(EMBEDDINGS_MAX_CONCURRENCY))
+
+    return PROVIDER_MAX_CONCURRENCY.get(provider, 1)
+
+
 def get_embeddings_models():
     return get_model_provider().get_embedding_models()
 
@@ -107,24 +289,49 @@ def get_embeddings_model(provider: Provider, name: str) -> Optional[EmbeddingsMo
     return get_model_provider().get_embeddings_model(provider, name)
 
 
-def _generate_embeddings_openai(model: EmbeddingsModel, input: list[str]):
+def _get_batch_generator(model: EmbeddingsModel, task: Task):
+    # Clients are created once and shared by all the batches of a call
+    if model.provider == Provider.OPENAI.value:
+        openai = _get_openai_client()
+        return lambda batch: _generate_embeddings_openai(model, batch, openai)
+    elif model.provider == Provider.BEDROCK.value:
+        bedrock = _get_bedrock_client()
+        return lambda batch: _generate_embeddings_bedrock(model, batch, task, bedrock)
+    elif model.provider == Provider.SAGEMAKER.value:
+        client = genai_core.clients.get_sagemaker_client()
+        return lambda batch: _generate_embeddings_sagemaker(model, batch, client)
+
+    raise CommonError(f"Unknown provider: {model.provider}")
+
+
+def _get_openai_client():
     openai = genai_core.clients.get_openai_client()
 
     if not openai:
         raise CommonError("OpenAI API is not available. Please set OPENAI_API_KEY.")
 
-    data = openai.embeddings.create(input=input, model=model.name).data
-    ret_value = [x.embedding for x in data]
-
-    return ret_value
+    return openai
 
 
-def _generate_embeddings_bedrock(model: EmbeddingsModel, input: list[str], task: Task):
+def _get_bedrock_client():
     bedrock = genai_core.clients.get_bedrock_client()
 
     if not bedrock:
         raise CommonError("Bedrock is not enabled.")
 
+    return bedrock
+
+
+def _generate_embeddings_openai(model: EmbeddingsModel, input: list[str], openai):
+    data = openai.embeddings.create(input=input, model=model.name).data
+    ret_value = [x.embedding for x in data]
+
+    return ret_value
+
+
+def _generate_embeddings_bedrock(
+    model: EmbeddingsModel, input: list[str], task: Task, bedrock
+):
     model_provider = model.name.split(".")[0]
     if model_provider == Provider.AMAZON.value:
         return _generate_embeddings_amazon(model, input, bedrock)
@@ -134,10 +341,92 @@ def _generate_embeddings_bedrock(model: EmbeddingsModel, input: list[str], task:
         raise CommonError(f'Unknown embeddings provider "{model_provider}"')
 
 
+class AdaptiveConcurrencyLimit(object):
+    """Caps in-flight calls, halving the cap on throttling and slowly
+    growing it back on success (additive increase, multiplicative decrease).
+    """
+
+    def __init__(self, max_limit: int):
+        self.max_limit = max(1, max_limit)
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= max(1, int(self.limit)):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self, throttled: bool = False):
+        with self.condition:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(1.0, self.limit / 2)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+
+# Shared by every Titan call in the process so throttling seen by one batch
+# slows down the others as well.
+titan_concurrency_limit = AdaptiveConcurrencyLimit(TITAN_MAX_CONCURRENCY)
+# Other retried errors (5xx, timeouts, connection errors) are not congestion
+THROTTLING_ERROR_CODES = {"ThrottlingException", "TooManyRequestsException"}
+# Set by the retry hook of the client for the call made by the current thread
+titan_throttling = threading.local()
+
+
 def _generate_embeddings_amazon(model: EmbeddingsModel, input: list[str], bedrock):
-    ret_value = []
-    for value in input:
-        body = json.dumps({"inputText": value})
+    # The client retries throttled calls itself, the hook records whether
+    # any attempt of a call was throttled
+    bedrock.meta.events.register(
+        "needs-retry.bedrock-runtime.InvokeModel",
+        _record_titan_throttling,
+        unique_id="genai-core-titan-throttling",
+    )
+
+    # Titan only accepts a single inputText per request
+    max_workers = min(len(input), titan_concurrency_limit.max_limit)
+
+    if max_workers <= 1:
+        ret_value = [_invoke_titan_embeddings(model, value, bedrock) for value in input]
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            ret_value = list(
+                executor.map(
+                    lambda value: _invoke_titan_embeddings(model, value, bedrock),
+                    input,
+                )
+            )
+
+    ret_value = np.array(ret_value)
+    ret_value = ret_value / np.linalg.norm(ret_value, axis=1, keepdims=True)
+    ret_value = ret_value.tolist()
+    return ret_value
+
+
+def _record_titan_throttling(response=None, **kwargs):
+    if response is None:
+        return None
+
+    http_response, parsed = response
+    error_code = parsed.get("Error", {}).get("Code")
+    if http_response.status_code == 429 or error_code in THROTTLING_ERROR_CODES:
+        titan_throttling.throttled = True
+
+    # Leaves the retry decision to the client
+    return None
+
+
+def _invoke_titan_embeddings(model: EmbeddingsModel, value: str, bedrock):
+    body = json.dumps({"inputText": value})
+
+    # A call that was throttled on any attempt (or ran out of retries) is
+    # reported to the limiter as throttled.
+    titan_concurrency_limit.acquire()
+    titan_throttling.throttled = False
+    try:
         response = bedrock.invoke_model(
             body=body,
             modelId=model.name,
@@ -145,14 +434,15 @@ def _generate_embeddings_amazon(model: EmbeddingsModel, input: list[str], bedroc
             contentType="application/json",
         )
         response_body = json.loads(response.get("body").read())
-        embedding = response_body.get("embedding")
 
-        ret_value.append(embedding)
-
-    ret_value = np.array(ret_value)
-    ret_value = ret_value / np.linalg.norm(ret_value, axis=1, keepdims=True)
-    ret_value = ret_value.tolist()
-    return ret_value
+        return response_body.get("embedding")
+    except botocore.exceptions.ClientError as error:
+        error_code = error.response.get("Error", {}).get("Code")
+        if error_code in THROTTLING_ERROR_CODES:
+            titan_throttling.throttled = True
+        raise error
+    finally:
+        titan_concurrency_limit.release(titan_throttling.throttled)
 
 
 def _generate_embeddings_cohere(
@@ -174,9 +464,7 @@ def _generate_embeddings_cohere(
     return embeddings
 
 
-def _generate_embeddings_sagemaker(model: EmbeddingsModel, input: list[str]):
-    client = genai_core.clients.get_sagemaker_client()
-
+def _generate_embeddings_sagemaker(model: EmbeddingsModel, input: list[str], client):
     max_retries = 5
     for attempt in range(max_retries):
         try:
@@ -0,0 +1,206 @@
+import os
+import time
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import boto3
+import numpy as np
+from aws_lambda_powertools import Logger
+from botocore.exceptions import BotoCoreError, ClientError
+
+from genai_core.utils.cache import LRUCache
+
+EMBEDDINGS_CACHE_ENABLED = (
+    os.environ.get("EMBEDDINGS_CACHE_ENABLED", "true").lower() == "true"
+)
+EMBEDDINGS_CACHE_MAX_SIZE = int(os.environ.get("EMBEDDINGS_CACHE_MAX_SIZE", "2000"))
+EMBEDDINGS_CACHE_TABLE_NAME = os.environ.get("EMBEDDINGS_CACHE_TABLE_NAME")
+EMBEDDINGS_CACHE_TTL_DAYS = int(os.environ.get("EMBEDDINGS_CACHE_TTL_DAYS", "30"))
+
+logger = Logger()
+
+
+def get_cache_key(provider: str, model_name: str, task: str, text: str) -> str:
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    return f"{provider}:{model_name}:{task}:{text_hash}"
+
+
+class EmbeddingsCacheBackend(ABC):
+    """Persistent tier of the embeddings cache"""
+
+    @abstractmethod
+    def get_many(self, keys: list[str]) -> dict[str, list[float]]: ...
+
+    @abstractmethod
+    def put_many(self, items: dict[str, list[float]]): ...
+
+
+class LocalEmbeddingsCacheBackend(EmbeddingsCacheBackend):
+    """In memory stand-in for a persistent backend"""
+
+    def __init__(self):
+        self._items = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        with self._lock:
+            return {key: self._items[key] for key in keys if key in self._items}
+
+    def put_many(self, items: dict[str, list[float]]):
+        with self._lock:
+            self._items.update(items)
+
+
+class DynamoDBEmbeddingsCacheBackend(EmbeddingsCacheBackend):
+    """Stores embeddings as float32 binaries in a DynamoDB table keyed by
+    `cache_key`, expiring them through the `expires_at` TTL attribute.
+    """
+
+    max_batch_get_size = 100
+    max_unprocessed_retries = 3
+
+    def __init__(self, table_name: str, ttl_days: int = EMBEDDINGS_CACHE_TTL_DAYS):
+        self.table_name = table_name
+        self.ttl_days = ttl_days
+        self.dynamodb = boto3.resource("dynamodb")
+        self.table = self.dynamodb.Table(table_name)
+
+    def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        ret_value = {}
+        for i in range(0, len(keys), self.max_batch_get_size):
+            request = {
+                self.table_name: {
+                    "Keys": [
+                        {"cache_key": key}
+                        for key in keys[i : i + self.max_batch_get_size]
+                    ],
+                    "ProjectionExpression": "cache_key, embedding",
+                }
+            }
+
+            for _ in range(self.max_unprocessed_retries):
+                response = self.dynamodb.batch_get_item(RequestItems=request)
+                for item in response.get("Responses", {}).get(self.table_name, []):
+                    embedding = np.frombuffer(item["embedding"].value, dtype=np.float32)
+                    ret_value[item["cache_key"]] = embedding.tolist()
+
+                request = response.get("UnprocessedKeys")
+                if not request:
+                    break
+
+        return ret_value
+
+    def put_many(self, items: dict[str, list[float]]):
+        expires_at = int(time.time()) + self.ttl_days * 24 * 60 * 60
+
+        with self.table.batch_writer() as batch:
+            for key, embedding in items.items():
+                batch.put_item(
+                    Item={
+                        "cache_key": key,
+                        "embedding": np.asarray(embedding, dtype=np.float32).tobytes(),
+                        "expires_at": expires_at,
+                    }
+                )
+
+
+class EmbeddingsCache(object):
+    """Two tier embeddings cache: a process local LRU in front of an
+    optional persistent backend.
+    """
+
+    def __init__(
+        self,
+        max_size: int = EMBEDDINGS_CACHE_MAX_SIZE,
+        backend: Optional[EmbeddingsCacheBackend] = None,
+    ):
+        self.local = LRUCache(max_size)
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._stats = {"local_hits": 0, "backend_hits": 0, "misses": 0}
+
+    def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        ret_value = {}
+        for key in keys:
+            embedding = self.local.get(key)
+            if embedding is not None:
+                # Stored as arrays to keep the memory footprint small
+                ret_value[key] = embedding.tolist()
+
+        local_hits = len(ret_value)
+        missing = [key for key in keys if key not in ret_value]
+
+        backend_hits = 0
+        if missing and self.backend is not None:
+            try:
+                found = self.backend.get_many(missing)
+            except (BotoCoreError, ClientError) as error:
+                logger.warning(f"Embeddings cache lookup failed: {error}")
+                found = {}
+
+            for key, embedding in found.items():
+                self.local.put(key, np.asarray(embedding))
+                ret_value[key] = embedding
+
+            backend_hits = len(found)
+
+        with self._lock:
+            self._stats["local_hits"] += local_hits
+            self._stats["backend_hits"] += backend_hits
+            self._stats["misses"] += len(keys) - local_hits - backend_hits
+
+        return ret_value
+
+    def put_many(self, items: dict[str, list[float]]):
+        for key, embedding in items.items():
+            self.local.put(key, np.asarray(embedding))
+
+        if items and self.backend is not None:
+            try:
+                self.backend.put_many(items)
+            except (BotoCoreError, ClientError) as error:
+                logger.warning(f"Embeddings cache update failed: {error}")
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+
+        lookups = stats["local_hits"] + stats["backend_hits"] + stats["misses"]
+        hits = stats["local_hits"] + stats["backend_hits"]
+        stats["hit_ratio"] = hits / lookups if lookups else 0.0
+
+        return stats
+
+
+_embeddings_cache = None
+_embeddings_cache_lock = threading.Lock()
+
+
+def get_embeddings_cache() -> Optional[EmbeddingsCache]:
+    global _embeddings_cache
+
+    if not EMBEDDINGS_CACHE_ENABLED:
+        return None
+
+    if _embeddings_cache is None:
+        with _embeddings_cache_lock:
+            if _embeddings_cache is None:
+                backend = None
+                if EMBEDDINGS_CACHE_TABLE_NAME:
+                    backend = DynamoDBEmbeddingsCacheBackend(
+                        EMBEDDINGS_CACHE_TABLE_NAME
+                    )
+
+                _embeddings_cache = EmbeddingsCache(backend=backend)
+
+    return _embeddings_cache
+
+
+def set_embeddings_cache(cache: Optional[EmbeddingsCache]):
+    global _embeddings_cache
+
+    with _embeddings_cache_lock:
+        _embeddings_cache = cache
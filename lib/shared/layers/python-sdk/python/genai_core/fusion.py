@@ -0,0 +1,191 @@
+import os
+import heapq
+import genai_core.cross_encoder
+from typing import List
+
+VECTOR_SEARCH_SCORE_THRESHOLD = 0.5
+RANK_FUSION_RRF_K = int(os.environ.get("RANK_FUSION_RRF_K", "60"))
+RANK_FUSION_VECTOR_WEIGHT = float(os.environ.get("RANK_FUSION_VECTOR_WEIGHT", "0.5"))
+CROSS_ENCODER_TOP_N = int(os.environ.get("CROSS_ENCODER_TOP_N", "50"))
+
+RANK_FUSION_NONE = "none"
+RANK_FUSION_RRF = "rrf"
+RANK_FUSION_WEIGHTED = "weighted"
+RANK_FUSION_MODES = [RANK_FUSION_NONE, RANK_FUSION_RRF, RANK_FUSION_WEIGHTED]
+
+
+def merge_results(*result_lists: List[dict]) -> List[dict]:
+    """Merge vector and keyword search records into unique items.
+
+    Records are deduplicated by `chunk_id` in a single pass keeping the first
+    occurrence order. Records for the same chunk end up sharing `sources` and
+    both search scores, so the per source lists returned by the full response
+    stay consistent with the merged items.
+    """
+    unique_items = {}
+    for records in result_lists:
+        for item in records:
+            current = unique_items.get(item["chunk_id"])
+            if current is None:
+                unique_items[item["chunk_id"]] = item
+                continue
+
+            sources = sorted(set(current["sources"]) | set(item["sources"]))
+            current["sources"] = sources
+            item["sources"] = list(sources)
+
+            for key in ["vector_search_score", "keyword_search_score"]:
+                if current[key] is None:
+                    current[key] = item[key]
+                elif item[key] is None:
+                    item[key] = current[key]
+
+    return list(unique_items.values())
+
+
+def rerank(
+    cross_encoder_model: dict, query: str, items: List[dict], *result_lists
+) -> List[dict]:
+    """Score the items with the cross encoder and return them best first.
+
+    Only the CROSS_ENCODER_TOP_N best items by reciprocal rank over
+    `result_lists` are scored and returned. The scores are copied to the
+    records of `result_lists` by `chunk_id`, other records get no score.
+    """
+    if len(items) == 0:
+        return items
+
+    if len(items) > CROSS_ENCODER_TOP_N:
+        ranks = reciprocal_rank_fusion(*result_lists)
+        items = heapq.nlargest(
+            CROSS_ENCODER_TOP_N,
+            items,
+            key=lambda item: ranks.get(item["chunk_id"], 0.0),
+        )
+
+    passages = [item["content"] for item in items]
+    passage_scores = genai_core.cross_encoder.rank_passages(
+        cross_encoder_model,
+        query,
+        passages,
+        keys=[item["chunk_id"] for item in items],
+    )
+
+    scores = {item["chunk_id"]: score for item, score in zip(items, passage_scores)}
+
+    return _apply_scores(scores, items, *result_lists, default=None)
+
+
+def fuse(
+    mode: str,
+    items: List[dict],
+    vector_search_records: List[dict],
+    keyword_search_records: List[dict],
+) -> List[dict]:
+    """Score the items from the vector and keyword search ranks and return
+    them best first, without calling a cross encoder.
+
+    `rrf` is Reciprocal Rank Fusion, sum(1 / (k + rank)) over both lists.
+    `weighted` min-max normalizes the scores of each list and combines them
+    with RANK_FUSION_VECTOR_WEIGHT for vector and the rest for keyword hits.
+    Both lists must be sorted best first.
+    """
+    if mode == RANK_FUSION_RRF:
+        scores = reciprocal_rank_fusion(vector_search_records, keyword_search_records)
+    elif mode == RANK_FUSION_WEIGHTED:
+        scores = weighted_score_fusion(vector_search_records, keyword_search_records)
+    else:
+        raise ValueError(f"Unknown rank fusion mode: {mode}")
+
+    return _apply_scores(scores, items, vector_search_records, keyword_search_records)
+
+
+def reciprocal_rank_fusion(*result_lists, k: int = RANK_FUSION_RRF_K) -> dict:
+    scores = {}
+    for records in result_lists:
+        for rank, record in enumerate(records, start=1):
+            chunk_id = record["chunk_id"]
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+
+    return scores
+
+
+def weighted_score_fusion(
+    vector_search_records: List[dict],
+    keyword_search_records: List[dict],
+    vector_weight: float = RANK_FUSION_VECTOR_WEIGHT,
+) -> dict:
+    scores = {}
+    for records, key, weight in [
+        (vector_search_records, "vector_search_score", vector_weight),
+        (keyword_search_records, "keyword_search_score", 1 - vector_weight),
+    ]:
+        if len(records) == 0:
+            continue
+
+        # Lists are sorted best first, which also covers distance metrics
+        # where lower scores are better.
+        best = records[0][key]
+        worst = records[-1][key]
+        for record in records:
+            if best == worst:
+                normalized = 1.0
+            else:
+                normalized = (record[key] - worst) / (best - worst)
+
+            chunk_id = record["chunk_id"]
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + weight * normalized
+
+    return scores
+
+
+def _apply_scores(
+    scores: dict, items: List[dict], *result_lists, default: float = 0.0
+) -> List[dict]:
+    for item in items:
+        item["score"] = scores.get(item["chunk_id"], default)
+
+    for records in result_lists:
+        for record in records:
+            record["score"] = scores.get(record["chunk_id"], default)
+
+    return sorted(items, key=lambda x: x["score"], reverse=True)
+
+
+def select_top_k(
+    items: List[dict],
+    limit: int,
+    threshold: float = None,
+    vector_score_sign: int = 1,
+) -> List[dict]:
+    """Select up to `limit` items for a search response.
+
+    When `threshold` is set the items are expected to be sorted by `score`
+    and the ones above it are taken first. Any remaining slots are filled
+    with the best vector search hits scoring above
+    VECTOR_SEARCH_SCORE_THRESHOLD. `vector_score_sign` is -1 for metrics
+    where lower scores are better such as the negative inner product.
+    """
+    if threshold is not None:
+        ret_items = [item for item in items if item["score"] > threshold][:limit]
+    else:
+        ret_items = items[:limit]
+
+    missing = limit - len(ret_items)
+    if missing <= 0 or len(items) == len(ret_items):
+        return ret_items
+
+    def vector_score(item):
+        score = item["vector_search_score"]
+        return vector_score_sign * score if score is not None else -1
+
+    selected = {item["chunk_id"] for item in ret_items}
+    candidates = [
+        item
+        for item in items
+        if item["chunk_id"] not in selected
+        and vector_score(item) > VECTOR_SEARCH_SCORE_THRESHOLD
+    ]
+
+    # nlargest is stable, matching a full sort followed by a slice
+    return ret_items + heapq.nlargest(missing, candidates, key=vector_score)
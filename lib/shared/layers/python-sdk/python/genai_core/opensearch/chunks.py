@@ -1,6 +1,20 @@
+import os
 from typing import List, Optional
+from aws_lambda_powertools import Logger
+from opensearchpy import helpers
 from .client import get_open_search_client
 
+OPEN_SEARCH_BULK_CHUNK_SIZE = int(os.environ.get("OPEN_SEARCH_BULK_CHUNK_SIZE", "500"))
+OPEN_SEARCH_BULK_MAX_BYTES = int(
+    os.environ.get("OPEN_SEARCH_BULK_MAX_BYTES", str(10 * 1024 * 1024))
+)
+OPEN_SEARCH_BULK_MAX_RETRIES = int(os.environ.get("OPEN_SEARCH_BULK_MAX_RETRIES", "5"))
+OPEN_SEARCH_BULK_INITIAL_BACKOFF = 2
+OPEN_SEARCH_CLEAN_PAGE_SIZE = 1000
+OPEN_SEARCH_BULK_MAX_BACKOFF = 60
+
+logger = Logger()
+
 
 def add_chunks_open_search(
     workspace_id: str,
@@ -25,50 +39,108 @@ def add_chunks_open_search(
     if replace:
         removed_vectors = clean_chunks_open_search(workspace_id, document_id)
 
-    for idx in range(len(chunk_ids)):
-        chunk_id = chunk_ids[idx]
-        content = chunks[idx]
-        content_complement = chunk_complements[idx] if idx < complements_len else None
-
-        add_body = {
-            "chunk_id": chunk_id,
-            "workspace_id": workspace_id,
-            "document_id": document_id,
-            "document_sub_id": document_sub_id,
-            "document_type": document_type,
-            "document_sub_type": document_sub_type,
-            "path": path,
-            "title": title,
-            "content": content,
-            "content_complement": content_complement,
-            "content_embeddings": chunk_embeddings[idx],
-        }
+    def actions():
+        for idx in range(len(chunk_ids)):
+            chunk_id = chunk_ids[idx]
+            content = chunks[idx]
+            content_complement = (
+                chunk_complements[idx] if idx < complements_len else None
+            )
+
+            yield {
+                "_op_type": "index",
+                "_index": index_name,
+                "_source": {
+                    "chunk_id": chunk_id,
+                    "workspace_id": workspace_id,
+                    "document_id": document_id,
+                    "document_sub_id": document_sub_id,
+                    "document_type": document_type,
+                    "document_sub_type": document_sub_type,
+                    "path": path,
+                    "title": title,
+                    "content": content,
+                    "content_complement": content_complement,
+                    "content_embeddings": chunk_embeddings[idx],
+                },
+            }
+
+    # Batches are bounded by count and size, 429 responses are retried
+    # with exponential backoff before the remaining errors are raised.
+    added_vectors = 0
+    for ok, item in helpers.streaming_bulk(
+        client,
+        actions(),
+        chunk_size=OPEN_SEARCH_BULK_CHUNK_SIZE,
+        max_chunk_bytes=OPEN_SEARCH_BULK_MAX_BYTES,
+        max_retries=OPEN_SEARCH_BULK_MAX_RETRIES,
+        initial_backoff=OPEN_SEARCH_BULK_INITIAL_BACKOFF,
+        max_backoff=OPEN_SEARCH_BULK_MAX_BACKOFF,
+    ):
+        if ok:
+            added_vectors += 1
 
-        client.index(index=index_name, body=add_body)
+    logger.info("Indexed chunks", index_name=index_name, added_vectors=added_vectors)
 
-    return {"removed_vectors": removed_vectors, "added_vectors": len(chunk_ids)}
+    return {"removed_vectors": removed_vectors, "added_vectors": added_vectors}
 
 
-def clean_chunks_open_search(workspace_id: str, document_id: str):
+def clean_chunks_open_search(
+    workspace_id: str,
+    document_id: str,
+    keep_chunk_ids: Optional[List[str]] = None,
+    chunk_ids: Optional[List[str]] = None,
+) -> int:
     index_name = workspace_id.replace("-", "")
     client = get_open_search_client()
+    keep = set(str(x) for x in keep_chunk_ids or [])
+    only = set(str(x) for x in chunk_ids) if chunk_ids is not None else None
 
     query = {
-        "query": {
-            "bool": {
-                "must": [
-                    {"term": {"workspace_id": workspace_id}},
-                    {"term": {"document_id": document_id}},
-                ]
-            }
+        "bool": {
+            "must": [
+                {"term": {"workspace_id": workspace_id}},
+                {"term": {"document_id": document_id}},
+            ]
         }
     }
 
-    response = client.search(index=index_name, body=query)
-    docs = response["hits"]["hits"]
-    removed_vectors = len(docs)
+    # Pages through every chunk of the document, not only the first hits
+    doc_ids = []
+    search_after = None
+    while True:
+        body = {
+            "query": query,
+            "size": OPEN_SEARCH_CLEAN_PAGE_SIZE,
+            "sort": [{"chunk_id": "asc"}],
+            "_source": ["chunk_id"],
+        }
+        if search_after is not None:
+            body["search_after"] = search_after
+
+        docs = client.search(index=index_name, body=body)["hits"]["hits"]
+        if len(docs) == 0:
+            break
+
+        doc_ids.extend(
+            doc["_id"]
+            for doc in docs
+            if doc["_source"]["chunk_id"] not in keep
+            and (only is None or doc["_source"]["chunk_id"] in only)
+        )
+        search_after = docs[-1]["sort"]
 
-    for doc in docs:
-        client.delete(index=index_name, id=doc["_id"], ignore=[400, 404])
+    # Chunks already gone are not an error
+    for ok, item in helpers.streaming_bulk(
+        client,
+        ({"_op_type": "delete", "_index": index_name, "_id": x} for x in doc_ids),
+        chunk_size=OPEN_SEARCH_BULK_CHUNK_SIZE,
+        max_retries=OPEN_SEARCH_BULK_MAX_RETRIES,
+        initial_backoff=OPEN_SEARCH_BULK_INITIAL_BACKOFF,
+        max_backoff=OPEN_SEARCH_BULK_MAX_BACKOFF,
+        raise_on_error=False,
+    ):
+        if not ok:
+            logger.warning("Chunk not deleted", item=item)
 
-    return removed_vectors
+    return len(doc_ids)
@@ -1,29 +1,54 @@
 import os
 import boto3
+import threading
 import urllib.parse
-from opensearchpy import OpenSearch, RequestsHttpConnection
-from requests_aws4auth import AWS4Auth
+from opensearchpy import AWSV4SignerAuth, OpenSearch, RequestsHttpConnection
 
 
 OPEN_SEARCH_COLLECTION_ENDPOINT = os.environ.get("OPEN_SEARCH_COLLECTION_ENDPOINT")
+OPEN_SEARCH_POOL_MAXSIZE = int(os.environ.get("OPEN_SEARCH_POOL_MAXSIZE", "10"))
 
 port = 443
 timeout = 300
 
+_client = None
+_client_lock = threading.Lock()
+
 
 def get_open_search_client():
+    """Return the process wide OpenSearch client.
+
+    The client and its keep-alive connection pool are created once per
+    process and reused by every query, ingestion and delete call.
+    """
+    global _client
+
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _create_open_search_client()
+
+    return _client
+
+
+def reset_open_search_client():
+    global _client
+
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+
+
+def _create_open_search_client():
     service = "aoss"
     session = boto3.Session()
     credentials = session.get_credentials()
     host = urllib.parse.urlparse(OPEN_SEARCH_COLLECTION_ENDPOINT).hostname
 
-    awsauth = AWS4Auth(
-        credentials.access_key,
-        credentials.secret_key,
-        session.region_name,
-        service,
-        session_token=credentials.token,
-    )
+    # Every request is signed with freshly frozen credentials, so the cached
+    # client keeps working when temporary credentials rotate.
+    awsauth = AWSV4SignerAuth(credentials, session.region_name, service)
 
     opensearch = OpenSearch(
         hosts=[{"host": host, "port": port}],
@@ -31,6 +56,7 @@ def get_open_search_client():
         use_ssl=True,
         verify_certs=True,
         connection_class=RequestsHttpConnection,
+        pool_maxsize=OPEN_SEARCH_POOL_MAXSIZE,
         timeout=timeout,
     )
 
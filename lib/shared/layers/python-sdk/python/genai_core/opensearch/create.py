@@ -1,8 +1,11 @@
 from aws_lambda_powertools import Logger
 from .client import get_open_search_client
+from genai_core.types import SearchSettings
 
 logger = Logger()
 
+DEFAULT_EF_SEARCH = 512
+
 
 def create_workspace_index(workspace: dict):
     workspace_id = workspace["workspace_id"]
@@ -11,7 +14,7 @@ def create_workspace_index(workspace: dict):
 
     client = get_open_search_client()
 
-    ef_search = 512
+    ef_search = SearchSettings.from_workspace(workspace).ef_search or DEFAULT_EF_SEARCH
     index_body = {
         "settings": {
             "index": {
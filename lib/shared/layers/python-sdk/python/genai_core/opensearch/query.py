@@ -1,12 +1,19 @@
+import os
+import genai_core.fusion
 import genai_core.embeddings
 import genai_core.cross_encoder
 from typing import List
 from .client import get_open_search_client
 from aws_lambda_powertools import Logger
-from genai_core.types import CommonError, Task
+from genai_core.types import CommonError, SearchSettings
 
 logger = Logger()
 
+# Send the vector and keyword queries of hybrid search in one _msearch call
+OPEN_SEARCH_HYBRID_MSEARCH = (
+    os.environ.get("OPEN_SEARCH_HYBRID_MSEARCH", "true").lower() == "true"
+)
+
 
 def query_workspace_open_search(
     workspace_id: str,
@@ -23,9 +30,12 @@ def query_workspace_open_search(
     cross_encoder_model_provider = workspace["cross_encoder_model_provider"]
     cross_encoder_model_name = workspace["cross_encoder_model_name"]
     hybrid_search = workspace["hybrid_search"]
+    rank_fusion = workspace.get("rank_fusion") or genai_core.fusion.RANK_FUSION_NONE
     languages = workspace["languages"]
-    vector_search_limit = 25
-    keyword_search_limit = 25
+    search_settings = SearchSettings.from_workspace(workspace)
+    vector_search_limit = search_settings.vector_search_limit
+    keyword_search_limit = search_settings.keyword_search_limit
+    vector_search_k = search_settings.get_vector_search_k()
 
     vector_search_records = []
     keyword_search_records = []
@@ -37,58 +47,37 @@ def query_workspace_open_search(
     if selected_model is None:
         raise CommonError("Embeddings model not found")
 
-    query_embeddings = genai_core.embeddings.generate_embeddings(
-        selected_model, [query], Task.RETRIEVE
-    )[0]
-
-    items = []
-
-    client = get_open_search_client()
-    vector_search_records = vector_query(
-        client, index_name, query_embeddings, vector_search_limit
+    query_embeddings = genai_core.embeddings.generate_query_embeddings(
+        selected_model, query
     )
-    vector_search_records = _convert_records("vector_search", vector_search_records)
-    items.extend(vector_search_records)
 
-    if hybrid_search:
-        keyword_search_records = keyword_query(
-            client, index_name, query, keyword_search_limit
+    client = get_open_search_client()
+    if hybrid_search and OPEN_SEARCH_HYBRID_MSEARCH:
+        vector_search_records, keyword_search_records = hybrid_query(
+            client,
+            index_name,
+            query_embeddings,
+            query,
+            vector_search_limit,
+            keyword_search_limit,
+            vector_search_k,
         )
-
-        keyword_search_records = _convert_records(
-            "keyword_search", keyword_search_records
+    else:
+        vector_search_records = vector_query(
+            client, index_name, query_embeddings, vector_search_limit, vector_search_k
         )
-        items.extend(keyword_search_records)
 
-    unique_items = dict({})
-    for item in items:
-        chunk_id = item["chunk_id"]
-
-        if chunk_id not in unique_items:
-            unique_items[chunk_id] = item
-        else:
-            current = unique_items[chunk_id]
-            for source in item["sources"]:
-                if source not in current["sources"]:
-                    current["sources"].append(source)
-            current["sources"] = sorted(current["sources"])
-
-            for source in current["sources"]:
-                if source not in item["sources"]:
-                    item["sources"].append(source)
-            item["sources"] = sorted(item["sources"])
-
-            if current["vector_search_score"] is None:
-                current["vector_search_score"] = item["vector_search_score"]
-            if current["keyword_search_score"] is None:
-                current["keyword_search_score"] = item["keyword_search_score"]
+        if hybrid_search:
+            keyword_search_records = keyword_query(
+                client, index_name, query, keyword_search_limit
+            )
 
-            if item["vector_search_score"] is None:
-                item["vector_search_score"] = current["vector_search_score"]
-            if item["keyword_search_score"] is None:
-                item["keyword_search_score"] = current["keyword_search_score"]
+    vector_search_records = _convert_records("vector_search", vector_search_records)
+    keyword_search_records = _convert_records("keyword_search", keyword_search_records)
 
-    unique_items = list(unique_items.values())
+    unique_items = genai_core.fusion.merge_results(
+        vector_search_records, keyword_search_records
+    )
 
     if cross_encoder_model_name is not None:
         cross_encoder_model = genai_core.cross_encoder.get_cross_encoder_model(
@@ -98,23 +87,17 @@ def query_workspace_open_search(
         if cross_encoder_model is None:
             raise genai_core.types.CommonError("Cross encoder model not found")
 
-        score_dict = dict({})
-        if len(unique_items) > 0:
-            passages = [record["content"] for record in unique_items]
-            passage_scores = genai_core.cross_encoder.rank_passages(
-                cross_encoder_model, query, passages
-            )
-
-            for i in range(len(unique_items)):
-                score = passage_scores[i]
-                unique_items[i]["score"] = score
-                score_dict[unique_items[i]["chunk_id"]] = score
-        unique_items = sorted(unique_items, key=lambda x: x["score"], reverse=True)
-
-        for record in vector_search_records:
-            record["score"] = score_dict[record["chunk_id"]]
-        for record in keyword_search_records:
-            record["score"] = score_dict[record["chunk_id"]]
+        unique_items = genai_core.fusion.rerank(
+            cross_encoder_model,
+            query,
+            unique_items,
+            vector_search_records,
+            keyword_search_records,
+        )
+    elif rank_fusion != genai_core.fusion.RANK_FUSION_NONE:
+        unique_items = genai_core.fusion.fuse(
+            rank_fusion, unique_items, vector_search_records, keyword_search_records
+        )
 
     if full_response:
         unique_items = unique_items[:limit]
@@ -127,32 +110,11 @@ def query_workspace_open_search(
             "keyword_search_items": keyword_search_records,
         }
     else:
-        if cross_encoder_model_name is not None:
-            ret_items = list(
-                filter(lambda val: val["score"] > threshold, unique_items)
-            )[:limit]
-        else:
-            ret_items = unique_items[:limit]
-
-        if len(ret_items) < limit and len(unique_items) > len(ret_items):
-            unique_items = list(
-                filter(
-                    lambda record: record["chunk_id"]
-                    not in [r["chunk_id"] for r in ret_items],
-                    unique_items,
-                )
-            )
-            unique_items = sorted(
-                unique_items, key=lambda x: x["vector_search_score"] or -1, reverse=True
-            )
-            ret_items = ret_items + (
-                list(
-                    filter(
-                        lambda val: (val["vector_search_score"] or -1) > 0.5,
-                        unique_items,
-                    )
-                )[: (limit - len(ret_items))]
-            )
+        ret_items = genai_core.fusion.select_top_k(
+            unique_items,
+            limit,
+            threshold=threshold if cross_encoder_model_name is not None else None,
+        )
 
         ret_value = {
             "engine": "opensearch",
@@ -203,8 +165,10 @@ def _convert_records(source: str, records: List[dict]):
     return converted_records
 
 
-def vector_query(client, index_name: str, vector: List[float], size: int = 25):
-    query = {"query": {"knn": {"content_embeddings": {"vector": vector, "k": 5}}}}
+def vector_query(
+    client, index_name: str, vector: List[float], size: int = 25, k: int = None
+):
+    query = _vector_query_body(vector, k or size)
 
     response = client.search(index=index_name, body=query, size=size)
 
@@ -215,7 +179,7 @@ def vector_query(client, index_name: str, vector: List[float], size: int = 25):
 
 
 def keyword_query(client, index_name: str, text: str, size: int = 25):
-    query = {"query": {"match": {"content": text}}}
+    query = _keyword_query_body(text)
 
     response = client.search(index=index_name, body=query, size=size)
 
@@ -223,3 +187,42 @@ def keyword_query(client, index_name: str, text: str, size: int = 25):
     ret_value = ret_value if ret_value is not None else []
 
     return ret_value
+
+
+def hybrid_query(
+    client,
+    index_name: str,
+    vector: List[float],
+    text: str,
+    vector_size: int = 25,
+    keyword_size: int = 25,
+    k: int = None,
+):
+    """Run the vector and keyword queries in a single _msearch round trip."""
+    body = [
+        {"index": index_name},
+        dict(_vector_query_body(vector, k or vector_size), size=vector_size),
+        {"index": index_name},
+        dict(_keyword_query_body(text), size=keyword_size),
+    ]
+
+    response = client.msearch(body=body)
+
+    ret_value = []
+    for current in response["responses"]:
+        if "error" in current:
+            logger.error("Error in hybrid query", error=current["error"])
+            raise CommonError("Error querying the workspace")
+
+        hits = current["hits"]["hits"]
+        ret_value.append(hits if hits is not None else [])
+
+    return ret_value[0], ret_value[1]
+
+
+def _vector_query_body(vector: List[float], k: int):
+    return {"query": {"knn": {"content_embeddings": {"vector": vector, "k": k}}}}
+
+
+def _keyword_query_body(text: str):
+    return {"query": {"match": {"content": text}}}
@@ -1,3 +1,5 @@
+import os
+import copy
 import genai_core.types
 import genai_core.workspaces
 import genai_core.embeddings
@@ -5,8 +7,35 @@ from genai_core.aurora import query_workspace_aurora
 from genai_core.opensearch import query_workspace_open_search
 from genai_core.kendra import query_workspace_kendra
 from genai_core.bedrock_kb import query_workspace_bedrock_kb
+from genai_core.utils.cache import LRUCache
 from typing import List, Dict, Any
 
+SEMANTIC_SEARCH_CACHE_MAX_SIZE = int(
+    os.environ.get("SEMANTIC_SEARCH_CACHE_MAX_SIZE", "256")
+)
+SEMANTIC_SEARCH_CACHE_TTL = int(os.environ.get("SEMANTIC_SEARCH_CACHE_TTL", "300"))
+
+# Engines whose index is only written through this library, so every change
+# is reflected on the workspace item. Kendra and Bedrock KB data sources can
+# sync outside of it and are never cached.
+CACHEABLE_ENGINES = {"aurora", "opensearch"}
+
+search_results_cache = LRUCache(
+    SEMANTIC_SEARCH_CACHE_MAX_SIZE, ttl=SEMANTIC_SEARCH_CACHE_TTL
+)
+
+
+def get_workspace_version(workspace: dict):
+    """Adding, replacing or deleting documents bumps `updated_at` and the
+    `vectors` counter of the workspace item, so together they identify the
+    content a result was computed from.
+    """
+    return (
+        workspace.get("updated_at"),
+        workspace.get("vectors"),
+        workspace.get("documents"),
+    )
+
 
 def semantic_search(
     workspace_id: str, query: str, limit: int = 5, full_response: bool = False
@@ -19,6 +48,29 @@ def semantic_search(
     if workspace["status"] != "ready":
         raise genai_core.types.CommonError("Workspace is not ready")
 
+    if workspace["engine"] not in CACHEABLE_ENGINES:
+        return _semantic_search(workspace_id, workspace, query, limit, full_response)
+
+    cache_key = (
+        workspace_id,
+        get_workspace_version(workspace),
+        query,
+        limit,
+        full_response,
+    )
+    result = search_results_cache.get(cache_key)
+    if result is None:
+        result = _semantic_search(workspace_id, workspace, query, limit, full_response)
+        search_results_cache.put(cache_key, copy.deepcopy(result))
+    else:
+        result = copy.deepcopy(result)
+
+    return result
+
+
+def _semantic_search(
+    workspace_id: str, workspace: dict, query: str, limit: int, full_response: bool
+):
     if workspace["engine"] == "aurora":
         return query_workspace_aurora(
             workspace_id, workspace, query, limit, full_response
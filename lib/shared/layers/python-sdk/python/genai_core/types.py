@@ -29,6 +29,44 @@ class Workspace(BaseModel):
     engine: str
 
 
+class SearchSettings(BaseModel):
+    """Per workspace recall/latency settings of the vector and keyword search.
+
+    Only the values set when the workspace was created are stored on the
+    workspace item, everything else falls back to these defaults.
+    """
+
+    # Candidate pool fetched from each search before merging and reranking
+    vector_search_limit: int = 25
+    keyword_search_limit: int = 25
+    # OpenSearch knn neighbours per segment, defaults to vector_search_limit
+    vector_search_k: Optional[int] = None
+    # HNSW ef_search, defaults to 512 on OpenSearch and 40 on pgvector
+    ef_search: Optional[int] = None
+    # pgvector ANN index, "ivfflat" or "hnsw"
+    index_type: str = "ivfflat"
+    # pgvector ivfflat lists, derived from the row count when the index is
+    # built if not set, and probes
+    ivfflat_lists: Optional[int] = None
+    ivfflat_probes: int = 1
+    # pgvector HNSW build parameters
+    hnsw_m: int = 16
+    hnsw_ef_construction: int = 64
+
+    @classmethod
+    def from_workspace(cls, workspace: dict) -> "SearchSettings":
+        values = {
+            key: workspace[key]
+            for key in cls.model_fields
+            if workspace.get(key) is not None
+        }
+
+        return cls(**values)
+
+    def get_vector_search_k(self) -> int:
+        return self.vector_search_k or self.vector_search_limit
+
+
 class WorkspaceStatus(Enum):
     SUBMITTED = "submitted"
     READY = "ready"
@@ -0,0 +1,148 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable, List, NamedTuple
+from aws_lambda_powertools import Logger
+
+logger = Logger()
+
+_DONE = object()
+_POLL_INTERVAL = 0.1
+
+
+class Stage(NamedTuple):
+    name: str
+    fn: Callable[[Any], Any]
+    workers: int = 1
+
+
+class Pipeline(object):
+    """Runs items through stages connected by bounded queues.
+
+    Every stage has its own worker threads, so a stage works on the next item
+    while the following stage handles the previous one. Queues hold at most
+    queue_size items, a slow stage blocks the stages before it instead of
+    piling up their results. The first error stops the pipeline and is raised
+    by run(). Results of the last stage are returned in completion order.
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int = 2):
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def run(self, items: Iterable) -> List:
+        self.stats = {stage.name: {"items": 0, "seconds": 0.0} for stage in self.stages}
+        items = list(items)
+        start = time.perf_counter()
+
+        # Nothing to overlap, skip the threads
+        if len(items) <= 1:
+            results = []
+            for item in items:
+                for stage in self.stages:
+                    item = self._call(stage, item)
+                results.append(item)
+        else:
+            results = self._run_threads(items)
+
+        self._log(time.perf_counter() - start)
+
+        return results
+
+    def _run_threads(self, items: List) -> List:
+        queues = [queue.Queue(self.queue_size) for _ in self.stages]
+        results = []
+        errors = []
+        failed = threading.Event()
+        remaining_workers = [stage.workers for stage in self.stages]
+
+        def put(target: queue.Queue, item) -> bool:
+            while not failed.is_set():
+                try:
+                    target.put(item, timeout=_POLL_INTERVAL)
+                    return True
+                except queue.Full:
+                    continue
+
+            return False
+
+        def worker(idx: int):
+            stage = self.stages[idx]
+            try:
+                while not failed.is_set():
+                    try:
+                        item = queues[idx].get(timeout=_POLL_INTERVAL)
+                    except queue.Empty:
+                        continue
+
+                    if item is _DONE:
+                        break
+
+                    output = self._call(stage, item)
+                    if idx + 1 < len(self.stages):
+                        if not put(queues[idx + 1], output):
+                            return
+                    else:
+                        results.append(output)
+            except Exception as error:
+                errors.append(error)
+                failed.set()
+                return
+
+            # The last worker of a stage tells the next stage it is done
+            with self._lock:
+                remaining_workers[idx] -= 1
+                last = remaining_workers[idx] == 0
+
+            if last and idx + 1 < len(self.stages):
+                for _ in range(self.stages[idx + 1].workers):
+                    put(queues[idx + 1], _DONE)
+
+        threads = [
+            threading.Thread(target=worker, args=(idx,), daemon=True)
+            for idx, stage in enumerate(self.stages)
+            for _ in range(stage.workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        for item in items:
+            if not put(queues[0], item):
+                break
+        for _ in range(self.stages[0].workers):
+            put(queues[0], _DONE)
+
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            raise errors[0]
+
+        return results
+
+    def _call(self, stage: Stage, item):
+        start = time.perf_counter()
+        output = stage.fn(item)
+        seconds = time.perf_counter() - start
+
+        with self._lock:
+            self.stats[stage.name]["items"] += 1
+            self.stats[stage.name]["seconds"] += seconds
+
+        return output
+
+    def _log(self, seconds: float):
+        for name, stats in self.stats.items():
+            logger.info(
+                "Pipeline stage",
+                stage=name,
+                items=stats["items"],
+                busy_seconds=round(stats["seconds"], 3),
+                items_per_second=(
+                    stats["items"] / stats["seconds"] if stats["seconds"] else 0.0
+                ),
+            )
+
+        logger.info("Pipeline", seconds=round(seconds, 3))
@@ -6,7 +6,8 @@ import boto3
 import genai_core.embeddings
 from datetime import datetime
 from .types import WorkspaceStatus
-from genai_core.types import Task
+from typing import Optional
+from genai_core.types import SearchSettings, Task
 
 dynamodb = boto3.resource("dynamodb")
 sfn_client = boto3.client("stepfunctions")
@@ -92,6 +93,24 @@ def set_status(workspace_id: str, status: str):
     return response
 
 
+def set_vector_index_vectors(workspace_id: str, vectors: int):
+    timestamp = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+    response = table.update_item(
+        Key={"workspace_id": workspace_id, "object_type": WORKSPACE_OBJECT_TYPE},
+        UpdateExpression="SET vector_index_vectors=:vectors, "
+        + "updated_at=:timestampValue",
+        ExpressionAttributeValues={
+            ":vectors": vectors,
+            ":timestampValue": timestamp,
+        },
+    )
+
+    logger.info("Response for set_vector_index_vectors", response=response)
+
+    return response
+
+
 def create_workspace_aurora(
     workspace_name: str,
     embeddings_model_provider: str,
@@ -106,6 +125,8 @@ def create_workspace_aurora(
     chunking_strategy: str,
     chunk_size: int,
     chunk_overlap: int,
+    rank_fusion: str = "none",
+    search_settings: Optional[SearchSettings] = None,
 ):
     workspace_id = str(uuid.uuid4())
     timestamp = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
@@ -116,12 +137,15 @@ def create_workspace_aurora(
     if not embeddings_model:
         raise genai_core.types.CommonError("Invalid embeddings model")
     # Verify that the embeddings model
-    genai_core.embeddings.generate_embeddings(embeddings_model, ["test"], Task.STORE)
+    genai_core.embeddings.generate_embeddings(
+        embeddings_model, ["test"], Task.STORE, use_cache=False
+    )
 
     item = {
         "workspace_id": workspace_id,
         "object_type": WORKSPACE_OBJECT_TYPE,
-        "format_version": 1,
+        # Stored tsvector columns, see genai_core.aurora.utils
+        "format_version": 2,
         "name": workspace_name,
         "engine": "aurora",
         "status": WorkspaceStatus.SUBMITTED.value,
@@ -134,6 +158,7 @@ def create_workspace_aurora(
         "metric": metric,
         "has_index": has_index,
         "hybrid_search": hybrid_search,
+        "rank_fusion": rank_fusion,
         "chunking_strategy": chunking_strategy,
         "chunk_size": chunk_size,
         "chunk_overlap": chunk_overlap,
@@ -144,6 +169,9 @@ def create_workspace_aurora(
         "updated_at": timestamp,
     }
 
+    if search_settings is not None:
+        item.update(search_settings.model_dump(exclude_unset=True, exclude_none=True))
+
     ddb_response = table.put_item(Item=item)
 
     response = sfn_client.start_execution(
@@ -176,6 +204,8 @@ def create_workspace_open_search(
     chunking_strategy: str,
     chunk_size: int,
     chunk_overlap: int,
+    rank_fusion: str = "none",
+    search_settings: Optional[SearchSettings] = None,
 ):
     workspace_id = str(uuid.uuid4())
     timestamp = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
@@ -186,7 +216,9 @@ def create_workspace_open_search(
     if not embeddings_model:
         raise genai_core.types.CommonError("Invalid embeddings model")
     # Verify that the embeddings model
-    genai_core.embeddings.generate_embeddings(embeddings_model, ["test"], Task.STORE)
+    genai_core.embeddings.generate_embeddings(
+        embeddings_model, ["test"], Task.STORE, use_cache=False
+    )
 
     item = {
         "workspace_id": workspace_id,
@@ -204,6 +236,7 @@ def create_workspace_open_search(
         "metric": "l2",
         "aoss_engine": "nmslib",
         "hybrid_search": hybrid_search,
+        "rank_fusion": rank_fusion,
         "chunking_strategy": chunking_strategy,
         "chunk_size": chunk_size,
         "chunk_overlap": chunk_overlap,
@@ -214,6 +247,9 @@ def create_workspace_open_search(
         "updated_at": timestamp,
     }
 
+    if search_settings is not None:
+        item.update(search_settings.model_dump(exclude_unset=True, exclude_none=True))
+
     ddb_response = table.put_item(Item=item)
 
     response = sfn_client.start_execution(
@@ -2,6 +2,7 @@ import os
 import json
 import boto3
 import genai_core.utils.json
+import genai_core.chunks
 import genai_core.websites.crawler
 
 PROCESSING_BUCKET_NAME = os.environ["INPUT_BUCKET_NAME"]
@@ -25,7 +26,7 @@ def main():
     limit = data["limit"]
     content_types = data["content_types"]
 
-    return genai_core.websites.crawler.crawl_urls(
+    result = genai_core.websites.crawler.crawl_urls(
         workspace=workspace,
         document=document,
         priority_queue=priority_queue,
@@ -35,6 +36,10 @@ def main():
         content_types=content_types,
     )
 
+    genai_core.chunks.update_vector_index(WORKSPACE_ID)
+
+    return result
+
 
 if __name__ == "__main__":
     main()
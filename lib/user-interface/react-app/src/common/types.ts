@@ -74,6 +74,7 @@ export interface AuroraWorkspaceCreateInput {
   metric: string;
   index: boolean;
   hybridSearch: boolean;
+  chunkingStrategy: string;
   chunkSize: number;
   chunkOverlap: number;
 }
@@ -84,6 +85,7 @@ export interface OpenSearchWorkspaceCreateInput {
   languages: readonly SelectProps.Option[];
   crossEncoderModel: SelectProps.Option | null;
   hybridSearch: boolean;
+  chunkingStrategy: string;
   chunkSize: number;
   chunkOverlap: number;
 }
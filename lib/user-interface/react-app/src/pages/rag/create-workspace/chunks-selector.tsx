@@ -1,43 +1,89 @@
-import { ColumnLayout, FormField, Input } from "@cloudscape-design/components";
+import {
+  ColumnLayout,
+  FormField,
+  Input,
+  Select,
+  SpaceBetween,
+} from "@cloudscape-design/components";
 
 interface ChunkSelectorProps {
   errors: Record<string, string | string[]>;
-  data: { chunkSize: number; chunkOverlap: number };
+  data: { chunkingStrategy: string; chunkSize: number; chunkOverlap: number };
   submitting: boolean;
   onChange: (
-    data: Partial<{ chunkSize: number; chunkOverlap: number }>
+    data: Partial<{
+      chunkingStrategy: string;
+      chunkSize: number;
+      chunkOverlap: number;
+    }>
   ) => void;
 }
 
+const chunkingStrategies = [
+  {
+    value: "recursive",
+    label: "Characters",
+    description: "Chunk size and overlap are counted in characters",
+  },
+  {
+    value: "token",
+    label: "Tokens",
+    description:
+      "Chunk size and overlap are counted in tokens of the embeddings model",
+  },
+];
+
 export function ChunkSelectorField(props: ChunkSelectorProps) {
+  const selectedStrategy =
+    chunkingStrategies.find((x) => x.value === props.data.chunkingStrategy) ??
+    chunkingStrategies[0];
+  const unit = selectedStrategy.value === "token" ? "token" : "character";
+
   return (
     <FormField
       label="Text Splitter"
       stretch={true}
-      description="Chunk size is the character limit of each chunk, which is then vectorized."
+      description={`Chunk size is the ${unit} limit of each chunk, which is then vectorized.`}
     >
-      <ColumnLayout columns={2}>
-        <FormField label="Chunk Size" errorText={props.errors.chunkSize}>
-          <Input
-            type="number"
-            disabled={props.submitting}
-            value={props.data.chunkSize.toString()}
-            onChange={({ detail: { value } }) =>
-              props.onChange({ chunkSize: parseInt(value) })
-            }
-          />
-        </FormField>
-        <FormField label="Chunk Overlap" errorText={props.errors.chunkOverlap}>
-          <Input
-            type="number"
+      <SpaceBetween size="s">
+        <FormField
+          label="Chunking Strategy"
+          errorText={props.errors.chunkingStrategy}
+        >
+          <Select
             disabled={props.submitting}
-            value={props.data.chunkOverlap.toString()}
-            onChange={({ detail: { value } }) =>
-              props.onChange({ chunkOverlap: parseInt(value) })
+            selectedOption={selectedStrategy}
+            options={chunkingStrategies}
+            onChange={({ detail: { selectedOption } }) =>
+              props.onChange({
+                chunkingStrategy: selectedOption.value ?? "recursive",
+              })
             }
           />
         </FormField>
-      </ColumnLayout>
+        <ColumnLayout columns={2}>
+          <FormField label="Chunk Size" errorText={props.errors.chunkSize}>
+            <Input
+              type="number"
+              disabled={props.submitting}
+              value={props.data.chunkSize.toString()}
+              onChange={({ detail: { value } }) =>
+                props.onChange({ chunkSize: parseInt(value) })
+              }
+            />
+          </FormField>
+          <FormField label="Chunk Overlap" errorText={props.errors.chunkOverlap}>
+            <Input
+              type="number"
+              disabled={props.submitting}
+              value={props.data.chunkOverlap.toString()}
+              onChange={({ detail: { value } }) =>
+                props.onChange({ chunkOverlap: parseInt(value) })
+              }
+            />
+          </FormField>
+        </ColumnLayout>
+      </SpaceBetween>
     </FormField>
   );
 }
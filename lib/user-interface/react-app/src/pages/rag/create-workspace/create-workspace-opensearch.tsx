@@ -18,6 +18,7 @@ const defaults: OpenSearchWorkspaceCreateInput = {
   crossEncoderModel: null,
   languages: [{ value: "english", label: "English" }],
   hybridSearch: false,
+  chunkingStrategy: "recursive",
   chunkSize: 1000,
   chunkOverlap: 200,
 };
@@ -64,7 +65,12 @@ export default function CreateWorkspaceOpenSearch() {
           form.embeddingsModel.value
         );
 
-        if (provider === "bedrock" && form.chunkSize > 1000) {
+        // Token chunks are checked against the model limit by the API
+        if (
+          provider === "bedrock" &&
+          form.chunkingStrategy === "recursive" &&
+          form.chunkSize > 1000
+        ) {
           errors.chunkSize =
             "Chunk size must not greater than 1000 characters for Bedrock models";
         }
@@ -76,10 +82,11 @@ export default function CreateWorkspaceOpenSearch() {
         errors.languages = "You can select up to 3 languages";
       }
 
+      const unit = form.chunkingStrategy === "token" ? "tokens" : "characters";
       if (form.chunkSize < 100) {
-        errors.chunkSize = "Chunk size must be at least 100 characters";
+        errors.chunkSize = `Chunk size must be at least 100 ${unit}`;
       } else if (form.chunkSize > 10000) {
-        errors.chunkSize = "Chunk size must be less than 10000 characters";
+        errors.chunkSize = `Chunk size must be less than 10000 ${unit}`;
       }
 
       if (form.chunkOverlap < 0) {
@@ -123,7 +130,7 @@ export default function CreateWorkspaceOpenSearch() {
         crossEncoderModelName: crossEncoderModel?.name,
         languages: data.languages.map((x) => x.value ?? ""),
         hybridSearch: data.hybridSearch && crossEncoderSelected,
-        chunkingStrategy: "recursive",
+        chunkingStrategy: data.chunkingStrategy,
         chunkSize: data.chunkSize,
         chunkOverlap: data.chunkOverlap,
       });
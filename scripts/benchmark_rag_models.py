@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+SageMaker RAG models CPU benchmark
+
+Runs the embeddings and cross encoder code of the SageMaker RAG models
+inference script on CPU for each inference backend (pytorch, onnx,
+onnx-int8) and reports:
+
+- cross encoder: one request with passages of mixed lengths, as a single
+  padded forward pass (the previous behaviour) and with length bucketing
+- embeddings: concurrent single input requests, with and without the micro
+  batcher, and the throughput in inputs per second
+- parity of every ONNX backend with the PyTorch outputs, the script exits
+  with an error when the embeddings cosine similarity drops below
+  --min-cosine or the cross encoder top 10 differs by more than
+  --max-top10-changes passages
+
+Models are downloaded from the Hugging Face Hub, torch, transformers and
+onnxruntime must be installed.
+
+Usage:
+    python scripts/benchmark_rag_models.py
+    python scripts/benchmark_rag_models.py --backends pytorch onnx-int8 \\
+        --embeddings intfloat/multilingual-e5-large --passages 200
+"""
+
+import argparse
+import importlib.util
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+INFERENCE_PATH = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "lib",
+    "rag-engines",
+    "sagemaker-rag-models",
+    "model",
+    "inference.py",
+)
+WORDS = (
+    "the quick brown fox jumps over a lazy dog while berlin paris and london".split()
+)
+
+
+def load_inference(backend, max_tokens):
+    os.environ["INFERENCE_BACKEND"] = backend
+    os.environ["MAX_TOKENS_PER_BATCH"] = str(max_tokens)
+    spec = importlib.util.spec_from_file_location(
+        f"inference_{backend}", INFERENCE_PATH
+    )
+    inference = importlib.util.module_from_spec(spec)
+    # The inference script imports its scheduling module from its folder
+    model_folder = os.path.dirname(INFERENCE_PATH)
+    if model_folder not in sys.path:
+        sys.path.insert(0, model_folder)
+    spec.loader.exec_module(inference)
+    # Without a model archive the exports go to the temporary folder
+    inference.set_onnx_models_dir(tempfile.gettempdir())
+
+    return inference
+
+
+def text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def timed(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return min(timings)
+
+
+def benchmark_backend(backend, args, passages, queries):
+    import torch
+    from transformers import AutoModel, AutoModelForSequenceClassification
+    from transformers import AutoTokenizer
+
+    inference = load_inference(backend, args.max_tokens)
+    device = inference.get_device()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.cross_encoder)
+    model = inference.load_model(
+        AutoModelForSequenceClassification,
+        args.cross_encoder,
+        args.cross_encoder.split("/")[-1],
+        tokenizer,
+        device,
+    )
+    data = [["what does the fox do", passage] for passage in passages]
+
+    def padded():
+        with torch.inference_mode():
+            features = tokenizer(
+                data, padding=True, truncation=True, return_tensors="pt"
+            )
+            return model(**features)
+
+    def bucketed():
+        return inference.rank(model, tokenizer, data, device)
+
+    results = {
+        "cross_encoder_padded_ms": timed(padded, args.repeat),
+        "cross_encoder_bucketed_ms": timed(bucketed, args.repeat),
+    }
+    scores = bucketed()
+
+    embeddings_tokenizer = AutoTokenizer.from_pretrained(args.embeddings)
+    embeddings_model = inference.load_model(
+        AutoModel,
+        args.embeddings,
+        args.embeddings.split("/")[-1],
+        embeddings_tokenizer,
+        device,
+    )
+
+    def embed(inputs):
+        return inference.embed(embeddings_model, embeddings_tokenizer, inputs, device)
+
+    batcher = inference.MicroBatcher(embed, args.max_delay_ms, len(queries))
+
+    def concurrent(fn):
+        with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+            return list(executor.map(fn, [[query] for query in queries]))
+
+    results["embeddings_per_request_ms"] = timed(lambda: concurrent(embed), args.repeat)
+    results["embeddings_micro_batched_ms"] = timed(
+        lambda: concurrent(batcher.submit), args.repeat
+    )
+    results["embeddings_per_second"] = (
+        len(queries) * 1000 / results["embeddings_micro_batched_ms"]
+    )
+    embeddings = embed(queries)
+
+    return results, scores, embeddings
+
+
+def parity(scores, embeddings, reference_scores, reference_embeddings):
+    import numpy as np
+
+    cosine = np.sum(np.array(embeddings) * np.array(reference_embeddings), axis=1)
+    top10 = set(np.argsort(scores)[-10:].tolist())
+    reference_top10 = set(np.argsort(reference_scores)[-10:].tolist())
+
+    return {
+        "embeddings_min_cosine": float(np.min(cosine)),
+        "cross_encoder_max_abs_diff": float(
+            np.max(np.abs(np.array(scores) - np.array(reference_scores)))
+        ),
+        "cross_encoder_top10_changes": len(reference_top10 - top10),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--backends", nargs="+", default=["pytorch", "onnx", "onnx-int8"]
+    )
+    parser.add_argument(
+        "--cross-encoder", default="cross-encoder/ms-marco-MiniLM-L-12-v2"
+    )
+    parser.add_argument(
+        "--embeddings", default="sentence-transformers/all-MiniLM-L6-v2"
+    )
+    parser.add_argument("--passages", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--max-tokens", type=int, default=16384)
+    parser.add_argument("--max-delay-ms", type=float, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--max-top10-changes", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # Mostly short chunks with a few long ones, as returned by hybrid search
+    passages = [
+        text(rng, 400 if rng.random() < 0.1 else rng.randint(20, 80))
+        for _ in range(args.passages)
+    ]
+    queries = [text(rng, rng.randint(5, 20)) for _ in range(args.requests)]
+
+    failed = False
+    reference = None
+    for backend in ["pytorch"] + [x for x in args.backends if x != "pytorch"]:
+        results, scores, embeddings = benchmark_backend(
+            backend, args, passages, queries
+        )
+
+        if reference is None:
+            reference = (scores, embeddings)
+        else:
+            results.update(parity(scores, embeddings, *reference))
+            failed = failed or (
+                results["embeddings_min_cosine"] < args.min_cosine
+                or results["cross_encoder_top10_changes"] > args.max_top10_changes
+            )
+
+        if backend not in args.backends:
+            continue
+
+        print(
+            f"backend={backend}  "
+            + "  ".join(
+                f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+                for key, value in results.items()
+            )
+        )
+
+    if failed:
+        print("ONNX outputs differ from PyTorch", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
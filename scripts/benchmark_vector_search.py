@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Vector search recall/latency benchmark
+
+Loads a synthetic clustered corpus into a temporary Aurora pgvector table or
+OpenSearch index and sweeps the per workspace search settings (ivfflat lists
+and probes, ef_search and k), reporting recall against an exact numpy search
+together with the query latency.
+
+The engine is reached with the same environment variables as the Lambda
+functions (AURORA_DB_HOST, AURORA_DB_PORT, AURORA_DB_USER or
+OPEN_SEARCH_COLLECTION_ENDPOINT) and the temporary table or index is always
+dropped at the end.
+
+Usage:
+    PYTHONPATH=lib/shared/layers/python-sdk/python \\
+        python scripts/benchmark_vector_search.py --engine aurora
+    PYTHONPATH=lib/shared/layers/python-sdk/python \\
+        python scripts/benchmark_vector_search.py --engine opensearch \\
+        --ef-search 128 512 --k 5 25 100
+"""
+
+import argparse
+import time
+import uuid
+
+import numpy as np
+
+
+def generate_corpus(documents, dimensions, clusters, queries, seed):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimensions))
+    assignments = rng.integers(0, clusters, size=documents)
+    corpus = centers[assignments] + 0.3 * rng.normal(size=(documents, dimensions))
+
+    query_assignments = rng.integers(0, clusters, size=queries)
+    query_vectors = centers[query_assignments] + 0.3 * rng.normal(
+        size=(queries, dimensions)
+    )
+
+    return corpus.astype(np.float32), query_vectors.astype(np.float32)
+
+
+def exact_neighbours(corpus, query_vectors, limit):
+    ret_value = []
+    for query in query_vectors:
+        distances = np.linalg.norm(corpus - query, axis=1)
+        ret_value.append(set(np.argsort(distances)[:limit].tolist()))
+
+    return ret_value
+
+
+def measure(search, query_vectors, expected):
+    recalls = []
+    latencies = []
+    for query, neighbours in zip(query_vectors, expected):
+        start = time.perf_counter()
+        found = search(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(len(neighbours & set(found)) / len(neighbours))
+
+    return {
+        "recall": float(np.mean(recalls)),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+    }
+
+
+def benchmark_aurora(args, corpus, query_vectors, expected):
+    from psycopg2 import sql
+    from psycopg2.extras import execute_values
+    from genai_core.aurora.connection import AuroraConnection, close_connection_pool
+
+    table_name = sql.Identifier(f"benchmark{uuid.uuid4().hex}")
+    results = []
+
+    try:
+        with AuroraConnection() as cursor:
+            cursor.execute(
+                sql.SQL(
+                    "CREATE TABLE {table} (id INTEGER PRIMARY KEY, "
+                    + "content_embeddings vector(%s));"
+                ).format(table=table_name),
+                [corpus.shape[1]],
+            )
+            execute_values(
+                cursor,
+                sql.SQL(
+                    "INSERT INTO {table} (id, content_embeddings) VALUES %s"
+                ).format(table=table_name),
+                [(idx, vector) for idx, vector in enumerate(corpus)],
+                page_size=1000,
+            )
+
+        for lists in args.lists:
+            with AuroraConnection() as cursor:
+                cursor.execute(
+                    sql.SQL(
+                        "CREATE INDEX benchmark_index ON {table} USING ivfflat "
+                        + "(content_embeddings vector_l2_ops) WITH (lists = %s);"
+                    ).format(table=table_name),
+                    [lists],
+                )
+
+            for probes in args.probes:
+                if probes > lists:
+                    continue
+
+                with AuroraConnection() as cursor:
+                    cursor.execute(
+                        sql.SQL("SET ivfflat.probes = {probes};").format(
+                            probes=sql.Literal(probes)
+                        )
+                    )
+
+                    def search(query):
+                        cursor.execute(
+                            sql.SQL(
+                                "SELECT id FROM {table} "
+                                + "ORDER BY content_embeddings <-> %s LIMIT %s;"
+                            ).format(table=table_name),
+                            [query, args.limit],
+                        )
+                        return [row[0] for row in cursor.fetchall()]
+
+                    stats = measure(search, query_vectors, expected)
+
+                results.append(dict(lists=lists, probes=probes, **stats))
+
+            with AuroraConnection() as cursor:
+                cursor.execute("DROP INDEX benchmark_index;")
+    finally:
+        with AuroraConnection() as cursor:
+            cursor.execute(
+                sql.SQL("DROP TABLE IF EXISTS {table};").format(table=table_name)
+            )
+        close_connection_pool()
+
+    return results
+
+
+def benchmark_open_search(args, corpus, query_vectors, expected):
+    from opensearchpy import helpers
+    from genai_core.opensearch.client import get_open_search_client
+
+    client = get_open_search_client()
+    results = []
+
+    for ef_search in args.ef_search:
+        index_name = f"benchmark{uuid.uuid4().hex}"
+        client.indices.create(
+            index_name,
+            body={
+                "settings": {
+                    "index": {"knn": True, "knn.algo_param.ef_search": ef_search}
+                },
+                "mappings": {
+                    "properties": {
+                        "content_embeddings": {
+                            "type": "knn_vector",
+                            "dimension": corpus.shape[1],
+                            "method": {
+                                "name": "hnsw",
+                                "space_type": "l2",
+                                "engine": "nmslib",
+                                "parameters": {"ef_construction": 512, "m": 16},
+                            },
+                        },
+                        "doc_id": {"type": "integer"},
+                    }
+                },
+            },
+        )
+
+        try:
+            helpers.bulk(
+                client,
+                (
+                    {
+                        "_index": index_name,
+                        "_source": {
+                            "doc_id": idx,
+                            "content_embeddings": vector.tolist(),
+                        },
+                    }
+                    for idx, vector in enumerate(corpus)
+                ),
+                chunk_size=500,
+            )
+
+            # Serverless collections have no refresh API, wait until the
+            # documents are searchable.
+            while client.count(index=index_name)["count"] < len(corpus):
+                time.sleep(5)
+
+            for k in args.k:
+
+                def search(query):
+                    response = client.search(
+                        index=index_name,
+                        body={
+                            "query": {
+                                "knn": {
+                                    "content_embeddings": {
+                                        "vector": query.tolist(),
+                                        "k": k,
+                                    }
+                                }
+                            },
+                            "_source": ["doc_id"],
+                        },
+                        size=args.limit,
+                    )
+                    return [
+                        hit["_source"]["doc_id"] for hit in response["hits"]["hits"]
+                    ]
+
+                stats = measure(search, query_vectors, expected)
+                results.append(dict(ef_search=ef_search, k=k, **stats))
+        finally:
+            client.indices.delete(index_name)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--engine", choices=["aurora", "opensearch"], required=True)
+    parser.add_argument("--documents", type=int, default=20000)
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=25)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--lists", type=int, nargs="+", default=[50, 100, 200])
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 5, 10, 20])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[64, 256, 512])
+    parser.add_argument("--k", type=int, nargs="+", default=[5, 25, 100])
+    args = parser.parse_args()
+
+    corpus, query_vectors = generate_corpus(
+        args.documents, args.dimensions, args.clusters, args.queries, args.seed
+    )
+    expected = exact_neighbours(corpus, query_vectors, args.limit)
+
+    if args.engine == "aurora":
+        results = benchmark_aurora(args, corpus, query_vectors, expected)
+    else:
+        results = benchmark_open_search(args, corpus, query_vectors, expected)
+
+    for result in results:
+        print(
+            "  ".join(
+                f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+                for key, value in result.items()
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -148,6 +148,19 @@ def test_create_aurora_workspace(mocker):
     response = create_aurora_workspace(create_base_input.copy())
     assert response.get("id") == workspace.get("workspace_id")
     assert mock.call_count == 1
+    assert mock.call_args.kwargs["rank_fusion"] == "none"
+
+    input = create_base_input.copy()
+    input["rankFusion"] = "rrf"
+    input["ivfflatProbes"] = 10
+    create_aurora_workspace(input)
+    assert mock.call_args.kwargs["rank_fusion"] == "rrf"
+    search_settings = mock.call_args.kwargs["search_settings"]
+    assert search_settings.model_dump(exclude_unset=True) == {"ivfflat_probes": 10}
+
+    input["ivfflatProbes"] = 0
+    with pytest.raises(ValidationError, match="1 validation error"):
+        create_aurora_workspace(input)
 
 
 def test_create_aurora_workspace_unauthorized(mocker):
@@ -165,6 +178,10 @@ def test_create_aurora_workspace_invalid_input(mocker):
     input["metric"] = "invalid"
     with pytest.raises(CommonError, match="Invalid metric"):
         create_aurora_workspace(input)
+    input = create_base_input.copy()
+    input["indexType"] = "invalid"
+    with pytest.raises(CommonError, match="Invalid index type"):
+        create_aurora_workspace(input)
     verifiy_common_invalid_inputs(create_aurora_workspace)
 
 
@@ -258,6 +275,12 @@ def verifiy_common_invalid_inputs(method):
     with pytest.raises(CommonError, match="Invalid chunking strategy"):
         method(input)
     input = create_base_input.copy()
+    input["chunkingStrategy"] = "token"
+    input["chunkSize"] = 3000
+    input["chunkOverlap"] = 100
+    with pytest.raises(CommonError, match="Invalid chunk size"):
+        method(input)
+    input = create_base_input.copy()
     input["chunkSize"] = -1
     with pytest.raises(ValidationError, match="1 validation error"):
         method(input)
@@ -270,3 +293,7 @@ def verifiy_common_invalid_inputs(method):
     input["chunkOverlap"] = 102
     with pytest.raises(CommonError, match="Invalid chunk overlap"):
         method(input)
+    input = create_base_input.copy()
+    input["rankFusion"] = "invalid"
+    with pytest.raises(CommonError, match="Invalid rank fusion"):
+        method(input)
@@ -9,6 +9,7 @@ sys.path.insert(
 sys.path.append(here + "/../lib/chatbot-api/functions/api-handler")
 sys.path.append(here + "/../lib/model-interfaces/langchain/functions/request-handler")
 sys.path.append(here + "/../lib/shared/layers/python-sdk/python")
+sys.path.append(here + "/../lib/rag-engines/sagemaker-rag-models/model")
 
 os.environ["AWS_REGION"] = "us-east-1"
 os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
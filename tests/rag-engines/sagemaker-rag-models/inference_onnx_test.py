@@ -0,0 +1,83 @@
+import pytest
+
+# The model server dependencies, the test is skipped without them
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+pytest.importorskip("onnxruntime")
+pytest.importorskip("onnx")
+
+import inference  # noqa: E402
+
+config = transformers.BertConfig(
+    vocab_size=100,
+    hidden_size=32,
+    num_hidden_layers=2,
+    num_attention_heads=2,
+    intermediate_size=64,
+    num_labels=1,
+)
+
+
+def tokenizer(texts, return_tensors=None):
+    # Export sample, only the shapes and the input names matter
+    return {
+        "input_ids": torch.ones((len(texts), 4), dtype=torch.long),
+        "token_type_ids": torch.zeros((len(texts), 4), dtype=torch.long),
+        "attention_mask": torch.ones((len(texts), 4), dtype=torch.long),
+    }
+
+
+def features():
+    generator = torch.Generator().manual_seed(0)
+    attention_mask = torch.ones((3, 7), dtype=torch.long)
+    attention_mask[1, 5:] = 0
+    attention_mask[2, 3:] = 0
+
+    return {
+        "input_ids": torch.randint(1, 100, (3, 7), generator=generator),
+        "token_type_ids": torch.zeros((3, 7), dtype=torch.long),
+        "attention_mask": attention_mask,
+    }
+
+
+def test_onnx_embeddings_match_pytorch(tmp_path, mocker):
+    mocker.patch.object(inference, "ONNX_MODELS_DIR", str(tmp_path))
+    torch.manual_seed(0)
+    model = transformers.BertModel(config).eval()
+    inputs = features()
+
+    with torch.inference_mode():
+        expected = inference.mean_pooling(model(**inputs), inputs["attention_mask"])
+
+    onnx_model = inference.export_onnx_model(
+        model, tokenizer, "embeddings", cross_encoder=False, quantize=False
+    )
+    # A second load reuses the export
+    reloaded = inference.load_exported_onnx_model(
+        "embeddings", cross_encoder=False, quantize=False
+    )
+
+    for current in [onnx_model, reloaded]:
+        output = current(**inputs)
+        assert output.last_hidden_state.shape == (3, 7, 32)
+
+        actual = inference.mean_pooling(output, inputs["attention_mask"])
+        assert torch.allclose(actual, expected, atol=1e-4)
+
+
+def test_onnx_cross_encoder_matches_pytorch(tmp_path, mocker):
+    mocker.patch.object(inference, "ONNX_MODELS_DIR", str(tmp_path))
+    torch.manual_seed(0)
+    model = transformers.BertForSequenceClassification(config).eval()
+    inputs = features()
+
+    with torch.inference_mode():
+        expected = model(**inputs).logits
+
+    onnx_model = inference.export_onnx_model(
+        model, tokenizer, "cross-encoder", cross_encoder=True, quantize=False
+    )
+    actual = onnx_model(**inputs).logits
+
+    assert actual.shape == (3, 1)
+    assert torch.allclose(actual, expected, atol=1e-4)
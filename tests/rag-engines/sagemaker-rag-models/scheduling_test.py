@@ -0,0 +1,164 @@
+import threading
+import time
+
+import pytest
+from scheduling import MicroBatcher, ModelRegistry, bucket_by_length, run_bucketed
+
+
+class Features(dict):
+    def to(self, device):
+        self["device"] = device
+        return self
+
+
+class Tokenizer(object):
+    """Tokenizes an input into one token per word, the token being the index
+    of the input so the outputs can be traced back."""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, data, truncation=False):
+        input_ids = [[idx] * len(text.split()) for idx, text in enumerate(data)]
+        return {
+            "input_ids": input_ids,
+            "attention_mask": [[1] * len(ids) for ids in input_ids],
+        }
+
+    def pad(self, encoded, padding, return_tensors):
+        width = max(len(ids) for ids in encoded["input_ids"])
+        self.batches.append([ids[0] for ids in encoded["input_ids"]])
+        return Features(
+            {key: [x + [0] * (width - len(x)) for x in encoded[key]] for key in encoded}
+        )
+
+
+def test_bucket_by_length():
+    batches = bucket_by_length([5, 1, 9, 2, 1, 30], max_tokens=10)
+
+    assert batches == [[1, 4, 3], [0], [2], [5]]
+
+
+def test_run_bucketed_restores_input_order():
+    tokenizer = Tokenizer()
+    data = ["a " * 8, "a", "a " * 3, "a a", "a " * 7]
+
+    def forward(features):
+        assert features["device"] == "cpu"
+        return [f"output {ids[0]}" for ids in features["input_ids"]]
+
+    outputs = run_bucketed(tokenizer, data, forward, "cpu", max_tokens=8)
+
+    assert tokenizer.batches == [[1, 3], [2], [4], [0]]
+    assert outputs == [f"output {idx}" for idx in range(len(data))]
+
+
+def submit_concurrently(batcher, inputs):
+    results = [None] * len(inputs)
+
+    def submit(idx):
+        results[idx] = batcher.submit(inputs[idx])
+
+    threads = [threading.Thread(target=submit, args=(idx,)) for idx in range(2)]
+    for thread in threads:
+        thread.start()
+        # The first caller leads the batch
+        time.sleep(0.05)
+    for thread in threads:
+        thread.join(5)
+
+    return results
+
+
+def test_micro_batcher_flushes_when_full():
+    calls = []
+
+    def fn(inputs):
+        calls.append(list(inputs))
+        return [value * 10 for value in inputs]
+
+    batcher = MicroBatcher(fn, max_delay_ms=10000, max_inputs=4)
+
+    start = time.monotonic()
+    results = submit_concurrently(batcher, [[1, 2], [3, 4]])
+
+    assert time.monotonic() - start < 5
+    assert calls == [[1, 2, 3, 4]]
+    assert results == [[10, 20], [30, 40]]
+
+
+def test_micro_batcher_flushes_on_timeout():
+    calls = []
+
+    def fn(inputs):
+        calls.append(list(inputs))
+        return [value * 10 for value in inputs]
+
+    batcher = MicroBatcher(fn, max_delay_ms=200, max_inputs=64)
+
+    start = time.monotonic()
+    assert batcher.submit([1]) == [10]
+
+    assert time.monotonic() - start >= 0.2
+    assert calls == [[1]]
+
+
+def test_micro_batcher_raises_errors():
+    def fn(inputs):
+        raise ValueError("failed")
+
+    batcher = MicroBatcher(fn, max_delay_ms=0, max_inputs=64)
+
+    with pytest.raises(ValueError):
+        batcher.submit([1])
+
+
+def create_registry(sizes, **kwargs):
+    loads = []
+    evictions = []
+
+    def load(model_id):
+        loads.append(model_id)
+        return {"model": model_id}
+
+    registry = ModelRegistry(
+        {model_id: load for model_id in sizes},
+        lambda model: sizes[model],
+        on_evict=evictions.append,
+        **kwargs,
+    )
+
+    return registry, loads, evictions
+
+
+def test_model_registry_evicts_least_recently_used():
+    registry, loads, evictions = create_registry({"a": 1, "b": 1, "c": 1}, max_models=2)
+
+    assert registry.get("a") == {"model": "a", "size": 1}
+    registry.get("b")
+    registry.get("a")
+    registry.get("c")
+
+    assert registry.loaded_models() == ["a", "c"]
+    assert evictions == [["b"]]
+
+    # An evicted model is loaded again
+    registry.get("b")
+
+    assert loads == ["a", "b", "c", "b"]
+    assert registry.loaded_models() == ["c", "b"]
+    assert registry.get("unknown") is None
+
+
+def test_model_registry_max_bytes():
+    registry, loads, evictions = create_registry({"a": 3, "b": 3, "c": 8}, max_bytes=8)
+
+    registry.get("a")
+    registry.get("b")
+    assert evictions == []
+
+    # The model loaded last is kept even when it is too big alone
+    registry.get("c")
+
+    assert registry.loaded_models() == ["c"]
+    assert evictions == [["a", "b"]]
@@ -0,0 +1,60 @@
+from unittest.mock import MagicMock
+
+from genai_core.aurora.chunks import add_chunks_aurora, clean_chunks_aurora
+
+
+def test_add_chunks_aurora_batches_inserts(mocker):
+    cursor = MagicMock()
+    cursor.rowcount = 3
+    connection = mocker.patch("genai_core.aurora.chunks.AuroraConnection")
+    connection.return_value.__enter__.return_value = cursor
+    execute_values = mocker.patch("genai_core.aurora.chunks.execute_values")
+
+    result = add_chunks_aurora(
+        workspace_id="workspace-id",
+        document_id="document-id",
+        document_sub_id=None,
+        document_type="file",
+        document_sub_type=None,
+        path="path",
+        title="title",
+        chunk_ids=["1", "2"],
+        chunk_embeddings=[[0.1, 0.2], [0.3, 0.4]],
+        chunks=["chunk 1", "chunk 2"],
+        chunk_complements=["complement 1"],
+        replace=True,
+        batch_size=100,
+    )
+
+    assert result == {"removed_vectors": 3, "added_vectors": 2}
+    execute_values.assert_called_once()
+    rows = execute_values.call_args[0][2]
+    assert [row[0] for row in rows] == ["1", "2"]
+    assert [row[9] for row in rows] == ["complement 1", None]
+    assert rows[1][10].tolist() == [0.3, 0.4]
+    assert execute_values.call_args[1]["page_size"] == 100
+    cursor.connection.commit.assert_called_once()
+
+
+def test_clean_chunks_aurora_keeps_chunk_ids(mocker):
+    cursor = MagicMock()
+    cursor.rowcount = 4
+    connection = mocker.patch("genai_core.aurora.chunks.AuroraConnection")
+    connection.return_value.__enter__.return_value = cursor
+
+    assert clean_chunks_aurora("workspace-id", "document-id") == 4
+    assert cursor.execute.call_args[0][1] == ["workspace-id", "document-id"]
+
+    clean_chunks_aurora("workspace-id", "document-id", keep_chunk_ids=["1", "2"])
+    assert cursor.execute.call_args[0][1] == [
+        "workspace-id",
+        "document-id",
+        ["1", "2"],
+    ]
+
+    clean_chunks_aurora("workspace-id", "document-id", chunk_ids=["3"])
+    assert cursor.execute.call_args[0][1] == [
+        "workspace-id",
+        "document-id",
+        ["3"],
+    ]
@@ -0,0 +1,127 @@
+import psycopg2
+import psycopg2.extensions
+import pytest
+from unittest.mock import MagicMock
+
+import genai_core.aurora.connection
+from genai_core.aurora.connection import AuroraConnection, AuroraConnectionPool
+from genai_core.types import CommonError
+
+
+def _mock_connection():
+    connection = MagicMock()
+    connection.closed = 0
+    connection.autocommit = True
+    connection.get_transaction_status.return_value = (
+        psycopg2.extensions.TRANSACTION_STATUS_IDLE
+    )
+    return connection
+
+
+@pytest.fixture
+def connect(mocker):
+    mocker.patch("genai_core.aurora.connection.register_vector")
+    mocker.patch("genai_core.aurora.connection.psycopg2.extras.register_uuid")
+    mocker.patch.object(AuroraConnection, "get_token", return_value="token")
+    return mocker.patch(
+        "genai_core.aurora.connection.psycopg2.connect",
+        side_effect=lambda **kwargs: _mock_connection(),
+    )
+
+
+def test_pool_reuses_connections(connect):
+    pool = AuroraConnectionPool(min_size=0, max_size=2)
+
+    connection = pool.get_connection()
+    pool.put_connection(connection)
+    assert pool.get_connection() is connection
+
+    assert connect.call_count == 1
+    stats = pool.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+
+
+def test_pool_fills_min_size(connect):
+    pool = AuroraConnectionPool(min_size=2, max_size=4)
+    pool.get_connection()
+
+    assert connect.call_count == 2
+    assert pool.get_stats()["size"] == 2
+
+
+def test_pool_times_out_when_exhausted(connect):
+    pool = AuroraConnectionPool(min_size=0, max_size=1, timeout=0.01)
+    pool.get_connection()
+
+    with pytest.raises(CommonError):
+        pool.get_connection()
+
+    assert pool.get_stats()["waits"] == 0
+
+
+def test_pool_discards_unhealthy_connections(connect):
+    pool = AuroraConnectionPool(min_size=0, max_size=1, health_check_interval=0)
+
+    connection = pool.get_connection()
+    pool.put_connection(connection)
+    connection.cursor.return_value.__enter__.return_value.execute.side_effect = (
+        psycopg2.OperationalError()
+    )
+
+    assert pool.get_connection() is not connection
+    stats = pool.get_stats()
+    assert stats["health_check_failures"] == 1
+    assert stats["size"] == 1
+
+
+def test_pool_recycles_expired_connections(connect):
+    pool = AuroraConnectionPool(min_size=0, max_size=1, max_lifetime=0)
+
+    connection = pool.get_connection()
+    pool.put_connection(connection)
+
+    connection.close.assert_called_once()
+    assert pool.get_stats()["size"] == 0
+
+
+def test_pool_rolls_back_open_transactions(connect):
+    pool = AuroraConnectionPool(min_size=0, max_size=1)
+
+    connection = pool.get_connection()
+    connection.get_transaction_status.return_value = (
+        psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+    )
+    pool.put_connection(connection)
+
+    connection.rollback.assert_called_once()
+
+
+def test_aurora_connection_uses_shared_pool(connect, mocker):
+    pool = AuroraConnectionPool(min_size=0, max_size=1)
+    mocker.patch.object(
+        genai_core.aurora.connection, "get_connection_pool", return_value=pool
+    )
+
+    with AuroraConnection(autocommit=False) as cursor:
+        cursor.execute("SELECT 1;")
+
+    with AuroraConnection() as cursor:
+        cursor.execute("SELECT 1;")
+
+    assert connect.call_count == 1
+    assert pool.get_stats()["idle"] == 1
+
+
+def test_aurora_connection_discards_broken_connection(connect, mocker):
+    pool = AuroraConnectionPool(min_size=0, max_size=1)
+    mocker.patch.object(
+        genai_core.aurora.connection, "get_connection_pool", return_value=pool
+    )
+
+    with pytest.raises(psycopg2.OperationalError):
+        with AuroraConnection():
+            raise psycopg2.OperationalError()
+
+    assert pool.get_stats()["size"] == 0
@@ -0,0 +1,56 @@
+from psycopg2 import sql
+from genai_core.aurora.create import create_workspace_table
+
+workspace = {
+    "workspace_id": "workspace-id",
+    "embeddings_model_dimensions": 1024,
+    "hybrid_search": True,
+    "languages": ["english", "german"],
+    "has_index": True,
+    "metric": "cosine",
+}
+
+
+def _render(statement):
+    if isinstance(statement, sql.Composed):
+        return "".join(_render(part) for part in statement.seq)
+    if isinstance(statement, sql.SQL):
+        return statement.string
+    if isinstance(statement, sql.Identifier):
+        return ".".join(f'"{string}"' for string in statement.strings)
+    if isinstance(statement, sql.Literal):
+        return repr(statement.wrapped)
+
+    return statement
+
+
+def _statements(mocker, workspace):
+    cursor = mocker.MagicMock()
+    connection = mocker.patch("genai_core.aurora.create.AuroraConnection")
+    connection.return_value.__enter__.return_value = cursor
+
+    create_workspace_table(workspace)
+
+    cursor.connection.commit.assert_called_once()
+    return [_render(call[0][0]) for call in cursor.execute.call_args_list]
+
+
+def test_create_workspace_table_tsvector_columns(mocker):
+    statements = _statements(mocker, workspace)
+
+    assert (
+        'ALTER TABLE "workspaceid" ADD COLUMN "content_tsvector_german" tsvector '
+        + "GENERATED ALWAYS AS (to_tsvector('german'::regconfig, content)) STORED;"
+    ) in statements
+    assert (
+        'CREATE INDEX ON "workspaceid" USING GIN ("content_tsvector_english");'
+        in statements
+    )
+
+
+def test_create_workspace_table_defers_vector_index(mocker):
+    statements = _statements(mocker, dict(workspace, hybrid_search=False))
+
+    assert not any("tsvector" in statement for statement in statements)
+    assert not any("ivfflat" in statement for statement in statements)
+    assert not any("hnsw" in statement for statement in statements)
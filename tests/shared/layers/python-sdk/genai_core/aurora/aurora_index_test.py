@@ -0,0 +1,91 @@
+from decimal import Decimal
+from psycopg2 import sql
+import genai_core.aurora.index
+from genai_core.aurora.index import (
+    get_ivfflat_lists,
+    needs_vector_index_build,
+    update_vector_index,
+)
+
+workspace = {
+    "workspace_id": "workspace-id",
+    "engine": "aurora",
+    "has_index": True,
+    "metric": "cosine",
+    "vectors": Decimal(20000),
+}
+
+
+def _mock_cursor(mocker, locked=True, rows=20000):
+    cursor = mocker.MagicMock()
+    cursor.fetchone.side_effect = [[locked], [rows]]
+    connection = mocker.patch("genai_core.aurora.index.AuroraConnection")
+    connection.return_value.__enter__.return_value = cursor
+
+    return cursor
+
+
+def _statements(cursor):
+    return [call[0][0] for call in cursor.execute.call_args_list]
+
+
+def test_needs_vector_index_build(mocker):
+    mocker.patch.object(genai_core.aurora.index, "AURORA_INDEX_BUILD_THRESHOLD", 10000)
+
+    assert needs_vector_index_build(workspace)
+    assert not needs_vector_index_build(dict(workspace, vectors=500))
+    assert not needs_vector_index_build(dict(workspace, has_index=False))
+    assert not needs_vector_index_build(dict(workspace, engine="opensearch"))
+    # ivfflat is rebuilt once the workspace has doubled, hnsw is not
+    assert not needs_vector_index_build(dict(workspace, vector_index_vectors=12000))
+    assert needs_vector_index_build(dict(workspace, vector_index_vectors=10000))
+    assert not needs_vector_index_build(
+        dict(workspace, vector_index_vectors=10000, index_type="hnsw")
+    )
+
+
+def test_get_ivfflat_lists():
+    assert get_ivfflat_lists(500) == 1
+    assert get_ivfflat_lists(20000) == 20
+    assert get_ivfflat_lists(4000000) == 2000
+
+
+def test_update_vector_index_hnsw(mocker):
+    mocker.patch.object(genai_core.aurora.index, "AURORA_INDEX_BUILD_THRESHOLD", 10000)
+    cursor = _mock_cursor(mocker)
+    set_vectors = mocker.patch("genai_core.workspaces.set_vector_index_vectors")
+
+    assert update_vector_index(dict(workspace, index_type="hnsw", hnsw_m=32))
+
+    statements = _statements(cursor)
+    create = statements[3]
+    assert "CREATE INDEX CONCURRENTLY" in create.seq[0].string
+    method = create.seq[-2]
+    assert method.seq[0] == sql.SQL("hnsw (content_embeddings ")
+    assert sql.Literal(32) in method.seq
+    assert statements[5].seq[0] == sql.SQL("ALTER INDEX ")
+    assert "pg_advisory_unlock" in statements[-1]
+    set_vectors.assert_called_once_with("workspace-id", 20000)
+
+
+def test_update_vector_index_ivfflat_lists_from_rows(mocker):
+    mocker.patch.object(genai_core.aurora.index, "AURORA_INDEX_BUILD_THRESHOLD", 10000)
+    cursor = _mock_cursor(mocker, rows=30000)
+    mocker.patch("genai_core.workspaces.set_vector_index_vectors")
+
+    assert update_vector_index(workspace)
+
+    method = _statements(cursor)[3].seq[-2]
+    assert method.seq[0] == sql.SQL("ivfflat (content_embeddings ")
+    assert sql.Literal(30) in method.seq
+
+
+def test_update_vector_index_skipped_when_locked(mocker):
+    mocker.patch.object(genai_core.aurora.index, "AURORA_INDEX_BUILD_THRESHOLD", 10000)
+    cursor = _mock_cursor(mocker, locked=False)
+    set_vectors = mocker.patch("genai_core.workspaces.set_vector_index_vectors")
+
+    assert not update_vector_index(workspace)
+
+    assert len(_statements(cursor)) == 1
+    set_vectors.assert_not_called()
@@ -0,0 +1,177 @@
+import threading
+from decimal import Decimal
+from psycopg2 import sql
+from genai_core.aurora.query import query_workspace_aurora
+
+workspace = {
+    "embeddings_model_provider": "bedrock",
+    "embeddings_model_name": "cohere.embed-english-v3",
+    "cross_encoder_model_provider": None,
+    "cross_encoder_model_name": None,
+    "metric": "cosine",
+    "hybrid_search": True,
+    "languages": ["english"],
+}
+
+
+def _record(chunk_id, score):
+    return (
+        chunk_id,
+        "workspace-id",
+        "document-id",
+        None,
+        "file",
+        None,
+        "path",
+        "english",
+        "title",
+        f"content {chunk_id}",
+        None,
+        {},
+        score,
+    )
+
+
+def _mock_models(mocker):
+    mocker.patch(
+        "genai_core.embeddings.get_embeddings_model", return_value=mocker.MagicMock()
+    )
+    mocker.patch(
+        "genai_core.embeddings.generate_query_embeddings", return_value=[0.1, 0.2]
+    )
+
+
+def test_vector_and_keyword_searches_run_concurrently(mocker):
+    _mock_models(mocker)
+    # Both sides wait for each other, a serial implementation would time out
+    barrier = threading.Barrier(2, timeout=5)
+
+    def get_query_language(query, languages):
+        barrier.wait()
+        return ["english", [{"code": "en", "score": 0.99}]]
+
+    def connection():
+        cursor = mocker.MagicMock()
+
+        def execute(statement, params):
+            cursor.query = params
+
+        def fetchall():
+            if isinstance(cursor.query[0], str):
+                return [_record("2", 0.7)]
+
+            barrier.wait()
+            return [_record("1", 0.9)]
+
+        cursor.execute.side_effect = execute
+        cursor.fetchall.side_effect = fetchall
+
+        context = mocker.MagicMock()
+        context.__enter__.return_value = cursor
+        return context
+
+    mocker.patch(
+        "genai_core.utils.comprehend.get_query_language",
+        side_effect=get_query_language,
+    )
+    aurora_connection = mocker.patch(
+        "genai_core.aurora.query.AuroraConnection", side_effect=connection
+    )
+
+    result = query_workspace_aurora(
+        "workspace-id", workspace, "query", limit=5, full_response=True
+    )
+
+    assert aurora_connection.call_count == 2
+    assert result["query_language"] == "english"
+    assert [item["chunk_id"] for item in result["vector_search_items"]] == ["1"]
+    assert [item["chunk_id"] for item in result["keyword_search_items"]] == ["2"]
+
+
+def test_keyword_search_skipped_without_hybrid_search(mocker):
+    _mock_models(mocker)
+    mocker.patch(
+        "genai_core.utils.comprehend.get_query_language",
+        return_value=["english", []],
+    )
+    vector_search = mocker.patch(
+        "genai_core.aurora.query._vector_search", return_value=[]
+    )
+    keyword_search = mocker.patch("genai_core.aurora.query._keyword_search")
+
+    result = query_workspace_aurora(
+        "workspace-id",
+        dict(workspace, hybrid_search=False, metric="inner"),
+        "query",
+        limit=5,
+        full_response=False,
+    )
+
+    assert result["items"] == []
+    assert vector_search.call_args[0][1] == "inner"
+    keyword_search.assert_not_called()
+
+
+def test_search_settings_from_workspace(mocker):
+    _mock_models(mocker)
+    mocker.patch(
+        "genai_core.utils.comprehend.get_query_language",
+        return_value=["english", []],
+    )
+    cursor = mocker.MagicMock()
+    cursor.fetchall.return_value = []
+    connection = mocker.patch("genai_core.aurora.query.AuroraConnection")
+    connection.return_value.__enter__.return_value = cursor
+
+    query_workspace_aurora(
+        "workspace-id",
+        dict(
+            workspace,
+            hybrid_search=False,
+            vector_search_limit=Decimal(50),
+            ivfflat_probes=Decimal(10),
+        ),
+        "query",
+        limit=5,
+        full_response=False,
+    )
+
+    statement, params = cursor.execute.call_args[0]
+    assert statement.seq[:2] == [sql.SQL("SET ivfflat.probes = "), sql.Literal(10)]
+    assert params[1] == 50
+
+
+def test_keyword_search_uses_tsvector_columns(mocker):
+    _mock_models(mocker)
+    mocker.patch(
+        "genai_core.utils.comprehend.get_query_language",
+        return_value=["english", []],
+    )
+    mocker.patch("genai_core.aurora.query._vector_search", return_value=[])
+    keyword_search = mocker.patch(
+        "genai_core.aurora.query._keyword_search", return_value=[]
+    )
+
+    query_workspace_aurora(
+        "workspace-id", workspace, "query", limit=5, full_response=False
+    )
+    assert keyword_search.call_args[0][4] is None
+
+    query_workspace_aurora(
+        "workspace-id",
+        dict(workspace, format_version=Decimal(2)),
+        "query",
+        limit=5,
+        full_response=False,
+    )
+    assert keyword_search.call_args[0][4] == "content_tsvector_english"
+
+    # Detected languages outside of the workspace languages have no column
+    query_workspace_aurora(
+        "workspace-id",
+        dict(workspace, format_version=2, languages=["german"]),
+        "query",
+        limit=5,
+        full_response=False,
+    )
+    assert keyword_search.call_args[0][4] is None
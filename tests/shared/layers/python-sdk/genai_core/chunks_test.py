@@ -0,0 +1,384 @@
+import io
+import types
+import pytest
+import genai_core.chunks
+from genai_core.chunks import (
+    add_chunks,
+    get_chunk_from_s3,
+    remove_chunks_on_s3,
+    split_content,
+    split_content_stream,
+    store_chunks_on_s3,
+)
+
+workspace = {
+    "chunking_strategy": "recursive",
+    "chunk_size": 40,
+    "chunk_overlap": 10,
+}
+
+content = "\n".join(f"Line {idx} of the document with some words." for idx in range(20))
+
+
+def test_split_content_stream_matches_split_content():
+    lines = content.split("\n")
+    segments = ["\n".join(lines[idx : idx + 3]) for idx in range(0, len(lines), 3)]
+
+    assert list(split_content_stream(workspace, segments)) == split_content(
+        workspace, content
+    )
+
+
+def test_split_content_stream_spans_segments():
+    chunks = list(split_content_stream(workspace, ["first part of", "a sentence"]))
+
+    assert chunks == ["first part of\na sentence"]
+    assert list(split_content_stream(workspace, [])) == []
+    assert list(split_content_stream(workspace, ["", " "])) == []
+
+
+class WordTokenizer(object):
+    def encode(self, text, disallowed_special=None):
+        return text.split()
+
+
+def test_split_content_by_tokens(mocker):
+    mocker.patch("genai_core.embeddings.get_tokenizer", return_value=WordTokenizer())
+    token_workspace = {
+        "chunking_strategy": "token",
+        "chunk_size": 40,
+        "chunk_overlap": 10,
+        "embeddings_model_name": "cohere.embed-english-v3",
+    }
+
+    chunks = split_content(token_workspace, content)
+
+    assert len(chunks) > 1
+    assert all(len(chunk.split()) <= 40 for chunk in chunks)
+    assert " ".join(chunks[0].split()[-5:]) in chunks[1]
+
+    # Long words stay within the character limit of the model
+    chunks = split_content(token_workspace, " ".join(["x" * 300] * 20))
+
+    assert all(len(chunk) <= 2048 for chunk in chunks)
+
+
+def test_add_chunks_with_chunk_embeddings(mocker):
+    generate_embeddings = mocker.patch("genai_core.embeddings.generate_embeddings")
+    mocker.patch("genai_core.chunks.store_chunks_on_s3")
+    mocker.patch("genai_core.chunks.list_chunks_on_s3", return_value=[])
+    add_chunks_aurora = mocker.patch(
+        "genai_core.aurora.chunks.add_chunks_aurora",
+        return_value={"added_vectors": 1},
+    )
+    mocker.patch("genai_core.documents.set_document_vectors")
+    update_vector_index = mocker.patch("genai_core.chunks.update_vector_index")
+
+    add_chunks(
+        workspace={
+            "workspace_id": "workspace-id",
+            "engine": "aurora",
+            "embeddings_model_provider": "bedrock",
+            "embeddings_model_name": "model",
+        },
+        document={
+            "document_id": "document-id",
+            "document_type": "file",
+            "document_sub_type": None,
+            "path": "file.txt",
+            "title": "file.txt",
+        },
+        document_sub_id=None,
+        chunks=["chunk"],
+        chunk_complements=None,
+        replace=True,
+        chunk_embeddings=[[0.1, 0.2]],
+    )
+
+    generate_embeddings.assert_not_called()
+    assert add_chunks_aurora.call_args[1]["chunk_embeddings"] == [[0.1, 0.2]]
+    # The index is built by the import batch jobs, not on every add
+    update_vector_index.assert_not_called()
+
+
+def test_update_vector_index_after_add_chunks(mocker):
+    workspace = {"workspace_id": "workspace-id", "engine": "aurora"}
+    get_workspace = mocker.patch(
+        "genai_core.workspaces.get_workspace", return_value=workspace
+    )
+    build = mocker.patch(
+        "genai_core.aurora.index.update_vector_index", side_effect=Exception("busy")
+    )
+
+    # A failed build does not fail the ingestion
+    genai_core.chunks.update_vector_index("workspace-id")
+
+    get_workspace.assert_called_once_with("workspace-id")
+    build.assert_called_once_with(workspace)
+
+
+class FakeS3(object):
+    """In memory S3 resource recording the requests."""
+
+    def __init__(self):
+        self.objects = {}
+        self.ranges = []
+        self.meta = types.SimpleNamespace(
+            client=types.SimpleNamespace(
+                exceptions=types.SimpleNamespace(NoSuchKey=KeyError),
+                delete_objects=self.delete_objects,
+            )
+        )
+
+    def delete_objects(self, Bucket, Delete):
+        for item in Delete["Objects"]:
+            self.objects.pop(item["Key"], None)
+
+    def Object(self, bucket_name, key):
+        fake = self
+
+        class Object(object):
+            def put(self, Body, ContentType=None):
+                fake.objects[key] = Body if isinstance(Body, bytes) else Body.encode()
+
+            def get(self, Range=None):
+                body = fake.objects[key]
+                if Range is not None:
+                    fake.ranges.append(Range)
+                    start, end = Range.replace("bytes=", "").split("-")
+                    body = body[int(start) : int(end) + 1]
+
+                return {"Body": io.BytesIO(body)}
+
+        return Object()
+
+    def Bucket(self, bucket_name):
+        def filter(Prefix):
+            return [
+                types.SimpleNamespace(key=key, e_tag=str(hash(body)))
+                for key, body in sorted(self.objects.items())
+                if key.startswith(Prefix)
+            ]
+
+        return types.SimpleNamespace(objects=types.SimpleNamespace(filter=filter))
+
+
+@pytest.fixture
+def s3(mocker):
+    s3 = FakeS3()
+    mocker.patch.object(genai_core.chunks, "s3", s3)
+    genai_core.chunks.shard_indexes_cache.clear()
+
+    return s3
+
+
+def test_chunks_shard_ranged_read(s3):
+    store_chunks_on_s3("workspace", "document", None, ["1", "2"], ["first", "sécond"])
+    store_chunks_on_s3("workspace", "document", None, ["3"], ["third"])
+
+    # One shard and one index per call instead of an object per chunk
+    assert len(s3.objects) == 4
+    assert get_chunk_from_s3("workspace", "document", None, "2") == "sécond"
+    assert get_chunk_from_s3("workspace", "document", None, "3") == "third"
+    assert len(s3.ranges) == 2
+    assert get_chunk_from_s3("workspace", "document", "sub", "1") is None
+
+
+def test_chunk_files(s3, mocker):
+    mocker.patch.object(genai_core.chunks, "CHUNKS_S3_FORMAT", "files")
+
+    store_chunks_on_s3("workspace", "document", "sub", ["1", "2"], ["first", "second"])
+
+    assert sorted(s3.objects) == [
+        "workspace/document/sub/chunks/1.txt",
+        "workspace/document/sub/chunks/2.txt",
+    ]
+    assert get_chunk_from_s3("workspace", "document", "sub", "2") == "second"
+
+
+def test_remove_chunks_on_s3_keeps_checkpointed_shards(s3):
+    store_chunks_on_s3("workspace", "document", None, ["1", "2"], ["first", "second"])
+    store_chunks_on_s3("workspace", "document", None, ["3"], ["third"])
+    # Shard of a job killed before its index was written
+    s3.objects["workspace/document/chunks/partial.jsonl"] = b"{}"
+
+    removed = remove_chunks_on_s3("workspace", "document", None, ["1", "2"])
+
+    assert removed == 3
+    assert len(s3.objects) == 2
+    assert get_chunk_from_s3("workspace", "document", None, "1") == "first"
+    assert get_chunk_from_s3("workspace", "document", None, "3") is None
+
+
+def test_remove_chunk_files_on_s3(s3, mocker):
+    mocker.patch.object(genai_core.chunks, "CHUNKS_S3_FORMAT", "files")
+    store_chunks_on_s3("workspace", "document", "sub", ["1", "2"], ["first", "second"])
+
+    removed = remove_chunks_on_s3("workspace", "document", "sub", ["1"])
+
+    assert removed == 1
+    assert sorted(s3.objects) == ["workspace/document/sub/chunks/1.txt"]
+
+
+def test_add_chunks_in_batches(mocker):
+    mocker.patch.object(genai_core.chunks, "ADD_CHUNKS_BATCH_SIZE", 2)
+    mocker.patch(
+        "genai_core.embeddings.get_embeddings_model", return_value=mocker.MagicMock()
+    )
+    mocker.patch("genai_core.embeddings.get_max_concurrency", return_value=8)
+    generate_embeddings = mocker.patch(
+        "genai_core.embeddings.generate_embeddings",
+        side_effect=lambda model, chunks, task, max_concurrency: [
+            [len(chunk)] for chunk in chunks
+        ],
+    )
+    mocker.patch("genai_core.chunks.store_chunks_on_s3")
+    mocker.patch("genai_core.chunks.list_chunks_on_s3", return_value=[])
+    clean_chunks_open_search = mocker.patch(
+        "genai_core.opensearch.chunks.clean_chunks_open_search"
+    )
+    add_chunks_open_search = mocker.patch(
+        "genai_core.opensearch.chunks.add_chunks_open_search",
+        side_effect=lambda **kwargs: {"added_vectors": len(kwargs["chunk_ids"])},
+    )
+    set_document_vectors = mocker.patch("genai_core.documents.set_document_vectors")
+    chunks = ["a", "bb", "ccc", "dddd", "eeeee"]
+
+    add_chunks(
+        workspace={
+            "workspace_id": "workspace-id",
+            "engine": "opensearch",
+            "embeddings_model_provider": "bedrock",
+            "embeddings_model_name": "model",
+        },
+        document={
+            "document_id": "document-id",
+            "document_type": "file",
+            "document_sub_type": None,
+            "path": "file.txt",
+            "title": "file.txt",
+        },
+        document_sub_id=None,
+        chunks=chunks,
+        chunk_complements=["A", "B", "C", "D", "E"],
+        replace=True,
+        chunk_ids=["1", "2", "3", "4", "5"],
+    )
+
+    assert generate_embeddings.call_count == 3
+    assert all(
+        call[1]["max_concurrency"] == 4 for call in generate_embeddings.call_args_list
+    )
+    # The previous chunks are removed once every batch is stored
+    clean_chunks_open_search.assert_called_once_with(
+        "workspace-id", "document-id", ["1", "2", "3", "4", "5"], None
+    )
+    calls = sorted(
+        (call[1] for call in add_chunks_open_search.call_args_list),
+        key=lambda kwargs: kwargs["chunks"],
+    )
+    assert [kwargs["chunks"] for kwargs in calls] == [
+        ["a", "bb"],
+        ["ccc", "dddd"],
+        ["eeeee"],
+    ]
+    assert [kwargs["chunk_complements"] for kwargs in calls] == [
+        ["A", "B"],
+        ["C", "D"],
+        ["E"],
+    ]
+    assert all(not kwargs["replace"] for kwargs in calls)
+    assert calls[1]["chunk_embeddings"] == [[3], [4]]
+    set_document_vectors.assert_called_once_with(
+        "workspace-id", "document-id", 5, replace=True
+    )
+
+
+def test_add_chunks_rolls_back_failed_batches(mocker):
+    mocker.patch.object(genai_core.chunks, "ADD_CHUNKS_BATCH_SIZE", 2)
+    mocker.patch("genai_core.chunks.store_chunks_on_s3")
+    mocker.patch(
+        "genai_core.chunks.list_chunks_on_s3",
+        side_effect=[["old.jsonl"], ["old.jsonl", "new.jsonl"]],
+    )
+    delete_chunks_on_s3 = mocker.patch("genai_core.chunks.delete_chunks_on_s3")
+    clean_chunks_open_search = mocker.patch(
+        "genai_core.opensearch.chunks.clean_chunks_open_search"
+    )
+
+    def add_chunks_open_search(**kwargs):
+        if kwargs["chunk_ids"] == ["3", "4"]:
+            raise Exception("Bulk write failed")
+        return {"added_vectors": len(kwargs["chunk_ids"])}
+
+    mocker.patch(
+        "genai_core.opensearch.chunks.add_chunks_open_search",
+        side_effect=add_chunks_open_search,
+    )
+    set_document_vectors = mocker.patch("genai_core.documents.set_document_vectors")
+
+    with pytest.raises(Exception, match="Bulk write failed"):
+        add_chunks(
+            workspace={
+                "workspace_id": "workspace-id",
+                "engine": "opensearch",
+                "embeddings_model_provider": "bedrock",
+                "embeddings_model_name": "model",
+            },
+            document={
+                "document_id": "document-id",
+                "document_type": "file",
+                "document_sub_type": None,
+                "path": "file.txt",
+                "title": "file.txt",
+            },
+            document_sub_id=None,
+            chunks=["a", "bb", "ccc", "dddd", "eeeee"],
+            chunk_complements=None,
+            replace=True,
+            chunk_embeddings=[[1], [2], [3], [4], [5]],
+            chunk_ids=["1", "2", "3", "4", "5"],
+        )
+
+    # Only the new chunks are removed, the previous ones stay searchable
+    clean_chunks_open_search.assert_called_once_with(
+        "workspace-id", "document-id", None, ["1", "2", "3", "4", "5"]
+    )
+    delete_chunks_on_s3.assert_called_once_with(["new.jsonl"])
+    set_document_vectors.assert_not_called()
+
+
+def test_replaced_chunks_are_deleted_from_s3(s3, mocker):
+    store_chunks_on_s3("workspace", "document", None, ["1"], ["old"])
+    mocker.patch(
+        "genai_core.aurora.chunks.add_chunks_aurora",
+        return_value={"added_vectors": 1},
+    )
+    mocker.patch("genai_core.documents.set_document_vectors")
+    mocker.patch("genai_core.chunks.update_vector_index")
+
+    add_chunks(
+        workspace={
+            "workspace_id": "workspace",
+            "engine": "aurora",
+            "embeddings_model_provider": "bedrock",
+            "embeddings_model_name": "model",
+        },
+        document={
+            "document_id": "document",
+            "document_type": "file",
+            "document_sub_type": None,
+            "path": "file.txt",
+            "title": "file.txt",
+        },
+        document_sub_id=None,
+        chunks=["new"],
+        chunk_complements=None,
+        replace=True,
+        chunk_embeddings=[[0.1]],
+        chunk_ids=["2"],
+    )
+
+    assert len(s3.objects) == 2
+    assert get_chunk_from_s3("workspace", "document", None, "1") is None
+    assert get_chunk_from_s3("workspace", "document", None, "2") == "new"
@@ -0,0 +1,81 @@
+import json
+import pytest
+import genai_core.cross_encoder
+from genai_core.cross_encoder import (
+    passage_scores_cache,
+    rank_passages,
+    truncate_passages,
+)
+from genai_core.types import CommonError, CrossEncoderModel
+
+model = CrossEncoderModel(
+    provider="sagemaker", name="cross-encoder/ms-marco-MiniLM-L-12-v2"
+)
+
+
+class CharTokenizer(object):
+    def encode(self, text, disallowed_special=None):
+        return list(text)
+
+    def decode(self, tokens):
+        return "".join(tokens)
+
+
+@pytest.fixture(autouse=True)
+def tokenizer(mocker):
+    return mocker.patch(
+        "genai_core.embeddings.get_tokenizer", return_value=CharTokenizer()
+    )
+
+
+@pytest.fixture
+def invoke(mocker):
+    passage_scores_cache.clear()
+    mocker.patch.object(genai_core.cross_encoder, "CROSS_ENCODER_BATCH_SIZE", 2)
+
+    def invoke_endpoint(EndpointName, ContentType, Body):
+        passages = json.loads(Body)["passages"]
+        body = mocker.MagicMock()
+        body.read.return_value = json.dumps([float(len(x)) for x in passages]).encode()
+        return {"Body": body}
+
+    client = mocker.MagicMock()
+    client.invoke_endpoint.side_effect = invoke_endpoint
+    mocker.patch("genai_core.clients.get_sagemaker_client", return_value=client)
+
+    yield client.invoke_endpoint
+    passage_scores_cache.clear()
+
+
+def _passages(invoke):
+    return [json.loads(call[1]["Body"])["passages"] for call in invoke.call_args_list]
+
+
+def test_truncate_passages(tokenizer):
+    passages = truncate_passages(model.name, "query", ["a" * 10000, "short"])
+
+    # 512 tokens minus the query and the special tokens
+    assert passages == ["a" * 504, "short"]
+    tokenizer.assert_called_with(model.name)
+
+
+def test_micro_batches_keep_passage_order(invoke):
+    scores = rank_passages(model, "query", ["aaaa", "a", "aaa", "aa", "aaaaa"])
+
+    assert scores == [4.0, 1.0, 3.0, 2.0, 5.0]
+    # Passages of similar length are sent together
+    assert sorted(_passages(invoke)) == [["a", "aa"], ["aaa", "aaaa"], ["aaaaa"]]
+
+
+def test_scores_are_cached_by_key(invoke):
+    rank_passages(model, "query", ["a", "aa"], keys=["1", "2"])
+    scores = rank_passages(model, "query", ["aa", "aaa"], keys=["2", "3"])
+    rank_passages(model, "other query", ["a"], keys=["1"])
+
+    assert scores == [2.0, 3.0]
+    assert _passages(invoke) == [["a", "aa"], ["aaa"], ["a"]]
+
+
+def test_unknown_provider():
+    with pytest.raises(CommonError):
+        rank_passages(CrossEncoderModel(provider="other", name="name"), "q", ["a"])
@@ -0,0 +1,279 @@
+import json
+import threading
+import time
+from unittest.mock import MagicMock
+
+import botocore
+import pytest
+import genai_core.embeddings
+from genai_core.embeddings import (
+    AdaptiveConcurrencyLimit,
+    generate_embeddings,
+    generate_query_embeddings,
+    get_model_token_limit,
+    get_token_count_function,
+    get_tokenizer,
+)
+from genai_core.embeddings_cache import EmbeddingsCache, set_embeddings_cache
+from genai_core.types import EmbeddingsModel, Provider, Task
+from genai_core.utils.cache import LRUCache
+
+
+@pytest.fixture(autouse=True)
+def embeddings_cache():
+    cache = EmbeddingsCache()
+    set_embeddings_cache(cache)
+    yield cache
+    set_embeddings_cache(None)
+
+
+def _model(name="cohere.embed-english-v3"):
+    return EmbeddingsModel(provider=Provider.BEDROCK.value, name=name, dimensions=1)
+
+
+def test_generate_embeddings_batches_keep_order(mocker):
+    def generate(model, batch, task, bedrock):
+        # Later batches finish first to make sure ordering is not by completion
+        time.sleep(0.01 * (10 - int(batch[0])))
+        return [[float(text)] for text in batch]
+
+    mocker.patch(
+        "genai_core.embeddings._generate_embeddings_bedrock", side_effect=generate
+    )
+
+    texts = [str(idx) for idx in range(10)]
+    result = generate_embeddings(_model(), texts, Task.STORE, batch_size=2)
+
+    assert result == [[float(idx)] for idx in range(10)]
+
+
+def test_generate_embeddings_respects_concurrency_limit(mocker):
+    lock = threading.Lock()
+    state = {"running": 0, "max_running": 0}
+
+    def generate(model, batch, task, bedrock):
+        with lock:
+            state["running"] += 1
+            state["max_running"] = max(state["max_running"], state["running"])
+        time.sleep(0.02)
+        with lock:
+            state["running"] -= 1
+        return [[0.0] for _ in batch]
+
+    mocker.patch(
+        "genai_core.embeddings._generate_embeddings_bedrock", side_effect=generate
+    )
+    mocker.patch.dict(
+        genai_core.embeddings.PROVIDER_MAX_CONCURRENCY, {Provider.BEDROCK.value: 2}
+    )
+
+    result = generate_embeddings(
+        _model(), ["a"] * 10, Task.STORE, batch_size=1, use_cache=False
+    )
+
+    assert len(result) == 10
+    assert state["max_running"] == 2
+
+
+def test_generate_embeddings_shares_one_client(mocker):
+    get_client = mocker.patch("genai_core.clients.get_bedrock_client")
+    generate = mocker.patch(
+        "genai_core.embeddings._generate_embeddings_bedrock",
+        side_effect=lambda model, batch, task, bedrock: [[0.0] for _ in batch],
+    )
+
+    generate_embeddings(_model(), ["a", "b", "c", "d"], Task.STORE, batch_size=1)
+
+    get_client.assert_called_once()
+    assert generate.call_count == 4
+    assert {call[0][3] for call in generate.call_args_list} == {get_client.return_value}
+
+
+def _titan_response(value):
+    body = MagicMock()
+    body.read.return_value = json.dumps({"embedding": [value, 0.0]})
+    return {"body": body}
+
+
+def test_generate_embeddings_amazon_in_parallel(mocker):
+    bedrock = MagicMock()
+    bedrock.invoke_model.side_effect = lambda body, **kwargs: _titan_response(
+        float(json.loads(body)["inputText"]) + 1
+    )
+    mocker.patch("genai_core.clients.get_bedrock_client", return_value=bedrock)
+
+    texts = [str(idx) for idx in range(20)]
+    result = generate_embeddings(
+        _model("amazon.titan-embed-text-v1"), texts, Task.STORE
+    )
+
+    assert bedrock.invoke_model.call_count == 20
+    # Normalized vectors of [n, 0] are [1, 0]
+    assert result == [[1.0, 0.0]] * 20
+
+
+def _http_response(status_code):
+    return MagicMock(status_code=status_code)
+
+
+def test_titan_throttling_slows_down_calls(mocker):
+    def invoke_model(**kwargs):
+        # The retry hook of the client sees each failed attempt
+        hook = bedrock.meta.events.register.call_args.args[1]
+        hook(
+            response=(
+                _http_response(400),
+                {"Error": {"Code": "ThrottlingException"}},
+            )
+        )
+
+        return _titan_response(2.0)
+
+    bedrock = MagicMock()
+    bedrock.invoke_model.side_effect = invoke_model
+    limit = AdaptiveConcurrencyLimit(8)
+    mocker.patch.object(genai_core.embeddings, "titan_concurrency_limit", limit)
+
+    result = genai_core.embeddings._generate_embeddings_amazon(
+        _model("amazon.titan-embed-text-v1"), ["text"], bedrock
+    )
+
+    assert result == [[1.0, 0.0]]
+    assert bedrock.invoke_model.call_count == 1
+    assert limit.in_flight == 0
+    assert limit.limit == 4
+
+    # Throttling errors are raised once the client is out of retries
+    bedrock.invoke_model.side_effect = botocore.exceptions.ClientError(
+        {"Error": {"Code": "ThrottlingException"}}, "InvokeModel"
+    )
+    with pytest.raises(botocore.exceptions.ClientError):
+        genai_core.embeddings._generate_embeddings_amazon(
+            _model("amazon.titan-embed-text-v1"), ["text"], bedrock
+        )
+
+    assert limit.in_flight == 0
+    assert limit.limit == 2
+
+
+def test_titan_retries_of_other_errors_are_not_throttling(mocker):
+    def invoke_model(**kwargs):
+        hook = bedrock.meta.events.register.call_args.args[1]
+        hook(response=None, caught_exception=ConnectionError())
+        hook(
+            response=(
+                _http_response(503),
+                {"Error": {"Code": "ServiceUnavailableException"}},
+            )
+        )
+
+        return _titan_response(2.0)
+
+    bedrock = MagicMock()
+    bedrock.invoke_model.side_effect = invoke_model
+    limit = AdaptiveConcurrencyLimit(8)
+    limit.limit = 4.0
+    mocker.patch.object(genai_core.embeddings, "titan_concurrency_limit", limit)
+
+    genai_core.embeddings._generate_embeddings_amazon(
+        _model("amazon.titan-embed-text-v1"), ["text"], bedrock
+    )
+
+    assert limit.limit == 4.25
+
+    # A 429 is throttling whatever its error code
+    def invoke_model(**kwargs):
+        hook = bedrock.meta.events.register.call_args.args[1]
+        hook(response=(_http_response(429), {"Error": {"Code": "TooManyRequests"}}))
+
+        return _titan_response(2.0)
+
+    bedrock.invoke_model.side_effect = invoke_model
+
+    genai_core.embeddings._generate_embeddings_amazon(
+        _model("amazon.titan-embed-text-v1"), ["text"], bedrock
+    )
+
+    assert limit.limit == 2.125
+
+
+def test_adaptive_concurrency_limit():
+    limit = AdaptiveConcurrencyLimit(4)
+
+    limit.acquire()
+    limit.release(throttled=True)
+    assert limit.limit == 2
+
+    limit.acquire()
+    limit.release()
+    assert limit.limit == 2.5
+
+
+def test_query_embeddings_are_cached_by_normalized_query(mocker):
+    mocker.patch.object(
+        genai_core.embeddings, "query_embeddings_cache", LRUCache(10, ttl=60)
+    )
+    generate = mocker.patch(
+        "genai_core.embeddings.generate_embeddings", return_value=[[0.1, 0.2]]
+    )
+
+    first = generate_query_embeddings(_model(), "What is  RAG?")
+    second = generate_query_embeddings(_model(), " what is rag? ")
+
+    assert first == second == [0.1, 0.2]
+    generate.assert_called_once_with(
+        _model(), ["What is  RAG?"], Task.RETRIEVE, use_cache=False
+    )
+
+    generate_query_embeddings(_model("cohere.embed-multilingual-v3"), "what is rag?")
+    assert generate.call_count == 2
+
+
+def test_query_embeddings_cache_expires(mocker):
+    mocker.patch.object(
+        genai_core.embeddings, "query_embeddings_cache", LRUCache(10, ttl=-1)
+    )
+    generate = mocker.patch(
+        "genai_core.embeddings.generate_embeddings", return_value=[[0.1, 0.2]]
+    )
+
+    generate_query_embeddings(_model(), "query")
+    generate_query_embeddings(_model(), "query")
+
+    assert generate.call_count == 2
+
+
+def test_tokenizer_is_loaded_once_per_model(mocker):
+    mocker.patch.object(genai_core.embeddings, "tokenizers_cache", LRUCache(16))
+    encoding_for_model = mocker.patch(
+        "tiktoken.encoding_for_model", side_effect=KeyError("unknown")
+    )
+    get_encoding = mocker.patch("tiktoken.get_encoding")
+
+    assert get_tokenizer("cohere.embed-english-v3") is get_encoding.return_value
+    assert get_tokenizer("cohere.embed-english-v3") is get_encoding.return_value
+
+    encoding_for_model.assert_called_once_with("cohere.embed-english-v3")
+    get_encoding.assert_called_once_with("cl100k_base")
+
+
+class WordTokenizer(object):
+    def encode(self, text, disallowed_special=None):
+        return text.split()
+
+
+def test_token_count_adds_margin_for_other_tokenizers(mocker):
+    mocker.patch("genai_core.embeddings.get_tokenizer", return_value=WordTokenizer())
+    text = " ".join(["word"] * 10)
+
+    # Counted with the encoding of the model
+    assert get_token_count_function("text-embedding-ada-002")(text) == 10
+    # Counted with the default encoding and the margin
+    assert get_token_count_function("intfloat/multilingual-e5-large")(text) == 13
+
+
+def test_model_token_limits():
+    assert get_model_token_limit("intfloat/multilingual-e5-large") == 512
+    assert get_model_token_limit("sentence-transformers/all-MiniLM-L6-v2") == 256
+    assert get_model_token_limit("text-embedding-ada-002") == 8191
+    assert get_model_token_limit("cohere.embed-english-v3") == 512
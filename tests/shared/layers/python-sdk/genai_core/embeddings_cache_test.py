@@ -0,0 +1,88 @@
+import pytest
+from botocore.exceptions import ClientError
+
+from genai_core.embeddings import generate_embeddings
+from genai_core.embeddings_cache import (
+    EmbeddingsCache,
+    LocalEmbeddingsCacheBackend,
+    get_cache_key,
+    set_embeddings_cache,
+)
+from genai_core.types import EmbeddingsModel, Provider, Task
+
+model = EmbeddingsModel(
+    provider=Provider.BEDROCK.value, name="cohere.embed-english-v3", dimensions=2
+)
+
+
+@pytest.fixture
+def generate(mocker):
+    return mocker.patch(
+        "genai_core.embeddings._generate_embeddings_bedrock",
+        side_effect=lambda model, batch, task, bedrock: [
+            [float(len(text)), 1.0] for text in batch
+        ],
+    )
+
+
+@pytest.fixture
+def backend():
+    backend = LocalEmbeddingsCacheBackend()
+    cache = EmbeddingsCache(max_size=10, backend=backend)
+    set_embeddings_cache(cache)
+    yield backend
+    set_embeddings_cache(None)
+
+
+def test_cache_key_depends_on_model_and_task():
+    key = get_cache_key("bedrock", "model", "store", "text")
+
+    assert key != get_cache_key("bedrock", "model", "retrieve", "text")
+    assert key != get_cache_key("bedrock", "other", "store", "text")
+    assert key == get_cache_key("bedrock", "model", "store", "text")
+
+
+def test_only_misses_are_embedded(generate, backend):
+    first = generate_embeddings(model, ["a", "bb"], Task.STORE)
+    second = generate_embeddings(model, ["bb", "ccc", "a", "ccc"], Task.STORE)
+
+    assert first == [[1.0, 1.0], [2.0, 1.0]]
+    assert second == [[2.0, 1.0], [3.0, 1.0], [1.0, 1.0], [3.0, 1.0]]
+    assert [call[0][1] for call in generate.call_args_list] == [["a", "bb"], ["ccc"]]
+
+
+def test_backend_hits_skip_the_model(generate, backend):
+    key = get_cache_key(model.provider, model.name, Task.STORE.value, "a")
+    backend.put_many({key: [9.0, 9.0]})
+
+    assert generate_embeddings(model, ["a"], Task.STORE) == [[9.0, 9.0]]
+    generate.assert_not_called()
+
+
+def test_use_cache_false_always_calls_the_model(generate, backend):
+    generate_embeddings(model, ["a"], Task.STORE)
+    generate_embeddings(model, ["a"], Task.STORE, use_cache=False)
+
+    assert generate.call_count == 2
+
+
+def test_cache_stats():
+    cache = EmbeddingsCache(max_size=1, backend=LocalEmbeddingsCacheBackend())
+    cache.put_many({"a": [1.0], "b": [2.0]})
+
+    assert cache.get_many(["a", "b", "c"]) == {"a": [1.0], "b": [2.0]}
+    stats = cache.get_stats()
+    assert stats["local_hits"] == 1
+    assert stats["backend_hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_backend_errors_are_not_fatal(mocker):
+    backend = mocker.MagicMock()
+    backend.get_many.side_effect = ClientError({"Error": {}}, "BatchGetItem")
+    backend.put_many.side_effect = ClientError({"Error": {}}, "BatchWriteItem")
+    cache = EmbeddingsCache(max_size=10, backend=backend)
+
+    assert cache.get_many(["a"]) == {}
+    cache.put_many({"a": [1.0]})
+    assert cache.get_many(["a"]) == {"a": [1.0]}
@@ -0,0 +1,136 @@
+import pytest
+import genai_core.fusion
+from genai_core.fusion import (
+    fuse,
+    merge_results,
+    reciprocal_rank_fusion,
+    rerank,
+    select_top_k,
+    weighted_score_fusion,
+)
+
+
+def _record(chunk_id, source, score):
+    return {
+        "chunk_id": chunk_id,
+        "content": f"content {chunk_id}",
+        "sources": [source],
+        "score": None,
+        "vector_search_score": score if source == "vector_search" else None,
+        "keyword_search_score": score if source == "keyword_search" else None,
+    }
+
+
+def test_merge_results_deduplicates_by_chunk_id():
+    vector = [_record("1", "vector_search", 0.9), _record("2", "vector_search", 0.8)]
+    keyword = [_record("3", "keyword_search", 2.0), _record("1", "keyword_search", 1.0)]
+
+    items = merge_results(vector, keyword)
+
+    assert [item["chunk_id"] for item in items] == ["1", "2", "3"]
+    assert items[0]["sources"] == ["keyword_search", "vector_search"]
+    assert items[0]["keyword_search_score"] == 1.0
+    # The keyword record is completed with the vector search data as well
+    assert keyword[1]["sources"] == ["keyword_search", "vector_search"]
+    assert keyword[1]["vector_search_score"] == 0.9
+
+
+def test_rerank_sorts_and_copies_scores(mocker):
+    mocker.patch("genai_core.cross_encoder.rank_passages", return_value=[0.1, 0.7, 0.4])
+    vector = [_record("1", "vector_search", 0.9), _record("2", "vector_search", 0.8)]
+    keyword = [_record("3", "keyword_search", 2.0), _record("1", "keyword_search", 1.0)]
+    items = merge_results(vector, keyword)
+
+    items = rerank({}, "query", items, vector, keyword)
+
+    assert [item["chunk_id"] for item in items] == ["2", "3", "1"]
+    assert keyword[1]["score"] == 0.1
+
+
+def test_rerank_scores_top_n_candidates(mocker):
+    mocker.patch.object(genai_core.fusion, "CROSS_ENCODER_TOP_N", 2)
+    rank_passages = mocker.patch(
+        "genai_core.cross_encoder.rank_passages", return_value=[0.2, 0.6]
+    )
+    vector = [_record("1", "vector_search", 0.9), _record("2", "vector_search", 0.8)]
+    keyword = [_record("3", "keyword_search", 2.0), _record("1", "keyword_search", 1.0)]
+    items = merge_results(vector, keyword)
+
+    items = rerank({}, "query", items, vector, keyword)
+
+    # "1" is found by both searches, "3" ranks above "2" in its own list
+    assert rank_passages.call_args[1]["keys"] == ["1", "3"]
+    assert [item["chunk_id"] for item in items] == ["3", "1"]
+    assert vector[1]["score"] is None
+
+
+def test_select_top_k_fills_with_vector_search_hits():
+    items = [
+        dict(_record("1", "vector_search", 0.6), score=0.9),
+        dict(_record("2", "vector_search", 0.9), score=-1.0),
+        dict(_record("3", "vector_search", 0.4), score=-2.0),
+        dict(_record("4", "keyword_search", 3.0), score=-3.0),
+    ]
+
+    ret_items = select_top_k(items, 3, threshold=0.0)
+
+    # "1" is not repeated, "3" and "4" do not pass the vector score threshold
+    assert [item["chunk_id"] for item in ret_items] == ["1", "2"]
+
+
+def test_select_top_k_negative_inner_product():
+    items = [
+        dict(_record("1", "vector_search", -0.6), score=0.0),
+        dict(_record("2", "vector_search", -0.9), score=0.0),
+        dict(_record("3", "vector_search", -0.1), score=0.0),
+    ]
+
+    ret_items = select_top_k(items[:0], 2, vector_score_sign=-1)
+    assert ret_items == []
+
+    ret_items = select_top_k(items, 2, threshold=10, vector_score_sign=-1)
+    assert [item["chunk_id"] for item in ret_items] == ["2", "1"]
+
+
+def test_reciprocal_rank_fusion():
+    vector = [_record("1", "vector_search", 0.1), _record("2", "vector_search", 0.2)]
+    keyword = [_record("2", "keyword_search", 3.0), _record("3", "keyword_search", 1)]
+
+    scores = reciprocal_rank_fusion(vector, keyword, k=60)
+
+    assert scores["1"] == pytest.approx(1 / 61)
+    assert scores["2"] == pytest.approx(1 / 62 + 1 / 61)
+    assert scores["3"] == pytest.approx(1 / 62)
+
+
+def test_weighted_score_fusion_normalizes_each_list():
+    # Distances, lower is better
+    vector = [
+        _record("1", "vector_search", 0.1),
+        _record("2", "vector_search", 0.3),
+        _record("3", "vector_search", 0.5),
+    ]
+    keyword = [_record("3", "keyword_search", 4.0), _record("4", "keyword_search", 2)]
+
+    scores = weighted_score_fusion(vector, keyword, vector_weight=0.75)
+
+    assert scores["1"] == pytest.approx(0.75)
+    assert scores["2"] == pytest.approx(0.375)
+    assert scores["3"] == pytest.approx(0.25)
+    assert scores["4"] == pytest.approx(0.0)
+
+
+def test_fuse_orders_items_without_cross_encoder(mocker):
+    rank_passages = mocker.patch("genai_core.cross_encoder.rank_passages")
+    vector = [_record("1", "vector_search", 0.1), _record("2", "vector_search", 0.2)]
+    keyword = [_record("2", "keyword_search", 3.0), _record("3", "keyword_search", 1)]
+    items = merge_results(vector, keyword)
+
+    items = fuse("rrf", items, vector, keyword)
+
+    assert [item["chunk_id"] for item in items] == ["2", "1", "3"]
+    assert keyword[0]["score"] == items[0]["score"]
+    rank_passages.assert_not_called()
+
+    with pytest.raises(ValueError):
+        fuse("unknown", items, vector, keyword)
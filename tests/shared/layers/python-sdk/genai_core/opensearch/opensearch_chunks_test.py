@@ -0,0 +1,92 @@
+import genai_core.opensearch.chunks
+from genai_core.opensearch.chunks import (
+    add_chunks_open_search,
+    clean_chunks_open_search,
+)
+
+
+def test_add_chunks_open_search_uses_bulk(mocker):
+    client = mocker.MagicMock()
+    mocker.patch(
+        "genai_core.opensearch.chunks.get_open_search_client", return_value=client
+    )
+    actions = []
+
+    def streaming_bulk(client, actions_iter, **kwargs):
+        for action in actions_iter:
+            actions.append(action)
+            yield True, {"index": {"status": 201}}
+
+    bulk = mocker.patch(
+        "genai_core.opensearch.chunks.helpers.streaming_bulk",
+        side_effect=streaming_bulk,
+    )
+
+    result = add_chunks_open_search(
+        workspace_id="workspace-id",
+        document_id="document-id",
+        document_sub_id=None,
+        document_type="file",
+        document_sub_type=None,
+        path="path",
+        title="title",
+        chunk_ids=["1", "2"],
+        chunk_embeddings=[[0.1], [0.2]],
+        chunks=["chunk 1", "chunk 2"],
+        chunk_complements=None,
+        replace=False,
+    )
+
+    assert result == {"removed_vectors": 0, "added_vectors": 2}
+    client.index.assert_not_called()
+    assert bulk.call_args[1]["max_retries"] > 0
+    assert [action["_index"] for action in actions] == ["workspaceid"] * 2
+    assert actions[1]["_source"]["chunk_id"] == "2"
+    assert actions[1]["_source"]["content_embeddings"] == [0.2]
+
+
+def test_clean_chunks_open_search_pages_and_keeps_chunk_ids(mocker):
+    mocker.patch.object(genai_core.opensearch.chunks, "OPEN_SEARCH_CLEAN_PAGE_SIZE", 2)
+    client = mocker.MagicMock()
+    mocker.patch(
+        "genai_core.opensearch.chunks.get_open_search_client", return_value=client
+    )
+    pages = [
+        [("a", "1"), ("b", "2")],
+        [("c", "3")],
+        [],
+    ]
+    client.search.side_effect = [
+        {
+            "hits": {
+                "hits": [
+                    {
+                        "_id": doc_id,
+                        "_source": {"chunk_id": chunk_id},
+                        "sort": [chunk_id],
+                    }
+                    for doc_id, chunk_id in page
+                ]
+            }
+        }
+        for page in pages
+    ]
+    deleted = []
+
+    def streaming_bulk(client, actions_iter, **kwargs):
+        for action in actions_iter:
+            deleted.append(action["_id"])
+            yield True, {"delete": {"status": 200}}
+
+    mocker.patch(
+        "genai_core.opensearch.chunks.helpers.streaming_bulk",
+        side_effect=streaming_bulk,
+    )
+
+    removed = clean_chunks_open_search(
+        "workspace-id", "document-id", keep_chunk_ids=["2"]
+    )
+
+    assert removed == 2
+    assert deleted == ["a", "c"]
+    assert client.search.call_args_list[1][1]["body"]["search_after"] == ["2"]
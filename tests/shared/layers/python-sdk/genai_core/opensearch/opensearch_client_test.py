@@ -0,0 +1,36 @@
+import genai_core.opensearch.client
+from genai_core.opensearch.client import (
+    get_open_search_client,
+    reset_open_search_client,
+)
+
+
+def test_get_open_search_client_is_cached(mocker):
+    mocker.patch.object(
+        genai_core.opensearch.client,
+        "OPEN_SEARCH_COLLECTION_ENDPOINT",
+        "https://collection.us-east-1.aoss.amazonaws.com",
+    )
+    session = mocker.patch("genai_core.opensearch.client.boto3.Session")
+    session.return_value.region_name = "us-east-1"
+    opensearch = mocker.patch(
+        "genai_core.opensearch.client.OpenSearch",
+        side_effect=lambda **kwargs: mocker.MagicMock(),
+    )
+    reset_open_search_client()
+
+    client = get_open_search_client()
+    assert get_open_search_client() is client
+
+    opensearch.assert_called_once()
+    assert (
+        opensearch.call_args[1]["pool_maxsize"]
+        == genai_core.opensearch.client.OPEN_SEARCH_POOL_MAXSIZE
+    )
+    assert opensearch.call_args[1]["hosts"] == [
+        {"host": "collection.us-east-1.aoss.amazonaws.com", "port": 443}
+    ]
+
+    reset_open_search_client()
+    client.close.assert_called_once()
+    assert get_open_search_client() is not client
@@ -0,0 +1,109 @@
+import pytest
+import genai_core.opensearch.query
+from genai_core.opensearch.query import query_workspace_open_search
+from genai_core.types import CommonError
+
+workspace = {
+    "embeddings_model_provider": "bedrock",
+    "embeddings_model_name": "cohere.embed-english-v3",
+    "cross_encoder_model_provider": None,
+    "cross_encoder_model_name": None,
+    "hybrid_search": True,
+    "languages": ["english"],
+}
+
+
+def _hit(chunk_id, score):
+    return {"_score": score, "_source": {"chunk_id": chunk_id, "content": "content"}}
+
+
+@pytest.fixture
+def client(mocker):
+    mocker.patch(
+        "genai_core.embeddings.get_embeddings_model", return_value=mocker.MagicMock()
+    )
+    mocker.patch(
+        "genai_core.embeddings.generate_query_embeddings", return_value=[0.1, 0.2]
+    )
+    client = mocker.MagicMock()
+    mocker.patch(
+        "genai_core.opensearch.query.get_open_search_client", return_value=client
+    )
+
+    return client
+
+
+def test_hybrid_query_uses_one_msearch(client):
+    client.msearch.return_value = {
+        "responses": [
+            {"hits": {"hits": [_hit("1", 0.9)]}},
+            {"hits": {"hits": [_hit("2", 3.0), _hit("1", 1.0)]}},
+        ]
+    }
+
+    result = query_workspace_open_search(
+        "workspace-id", workspace, "query", limit=5, full_response=True
+    )
+
+    client.search.assert_not_called()
+    body = client.msearch.call_args[1]["body"]
+    assert body[0] == {"index": "workspaceid"}
+    assert "knn" in body[1]["query"]
+    assert body[3]["query"] == {"match": {"content": "query"}}
+    assert [item["chunk_id"] for item in result["items"]] == ["1", "2"]
+    assert result["items"][0]["sources"] == ["keyword_search", "vector_search"]
+
+
+def test_hybrid_query_error(client):
+    client.msearch.return_value = {
+        "responses": [
+            {"hits": {"hits": []}},
+            {"error": {"type": "index_not_found_exception"}, "status": 404},
+        ]
+    }
+
+    with pytest.raises(CommonError):
+        query_workspace_open_search(
+            "workspace-id", workspace, "query", limit=5, full_response=False
+        )
+
+
+def test_hybrid_query_without_msearch(client, mocker):
+    mocker.patch.object(
+        genai_core.opensearch.query, "OPEN_SEARCH_HYBRID_MSEARCH", False
+    )
+    client.search.return_value = {"hits": {"hits": [_hit("1", 0.9)]}}
+
+    query_workspace_open_search(
+        "workspace-id", workspace, "query", limit=5, full_response=False
+    )
+
+    client.msearch.assert_not_called()
+    assert client.search.call_count == 2
+
+
+def test_vector_search_k_and_limits(client):
+    client.msearch.return_value = {
+        "responses": [{"hits": {"hits": []}}, {"hits": {"hits": []}}]
+    }
+
+    query_workspace_open_search(
+        "workspace-id", workspace, "query", limit=5, full_response=False
+    )
+
+    body = client.msearch.call_args[1]["body"]
+    assert body[1]["query"]["knn"]["content_embeddings"]["k"] == 25
+    assert body[1]["size"] == 25
+
+    query_workspace_open_search(
+        "workspace-id",
+        dict(workspace, vector_search_limit=10, vector_search_k=50),
+        "query",
+        limit=5,
+        full_response=False,
+    )
+
+    body = client.msearch.call_args[1]["body"]
+    assert body[1]["query"]["knn"]["content_embeddings"]["k"] == 50
+    assert body[1]["size"] == 10
+    assert body[3]["size"] == 25
@@ -0,0 +1,47 @@
+import threading
+import pytest
+from genai_core.utils.pipeline import Pipeline, Stage
+
+
+def test_pipeline_runs_items_through_stages():
+    pipeline = Pipeline(
+        [Stage("double", lambda item: item * 2, 2), Stage("add", lambda item: item + 1)]
+    )
+
+    assert sorted(pipeline.run(range(10))) == [item * 2 + 1 for item in range(10)]
+    assert pipeline.stats["double"]["items"] == 10
+    assert pipeline.stats["add"]["items"] == 10
+    assert pipeline.run([]) == []
+    assert pipeline.run([1]) == [3]
+
+
+def test_pipeline_stages_overlap():
+    # The second stage has to handle the first item before the first stage
+    # moves past the second one, a serial implementation would time out.
+    barrier = threading.Barrier(2, timeout=5)
+
+    def first(item):
+        if item == 1:
+            barrier.wait()
+        return item
+
+    def second(item):
+        if item == 0:
+            barrier.wait()
+        return item
+
+    pipeline = Pipeline([Stage("first", first), Stage("second", second)])
+
+    assert pipeline.run([0, 1, 2]) == [0, 1, 2]
+
+
+def test_pipeline_raises_first_error():
+    def fail(item):
+        if item == 3:
+            raise ValueError("failed")
+        return item
+
+    pipeline = Pipeline([Stage("fail", fail), Stage("identity", lambda item: item)])
+
+    with pytest.raises(ValueError):
+        pipeline.run(range(100))
@@ -0,0 +1,75 @@
+import pytest
+import genai_core.semantic_search
+from genai_core.semantic_search import semantic_search
+from genai_core.utils.cache import LRUCache
+
+
+def _workspace(engine="aurora", updated_at="2024-01-01T00:00:00", vectors=10):
+    return {
+        "workspace_id": "workspace-id",
+        "engine": engine,
+        "status": "ready",
+        "updated_at": updated_at,
+        "vectors": vectors,
+        "documents": 1,
+    }
+
+
+@pytest.fixture(autouse=True)
+def search_results_cache(mocker):
+    cache = LRUCache(10, ttl=60)
+    mocker.patch.object(genai_core.semantic_search, "search_results_cache", cache)
+    return cache
+
+
+def test_semantic_search_results_are_cached(mocker):
+    mocker.patch("genai_core.workspaces.get_workspace", return_value=_workspace())
+    query = mocker.patch(
+        "genai_core.semantic_search.query_workspace_aurora",
+        return_value={"items": [{"chunk_id": "1"}]},
+    )
+
+    first = semantic_search("workspace-id", "query")
+    first["items"].clear()
+    second = semantic_search("workspace-id", "query")
+
+    assert second == {"items": [{"chunk_id": "1"}]}
+    query.assert_called_once()
+
+    semantic_search("workspace-id", "query", limit=10)
+    semantic_search("workspace-id", "query", full_response=True)
+    assert query.call_count == 3
+
+
+def test_semantic_search_cache_invalidated_by_workspace_update(mocker):
+    get_workspace = mocker.patch(
+        "genai_core.workspaces.get_workspace", return_value=_workspace("opensearch")
+    )
+    query = mocker.patch(
+        "genai_core.semantic_search.query_workspace_open_search",
+        return_value={"items": []},
+    )
+
+    semantic_search("workspace-id", "query")
+    get_workspace.return_value = _workspace(
+        engine="opensearch", updated_at="2024-01-02T00:00:00", vectors=12
+    )
+    semantic_search("workspace-id", "query")
+    semantic_search("workspace-id", "query")
+
+    assert query.call_count == 2
+
+
+def test_semantic_search_external_engines_are_not_cached(mocker):
+    mocker.patch(
+        "genai_core.workspaces.get_workspace", return_value=_workspace("kendra")
+    )
+    query = mocker.patch(
+        "genai_core.semantic_search.query_workspace_kendra",
+        return_value={"items": []},
+    )
+
+    semantic_search("workspace-id", "query")
+    semantic_search("workspace-id", "query")
+
+    assert query.call_count == 2